@@ -1,12 +1,21 @@
 import streamlit as st
 import folium
-from streamlit_folium import st_folium, folium_static
-from streamlit_js_eval import streamlit_js_eval
-from n4j import execute_query
-from models import Company, Tag
-import statistics
+from streamlit_folium import st_folium
 from sidebar import sidebar
-from data_functions import get_companies, get_tags, sorted_tags
+from data_functions import sorted_tags
+from company_store import current_store
+from geocoding import get_geocoder
+from schema import ensure_schema
+from instrumentation import count_script_run, span, tracing_enabled
+from debug_panel import debug_panel
+from spatial import bounds_from_map_data, expand_bounds, contains_bounds
+from clustering import cluster_points
+from map_render import (
+    add_cluster_marker,
+    add_company_layer,
+    add_company_markers,
+    clicked_company_uuid,
+)
 import logging
 
 
@@ -18,36 +27,187 @@ logging.getLogger("neo4j.io").setLevel(logging.INFO)
 logging.getLogger("neo4j.pool").setLevel(logging.INFO)
 logging.getLogger("neo4j_uploader").setLevel(logging.INFO)
 
+# Constraints and indexes, once per process
+ensure_schema()
+
+# Fraction of the viewport loaded beyond each edge, so small pans need no lookup
+VIEWPORT_MARGIN = 0.5
+
+# Nearby results listed under the map
+NEARBY_LIST_SIZE = 25
+
+# Suggestions shown under the keyword search
+RELATED_TAGS = 8
+
+# st_folium key. Its value in session state is what the browser last posted
+# (view, bounds, clicks), updated before the rerun the post triggers, whereas
+# st_folium's return value only arrives at the end of the run.
+MAP_KEY = "map"
+
+
+def near_point(address, map_data):
+    """(lat, lon) to search around: the geocoded address if given, otherwise
+    the last click on the map. None when neither is available."""
+    if address:
+        return get_geocoder().geocode(address)
+    clicked = (map_data or {}).get("last_clicked")
+    if clicked:
+        return clicked["lat"], clicked["lng"]
+    return None
+
+
+def viewport_companies(store, keywords, match_all, bounds, text):
+    # Reuse the last lookup while the view stays inside the area it loaded
+    key = (store.version, tuple(keywords), match_all, text)
+    loaded = st.session_state.get("viewport_loaded")
+    if loaded and loaded["key"] == key and contains_bounds(loaded["bounds"], bounds):
+        return loaded["companies"]
+
+    area = expand_bounds(bounds, VIEWPORT_MARGIN)
+    companies = store.filter(keywords, match_all=match_all, bounds=area, text=text)
+    st.session_state["viewport_loaded"] = {
+        "key": key,
+        "bounds": area,
+        "companies": companies,
+    }
+    return companies
+
 
 st.set_page_config(layout="wide", initial_sidebar_state="collapsed")
 
+logging.debug(f"Script run {count_script_run()} for this session")
+
 st.title("Experimental SD Startup Map")
 
+# Served from memory, no database round trip unless the data changed
+store = current_store()
+latest_map = st.session_state.get(MAP_KEY) or {}
+
+# Resolved before the sidebar draws, so its edit form follows this click
+st.session_state["selected_uuid"] = clicked_company_uuid(latest_map, store)
+
 sidebar()
 
 st.session_state["tags"] = sorted_tags()
 
+# Free text search over names, descriptions and tags
+text = st.text_input(
+    "Search",
+    placeholder="Name, description or tag",
+    help="Words match by prefix, so 'bio' finds biotech",
+)
+
+tag_counts = store.tag_counts()
+
+
+def add_related_tag(tag):
+    # Runs before the widgets are drawn, so their state can still be set
+    st.session_state["keywords"] = st.session_state["keywords"] + [tag]
+
+
 # Keyword based searching
-keywords = st.multiselect("Keyword Search", st.session_state["tags"])
+keywords = st.multiselect(
+    "Keyword Search",
+    st.session_state["tags"],
+    format_func=lambda tag: f"{tag} ({tag_counts.get(tag, 0)})",
+    key="keywords",
+)
+related = store.related_tags(keywords, RELATED_TAGS) if keywords else []
+if related:
+    st.caption("Related tags")
+    for column, tag in zip(st.columns(len(related)), related):
+        column.button(
+            f"+ {tag} ({tag_counts.get(tag, 0)})",
+            key=f"related_tag_{tag}",
+            on_click=add_related_tag,
+            args=(tag,),
+        )
+match_all = (
+    st.radio(
+        "Match",
+        ["Any keyword", "All keywords"],
+        horizontal=True,
+        label_visibility="collapsed",
+    )
+    == "All keywords"
+)
+
+viewport_only = st.toggle(
+    "Only load visible area",
+    help="Limit markers to the current map view, for large datasets",
+)
+group_markers = st.toggle(
+    "Group nearby startups",
+    value=True,
+    help="Draw one marker with a count for startups close together at this zoom",
+)
+fast_layer = st.toggle(
+    "Fast marker layer",
+    help="Draw startups as one lightweight map layer instead of individual pins",
+)
+near_mode = st.toggle(
+    "Search near a point",
+    help="Startups closest to an address, or to where you last clicked the map",
+)
+near = None
+if near_mode:
+    c1, c2, c3 = st.columns([3, 1, 1])
+    address = c1.text_input(
+        "Near address", placeholder="Leave empty to use your last click on the map"
+    )
+    radius_km = c2.number_input("Within km", min_value=0.5, value=5.0, step=0.5)
+    nearest_k = c3.number_input(
+        "Nearest", min_value=0, value=0, help="0 lists every startup within range"
+    )
+    near = near_point(address, latest_map)
+    if near is None:
+        if address:
+            st.warning(f"Could not find {address}")
+        else:
+            st.info("Click the map or enter an address to search near it")
+bounds = bounds_from_map_data(latest_map) if viewport_only else None
 
-companies = get_companies(keywords)
+# Filtered in memory
+if bounds is None:
+    companies = store.filter(keywords, match_all=match_all, text=text)
+else:
+    companies = viewport_companies(store, keywords, match_all, bounds, text)
+distances = None
+if near is not None:
+    companies, distances = store.nearby(
+        near[0], near[1], radius_km, nearest_k or None, among=companies
+    )
 st.session_state["companies"] = companies
 
-st.text(f"Found companies: {len(companies)}")
+if near is not None:
+    st.text(f"Found companies within {radius_km:g} km: {len(companies)}")
+elif bounds is None:
+    st.text(f"Found companies: {len(companies)}")
 
-if len(companies) == 0:
-    st.stop()
+    if len(companies) == 0 and not near_mode:
+        st.stop()
+else:
+    st.text(f"Found companies near the visible area: {len(companies)}")
 
-# Auto find median lat and lons
-lats = [c.Lat for c in companies if c.Lat is not None]
-median_lat = statistics.median(lats)
-lons = [c.Lon for c in companies if c.Lon is not None]
-median_lon = statistics.median(lons)
+# The map is rebuilt on every rerun. When its markers depend on the view, keep
+# the user's last center and zoom rather than snapping back to the default
+if (viewport_only or group_markers or near_mode) and latest_map.get("center"):
+    median_lat = latest_map["center"]["lat"]
+    median_lon = latest_map["center"]["lng"]
+    zoom = latest_map["zoom"]
+elif len(companies) == 0:
+    # San Diego
+    median_lat, median_lon = 32.715736, -117.161087
+    zoom = 10
+else:
+    # Auto find median lat and lons
+    median_lat, median_lon = companies.median_center()
+    zoom = 10
 
 
 # c1, c2 = st.columns([3, 1])
 # with c1:
-m = folium.Map(location=[median_lat, median_lon], zoom_start=10, control_scale=True)
+m = folium.Map(location=[median_lat, median_lon], zoom_start=zoom, control_scale=True)
 
 # Harcoded lat and lons
 # San Diego
@@ -56,25 +216,56 @@ m = folium.Map(location=[median_lat, median_lon], zoom_start=10, control_scale=T
 
 # m = folium.Map(location=[default_lat, default_lon], zoom_start=9, controll_scale=True)
 
-for c in companies:
-    html = ""  # Reset
-    if c.Lat is None or c.Lon is None:
-        continue
-    # Create a popup with the HTML content
-    html = f"""
-    <h2>{c.Name}</h2>
-    <p>{c.Description}</p>
-    <a href="{c.Url}" target="_blank">{c.Url}</a>
-    """
+
+def company_details(c):
+    st.subheader(c.Name)
+    st.write(c.Description)
+    if c.Url:
+        st.markdown(f"[{c.Url}]({c.Url})")
     # if c.Logo is not None:
-    #     html = c.Logo + html
-    if c.LinkedInUrl is not None:
-        html += f"<br><br><a href='{c.LinkedInUrl}' target='_blank' rel='noopener noreferrer'>{c.LinkedInUrl}</a>"
-    iframe = folium.IFrame(html, width=300, height=200)
-    popup = folium.Popup(iframe, min_width=300, max_width=300)
+    #     st.image(c.Logo)
+    if c.LinkedInUrl:
+        st.markdown(f"[{c.LinkedInUrl}]({c.LinkedInUrl})")
+
+
+with span("map.markers") as traced:
+    clusters = None
+    if group_markers:
+        # Unfiltered maps use the store's precomputed per zoom clusters
+        if bounds is None and near is None and not keywords and not text:
+            clusters = store.clusters(zoom)
+        else:
+            located = companies.located()
+            clusters = cluster_points(
+                zip(
+                    located.slots.tolist(), located.lats.tolist(), located.lons.tolist()
+                ),
+                zoom,
+            )
 
-    # Add the marker to the map
-    folium.Marker([c.Lat, c.Lon], popup=popup, tooltip=c.Name).add_to(m)
+    # Companies drawn individually, either as pins or as one GeoJSON layer
+    if clusters is None:
+        singles = companies
+    else:
+        singles = store.select([slot for _, _, _, slot in clusters if slot is not None])
+        for lat, lon, count, slot in clusters:
+            if slot is None:
+                add_cluster_marker(m, lat, lon, count)
+
+    if near is not None:
+        folium.Circle(
+            near, radius=radius_km * 1000, color="#d9534f", fill=False, weight=2
+        ).add_to(m)
+
+    if fast_layer:
+        add_company_layer(m, singles)
+    else:
+        add_company_markers(m, singles)
+    traced.set(
+        clusters=0 if clusters is None else len(clusters),
+        markers=len(singles),
+        layer=fast_layer,
+    )
 
 # Loop through each row in the dataframe
 # for i,row in df.iterrows():
@@ -88,12 +279,27 @@ for c in companies:
 #     folium.Marker(location=[row['latitude'],row['longitude']],
 #                   popup = popup, c=row['Well Name']).add_to(m)
 
-# Find current screen width - NOT dynamic. Page needs to be refreshed to adjust to a resized screen
-screen_width = streamlit_js_eval(js_expressions="window.innerWidth", key="SCR")
+# Sized by the browser: the map fills the page width and follows resizes, with
+# no round trip to measure the window first. The view it posts once drawn, and
+# after each pan, zoom or click, still reruns the script.
+with span("map.st_folium"):
+    st_folium(m, use_container_width=True, key=MAP_KEY)
+
+selected = store.get(st.session_state["selected_uuid"])
+if selected is not None:
+    company_details(selected)
 
-map_data = st_folium(m, width=screen_width)
+if distances is not None and len(companies):
+    st.dataframe(
+        {
+            "Startup": companies.names[:NEARBY_LIST_SIZE],
+            "km": distances[:NEARBY_LIST_SIZE].round(2),
+        },
+        hide_index=True,
+    )
 
-st.session_state["map_data"] = map_data
+if tracing_enabled():
+    debug_panel()
 
 # with c2:
 #     # TODO:
@@ -1,77 +1,194 @@
-import json
-import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from instrumentation import span
+from config import setting
 import streamlit as st
+import threading
+import requests
 import logging
+import base64
+import json
+import time
 
 ## -------------------------------------------------------------------------------------------------
 ## Firebase Auth API -------------------------------------------------------------------------------
 ## -------------------------------------------------------------------------------------------------
 
 
-def sign_in_with_email_and_password(email, password):
-    request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/verifyPassword?key={0}".format(
-        st.secrets["FIREBASE_WEB_API_KEY"]
+# Both overridable through st.secrets, e.g. to point at firebase_stub.py
+FIREBASE_AUTH_URL = "https://www.googleapis.com/identitytoolkit/v3/relyingparty"
+FIREBASE_TOKEN_URL = "https://securetoken.googleapis.com/v1/token"
+
+DEFAULT_TIMEOUT = 10.0  # seconds to wait for a response
+CONNECT_TIMEOUT = 5.0
+DEFAULT_POOL_SIZE = 10  # keep-alive connections per host
+# ID tokens are swapped for fresh ones this many seconds before they expire
+REFRESH_MARGIN = 60
+ACCOUNT_INFO_CACHE_SIZE = 1024
+
+
+class FirebaseSession(requests.Session):
+    """Keep-alive session with pooled connections and a default timeout.
+
+    Only failed connects are retried; an auth request that reached Firebase
+    (such as creating an account) is never sent twice."""
+
+    def __init__(
+        self, timeout: float = DEFAULT_TIMEOUT, pool_size: int = DEFAULT_POOL_SIZE
+    ):
+        super().__init__()
+        self.timeout = (CONNECT_TIMEOUT, timeout)
+        retry = Retry(
+            connect=2, read=0, redirect=0, status=0, other=0, backoff_factor=0.2
+        )
+        adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+@st.cache_resource
+def get_http_session() -> FirebaseSession:
+    # Shared by every session in this process
+    return FirebaseSession(
+        float(setting("FIREBASE_TIMEOUT", DEFAULT_TIMEOUT)),
+        int(setting("FIREBASE_POOL_SIZE", DEFAULT_POOL_SIZE)),
     )
-    headers = {"content-type": "application/json; charset=UTF-8"}
-    data = json.dumps({"email": email, "password": password, "returnSecureToken": True})
-    request_object = requests.post(request_ref, headers=headers, data=data)
+
+
+def _api_key() -> str:
+    return st.secrets["FIREBASE_WEB_API_KEY"]
+
+
+def _send(name: str, url: str, **kwargs) -> dict:
+    with span(f"firebase.{name}") as traced:
+        request_object = get_http_session().post(
+            url, params={"key": _api_key()}, **kwargs
+        )
+        traced.set(status=request_object.status_code, bytes=len(request_object.content))
     raise_detailed_error(request_object)
     return request_object.json()
 
 
+def _post(endpoint: str, payload: dict) -> dict:
+    base = setting("FIREBASE_AUTH_URL", FIREBASE_AUTH_URL)
+    return _send(endpoint, f"{base}/{endpoint}", json=payload)
+
+
+def token_expiry(id_token: str):
+    """Expiry time of an ID token from its exp claim, or None if unreadable.
+    The signature is not checked, this only decides how long to cache."""
+    try:
+        payload = id_token.split(".")[1]
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        )
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class AccountInfoCache:
+    """getAccountInfo responses per ID token, kept until the token expires.
+    Thread safe."""
+
+    def __init__(self, max_entries: int = ACCOUNT_INFO_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # id token -> (expires, response)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, id_token: str):
+        with self._lock:
+            entry = self._entries.get(id_token)
+            if entry is not None and entry[0] > time.time():
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(id_token, None)
+            self.misses += 1
+            return None
+
+    def put(self, id_token: str, response: dict):
+        expires = token_expiry(id_token)
+        if expires is None:
+            return
+        with self._lock:
+            now = time.time()
+            if len(self._entries) >= self.max_entries:
+                self._entries = {t: e for t, e in self._entries.items() if e[0] > now}
+            while len(self._entries) >= self.max_entries:
+                # Oldest insertion first
+                del self._entries[next(iter(self._entries))]
+            self._entries[id_token] = (expires, response)
+
+    def discard(self, id_token: str):
+        with self._lock:
+            self._entries.pop(id_token, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+account_info_cache = AccountInfoCache()
+
+
+def sign_in_with_email_and_password(email, password):
+    return _post(
+        "verifyPassword",
+        {"email": email, "password": password, "returnSecureToken": True},
+    )
+
+
 def get_account_info(id_token):
-    request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/getAccountInfo?key={0}".format(
-        st.secrets["FIREBASE_WEB_API_KEY"]
+    cached = account_info_cache.get(id_token)
+    if cached is not None:
+        return cached
+    response = _post("getAccountInfo", {"idToken": id_token})
+    account_info_cache.put(id_token, response)
+    return response
+
+
+def refresh_id_token(refresh_token):
+    # Form encoded, and answers in snake_case: id_token, refresh_token, expires_in
+    return _send(
+        "refreshToken",
+        setting("FIREBASE_TOKEN_URL", FIREBASE_TOKEN_URL),
+        data={"grant_type": "refresh_token", "refresh_token": refresh_token},
     )
-    headers = {"content-type": "application/json; charset=UTF-8"}
-    data = json.dumps({"idToken": id_token})
-    request_object = requests.post(request_ref, headers=headers, data=data)
-    raise_detailed_error(request_object)
-    return request_object.json()
 
 
 def send_email_verification(id_token):
-    request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/getOobConfirmationCode?key={0}".format(
-        st.secrets["FIREBASE_WEB_API_KEY"]
+    return _post(
+        "getOobConfirmationCode", {"requestType": "VERIFY_EMAIL", "idToken": id_token}
     )
-    headers = {"content-type": "application/json; charset=UTF-8"}
-    data = json.dumps({"requestType": "VERIFY_EMAIL", "idToken": id_token})
-    request_object = requests.post(request_ref, headers=headers, data=data)
-    raise_detailed_error(request_object)
-    return request_object.json()
 
 
 def send_password_reset_email(email):
-    request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/getOobConfirmationCode?key={0}".format(
-        st.secrets["FIREBASE_WEB_API_KEY"]
+    return _post(
+        "getOobConfirmationCode", {"requestType": "PASSWORD_RESET", "email": email}
     )
-    headers = {"content-type": "application/json; charset=UTF-8"}
-    data = json.dumps({"requestType": "PASSWORD_RESET", "email": email})
-    request_object = requests.post(request_ref, headers=headers, data=data)
-    raise_detailed_error(request_object)
-    return request_object.json()
 
 
 def create_user_with_email_and_password(email, password):
-    request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/signupNewUser?key={0}".format(
-        st.secrets["FIREBASE_WEB_API_KEY"]
+    return _post(
+        "signupNewUser",
+        {"email": email, "password": password, "returnSecureToken": True},
     )
-    headers = {"content-type": "application/json; charset=UTF-8"}
-    data = json.dumps({"email": email, "password": password, "returnSecureToken": True})
-    request_object = requests.post(request_ref, headers=headers, data=data)
-    raise_detailed_error(request_object)
-    return request_object.json()
 
 
 def delete_user_account(id_token):
-    request_ref = "https://www.googleapis.com/identitytoolkit/v3/relyingparty/deleteAccount?key={0}".format(
-        st.secrets["FIREBASE_WEB_API_KEY"]
-    )
-    headers = {"content-type": "application/json; charset=UTF-8"}
-    data = json.dumps({"idToken": id_token})
-    request_object = requests.post(request_ref, headers=headers, data=data)
-    raise_detailed_error(request_object)
-    return request_object.json()
+    response = _post("deleteAccount", {"idToken": id_token})
+    account_info_cache.discard(id_token)
+    return response
 
 
 def raise_detailed_error(request_object):
@@ -86,10 +203,68 @@ def raise_detailed_error(request_object):
 ## -------------------------------------------------------------------------------------------------
 
 
+def token_state(id_token: str, refresh_token: str, expires_in) -> dict:
+    # What a signed in session keeps in st.session_state.auth_tokens
+    return {
+        "idToken": id_token,
+        "refreshToken": refresh_token,
+        "expires_at": time.time() + int(expires_in),
+    }
+
+
+def _save_tokens(id_token: str, refresh_token: str, expires_in) -> None:
+    st.session_state.auth_tokens = token_state(id_token, refresh_token, expires_in)
+
+
+def current_id_token():
+    """The signed in user's ID token, exchanging the refresh token for a new
+    one when it is about to expire rather than signing in again. None when
+    not signed in."""
+    tokens = st.session_state.get("auth_tokens")
+    if tokens is None:
+        return None
+    if time.time() < tokens["expires_at"] - REFRESH_MARGIN:
+        return tokens["idToken"]
+    refreshed = refresh_id_token(tokens["refreshToken"])
+    _save_tokens(
+        refreshed["id_token"], refreshed["refresh_token"], refreshed["expires_in"]
+    )
+    return refreshed["id_token"]
+
+
+def check_session() -> bool:
+    """Confirm the signed in account with Firebase, e.g. before a write.
+
+    Uses the current ID token, refreshed when about to expire, and its account
+    info, which is cached per token, so repeated checks send no requests until
+    the token changes. A session Firebase rejects (account deleted or
+    disabled, refresh token revoked) is signed out and False returned. When
+    Firebase can't be reached the session is kept and False returned too.
+    """
+    try:
+        id_token = current_id_token()
+        if id_token is None:
+            raise LookupError("no tokens in this session")
+        user_info = get_account_info(id_token)["users"][0]
+    except (requests.exceptions.HTTPError, LookupError) as error:
+        logging.info(f"Signing out a session that no longer checks out: {error}")
+        st.session_state.pop("user_info", None)
+        st.session_state.pop("auth_tokens", None)
+        st.session_state.auth_warning = "Your session has expired, sign in again"
+        return False
+    except requests.exceptions.RequestException as error:
+        logging.warning(f"Could not check the session with Firebase: {error}")
+        st.session_state.auth_warning = "Could not verify your session, try again"
+        return False
+    st.session_state.user_info = user_info
+    return True
+
+
 def sign_in(email: str, password: str) -> None:
     try:
         # Attempt to sign in with email and password
-        id_token = sign_in_with_email_and_password(email, password)["idToken"]
+        signed_in = sign_in_with_email_and_password(email, password)
+        id_token = signed_in["idToken"]
 
         # Get account information
         user_info = get_account_info(id_token)["users"][0]
@@ -102,6 +277,7 @@ def sign_in(email: str, password: str) -> None:
         # Save user info to session state and rerun
         else:
             st.session_state.user_info = user_info
+            _save_tokens(id_token, signed_in["refreshToken"], signed_in["expiresIn"])
             st.rerun()
 
     except requests.exceptions.HTTPError as error:
@@ -0,0 +1,76 @@
+"""Compare map build time and HTML size for the marker rendering modes.
+
+    python sd-startup-map/bench_map_render.py --sizes 1000 10000 100000
+
+"legacy" is the original loop with an IFrame popup per folium.Marker, "pins"
+is one tooltip-only Marker per company and "layer" a single GeoJSON layer.
+"""
+
+from map_render import add_company_layer, add_company_markers
+from columnar import CompanyTable, CompanySelection
+from synthetic_data import synthetic_companies
+import argparse
+import folium
+import json
+import time
+
+
+def located_companies(n: int, seed: int = 0) -> CompanySelection:
+    # The shared synthetic dataset, minus the few companies without coordinates
+    table = CompanyTable(n)
+    for c in synthetic_companies(n, seed):
+        table.set_company(None, c)
+    return CompanySelection(table, range(n)).located()
+
+
+def add_legacy_markers(m, companies):
+    # The per company loop app.py used before markers lost their popups
+    for c in list(companies):
+        html = f"""
+        <h2>{c.Name}</h2>
+        <p>{c.Description}</p>
+        <a href="{c.Url}" target="_blank">{c.Url}</a>
+        """
+        if c.LinkedInUrl is not None:
+            html += f"<br><br><a href='{c.LinkedInUrl}' target='_blank' rel='noopener noreferrer'>{c.LinkedInUrl}</a>"
+        iframe = folium.IFrame(html, width=300, height=200)
+        popup = folium.Popup(iframe, min_width=300, max_width=300)
+        folium.Marker([c.Lat, c.Lon], popup=popup, tooltip=c.Name).add_to(m)
+
+
+MODES = {
+    "legacy": add_legacy_markers,
+    "pins": add_company_markers,
+    "layer": add_company_layer,
+}
+
+
+def measure(companies, add) -> dict:
+    started = time.perf_counter()
+    m = folium.Map(location=[32.7157, -117.1611], zoom_start=10)
+    add(m, companies)
+    built = time.perf_counter()
+    html = m.get_root().render()
+    rendered = time.perf_counter()
+    return {
+        "build_s": round(built - started, 4),
+        "render_s": round(rendered - built, 4),
+        "html_bytes": len(html.encode()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    results = {}
+    for n in args.sizes:
+        companies = located_companies(n)
+        results[n] = {mode: measure(companies, MODES[mode]) for mode in args.modes}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
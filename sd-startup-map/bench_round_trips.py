@@ -0,0 +1,74 @@
+"""Count database round trips per write operation.
+
+Runs add_company, update_company and delete_company against a recording
+stand-in for execute_query, so no database or network is needed:
+
+    python sd-startup-map/bench_round_trips.py
+
+"after" is counted; "before_by_hand" is read off the old code, see BEFORE.
+"""
+
+import data_functions
+from models import Company
+import json
+
+
+# Counted by hand from the previous implementation's code, not measured: it
+# sent one auto-commit query per step (location, company, office link, tag
+# merge, tag links, ...). Its update never ran the company property SET.
+BEFORE = {
+    "add_company": 5,
+    "update_company": 3,
+    "update_company (moved)": 6,
+    "delete_company": 1,
+}
+
+
+class _Summary:
+    counters = {}
+
+
+class RoundTripCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, query, params={}):
+        self.count += 1
+        return [], _Summary(), []
+
+
+def measure() -> dict:
+    counter = RoundTripCounter()
+    data_functions.execute_query = counter
+    data_functions.get_lat_lon_from_address = lambda *address: (32.7157, -117.1611)
+
+    original = Company(
+        Name="Example",
+        Url="https://example.com",
+        Address="1 Main St",
+        City="San Diego",
+        State="CA",
+        ZipCode="92101",
+        Tags=["AI", "Robotics"],
+    )
+    retagged = original.model_copy(update={"Tags": ["AI", "Biotech"]})
+    moved = retagged.model_copy(update={"Address": "2 Main St"})
+
+    operations = {
+        "add_company": lambda: data_functions.add_company(original),
+        "update_company": lambda: data_functions.update_company(original, retagged),
+        "update_company (moved)": lambda: data_functions.update_company(
+            original, moved
+        ),
+        "delete_company": lambda: data_functions.delete_company(original.UUID),
+    }
+    results = {}
+    for name, operation in operations.items():
+        counter.count = 0
+        operation()
+        results[name] = {"before_by_hand": BEFORE[name], "after": counter.count}
+    return results
+
+
+if __name__ == "__main__":
+    print(json.dumps(measure(), indent=2))
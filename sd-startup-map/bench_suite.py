@@ -0,0 +1,204 @@
+"""Offline benchmarks for the read path, the app's map build and write round trips.
+
+    python sd-startup-map/bench_suite.py --sizes 1000 10000 100000 --output bench.json
+    python sd-startup-map/bench_suite.py --baseline bench.json  # exit 1 on regressions
+
+Runs against fake_neo4j.FakeGraph loaded with synthetic_data companies, so it
+needs no database or network. Times are medians of --repeat runs, in seconds.
+"""
+
+from fake_neo4j import FakeGraph, install
+from synthetic_data import synthetic_companies
+from company_store import CompanyStore
+from cache import get_dataset_cache
+from instrumentation import set_tracing, reset_spans, span_aggregates
+from streamlit.testing.v1 import AppTest
+import data_functions
+import streamlit as st
+import argparse
+import datetime
+import platform
+import statistics
+import json
+import os
+import time
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Timings below this many seconds are too noisy to call a regression
+NOISE_FLOOR = 0.005
+
+
+def timed(operation, repeat: int, setup=None) -> float:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        operation()
+        times.append(time.perf_counter() - started)
+    return round(statistics.median(times), 6)
+
+
+def clear_caches():
+    get_dataset_cache().bump()
+
+
+def measure_reads(repeat: int) -> dict:
+    popular = data_functions.sorted_tags()[:2]
+    # Let the fake build its records before anything is timed
+    data_functions.get_companies([])
+    data_functions.get_companies(popular)
+    return {
+        "get_companies_cold_s": timed(
+            lambda: data_functions.get_companies([]), repeat, clear_caches
+        ),
+        "get_companies_warm_s": timed(lambda: data_functions.get_companies([]), repeat),
+        "get_companies_tags_cold_s": timed(
+            lambda: data_functions.get_companies(popular), repeat, clear_caches
+        ),
+        "sorted_tags_cold_s": timed(data_functions.sorted_tags, repeat, clear_caches),
+        "sorted_tags_warm_s": timed(data_functions.sorted_tags, repeat),
+        "store_load_s": timed(
+            lambda: CompanyStore().load(data_functions.get_companies([])), repeat
+        ),
+    }
+
+
+def measure_app(repeat: int) -> dict:
+    """Script run time of app.py: a cold page load (shared store loaded from
+    scratch) and a rerun, which is what every widget interaction costs."""
+
+    def cold():
+        st.cache_resource.clear()
+        clear_caches()
+        run_app(AppTest.from_file(APP_PATH, default_timeout=600))
+
+    test = AppTest.from_file(APP_PATH, default_timeout=600)
+    run_app(test)
+    return {
+        "app_cold_run_s": timed(cold, repeat),
+        "app_rerun_s": timed(lambda: run_app(test), repeat),
+    }
+
+
+def run_app(test: AppTest):
+    test.run()
+    if test.exception:
+        raise RuntimeError(test.exception[0].message)
+
+
+def measure_writes(graph: FakeGraph) -> dict:
+    original = next(iter(graph.companies.values()))
+    added = original.model_copy(
+        update={"UUID": "bench-added", "Url": "https://bench.example.com"}
+    )
+    retagged = original.model_copy(update={"Tags": ["AI", "Bench"]})
+    moved = retagged.model_copy(update={"Address": "1 Bench Way"})
+    operations = {
+        "add_company": lambda: data_functions.add_company(added),
+        "update_company": lambda: data_functions.update_company(original, retagged),
+        "update_company_moved": lambda: data_functions.update_company(retagged, moved),
+        "delete_company": lambda: data_functions.delete_company(added.UUID),
+    }
+    results = {}
+    for name, operation in operations.items():
+        graph.reset_counts()
+        started = time.perf_counter()
+        operation()
+        results[f"{name}_s"] = round(time.perf_counter() - started, 6)
+        results[f"{name}_round_trips"] = graph.round_trips
+    return results
+
+
+def run(sizes: list[int], repeat: int, seed: int, app: bool, spans=None) -> dict:
+    """Measurements per size. With a spans dict, tracing is on and the span
+    timings per size are added to it; the times then include tracing."""
+    # Writes geocode through the real function; pin it to a fixed point offline
+    data_functions.get_lat_lon_from_address = lambda *address: (32.7157, -117.1611)
+    set_tracing(spans is not None)
+    results = {}
+    for n in sizes:
+        graph = FakeGraph(synthetic_companies(n, seed))
+        restore = install(graph)
+        reset_spans()
+        try:
+            clear_caches()
+            measured = measure_reads(repeat)
+            if app:
+                measured.update(measure_app(repeat))
+            measured.update(measure_writes(graph))
+        finally:
+            restore()
+        results[str(n)] = measured
+        if spans is not None:
+            spans[str(n)] = span_aggregates()
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Measurements worse than the baseline: times more than tolerance slower
+    (and above NOISE_FLOOR), or any increase in round trips."""
+    regressions = []
+    for size, measured in results.items():
+        for key, value in measured.items():
+            before = baseline.get(size, {}).get(key)
+            if before is None:
+                continue
+            if key.endswith("_round_trips"):
+                worse = value > before
+            else:
+                worse = (
+                    value > before * (1 + tolerance) and value - before > NOISE_FLOOR
+                )
+            if worse:
+                regressions.append(f"{size} {key}: {before} -> {value}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-app", action="store_true", help="Skip the app.py runs")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument(
+        "--spans", action="store_true", help="Also report span timings per size"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%"
+    )
+    args = parser.parse_args()
+
+    spans = {} if args.spans else None
+    report = {
+        "meta": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+        },
+        "results": run(args.sizes, args.repeat, args.seed, not args.no_app, spans),
+    }
+    if spans is not None:
+        report["spans"] = spans
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        report["regressions"] = compare(report["results"], baseline, args.tolerance)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if report.get("regressions"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
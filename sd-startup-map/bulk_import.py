@@ -0,0 +1,177 @@
+"""Bulk load companies from a CSV or JSON file.
+
+    python sd-startup-map/bulk_import.py companies.csv --batch-size 500 --resume
+
+Columns / keys match the fields of models.Company. CSV Tags are separated by
+semicolons. Rows that already carry Lat and Lon are not geocoded. Each batch is
+written with one UNWIND statement in its own transaction; progress is saved to
+a checkpoint file after every batch so an interrupted import can be resumed.
+"""
+
+from data_functions import add_companies, get_lat_lons_from_addresses
+from models import Company
+from pydantic import TypeAdapter
+import read_pipeline
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+
+
+DEFAULT_BATCH_SIZE = 500
+
+_companies_adapter = TypeAdapter(list[Company])
+
+
+def read_rows(path: str) -> list[dict]:
+    if path.endswith(".json"):
+        with open(path) as f:
+            return json.load(f)
+
+    rows = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            # Empty cells fall back to model defaults
+            row = {k: v for k, v in row.items() if v not in (None, "")}
+            if "Tags" in row:
+                row["Tags"] = [t.strip() for t in row["Tags"].split(";") if t.strip()]
+            rows.append(row)
+    return rows
+
+
+def validate_batch(rows: list[dict], seen_urls: set = None):
+    """Validate a batch in one pass. Returns (companies, rejects).
+
+    add_companies merges companies on Url, so a row without one, or with one
+    already seen in this import (seen_urls, updated here), would overwrite an
+    earlier company; such rows are rejected instead.
+    """
+    companies, rejects = read_pipeline.validate_batch(_companies_adapter, rows)
+    seen_urls = set() if seen_urls is None else seen_urls
+    unique = []
+    for c in companies:
+        if not (c.Url or "").strip():
+            rejects.append({"row": c.model_dump(), "errors": ["missing Url"]})
+        elif c.Url in seen_urls:
+            rejects.append({"row": c.model_dump(), "errors": ["duplicate Url"]})
+        else:
+            seen_urls.add(c.Url)
+            unique.append(c)
+    return unique, rejects
+
+
+def needs_geocode(company: Company) -> bool:
+    return not company.Lat or not company.Lon
+
+
+def geocode_batch(companies: list[Company]):
+    """Fill in coordinates, looking each distinct address up once. Returns
+    (companies, rejects).
+
+    Companies whose address cannot be geocoded are dropped and returned as
+    rejects.
+    """
+    addresses = {
+        (c.Address, c.City, c.State, c.ZipCode) for c in companies if needs_geocode(c)
+    }
+    found = get_lat_lons_from_addresses(list(addresses))
+
+    geocoded, rejects = [], []
+    for c in companies:
+        if needs_geocode(c):
+            c.Lat, c.Lon = found[(c.Address, c.City, c.State, c.ZipCode)]
+            if c.Lat is None or c.Lon is None:
+                rejects.append({"row": c.model_dump(), "errors": ["address not found"]})
+                continue
+        geocoded.append(c)
+    return geocoded, rejects
+
+
+def checkpoint_path(path: str) -> str:
+    return path + ".checkpoint"
+
+
+def load_checkpoint(path: str) -> int:
+    try:
+        with open(checkpoint_path(path)) as f:
+            return json.load(f)["rows_done"]
+    except FileNotFoundError:
+        return 0
+
+
+def save_checkpoint(path: str, rows_done: int):
+    # Written to a temp file first so a crash never leaves a torn checkpoint
+    tmp = checkpoint_path(path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"rows_done": rows_done}, f)
+    os.replace(tmp, checkpoint_path(path))
+
+
+def run_import(path: str, batch_size: int = DEFAULT_BATCH_SIZE, resume: bool = False):
+    rows = read_rows(path)
+    start_row = load_checkpoint(path) if resume else 0
+    if start_row:
+        logging.info(f"Resuming {path} at row {start_row}")
+
+    imported = 0
+    rejects = []
+    seen_urls = set()
+    # Rows before the checkpoint count too, so repeats of their Urls are caught
+    validate_batch(rows[:start_row], seen_urls)
+    started = time.perf_counter()
+    for offset in range(start_row, len(rows), batch_size):
+        batch = rows[offset : offset + batch_size]
+        companies, invalid = validate_batch(batch, seen_urls)
+        companies, not_found = geocode_batch(companies)
+        rejects += invalid + not_found
+
+        if companies:
+            add_companies(companies)
+        imported += len(companies)
+        save_checkpoint(path, offset + len(batch))
+
+        elapsed = time.perf_counter() - started
+        logging.info(
+            f"{offset + len(batch)}/{len(rows)} rows, {imported / elapsed:.1f} rows/sec"
+        )
+
+    elapsed = time.perf_counter() - started
+    # A finished import starts from scratch next time
+    if os.path.exists(checkpoint_path(path)):
+        os.remove(checkpoint_path(path))
+
+    return {
+        "imported": imported,
+        "rejected": len(rejects),
+        "seconds": elapsed,
+        "rows_per_sec": imported / elapsed if elapsed else 0.0,
+        "rejects": rejects,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="CSV or JSON file of companies")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--resume", action="store_true", help="Continue from the last checkpoint"
+    )
+    parser.add_argument("--rejects", help="Write rejected rows to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    report = run_import(args.path, args.batch_size, args.resume)
+
+    if args.rejects:
+        with open(args.rejects, "w") as f:
+            json.dump(report["rejects"], f, indent=2)
+    print(
+        f"Imported {report['imported']} companies, rejected {report['rejected']}, "
+        f"{report['rows_per_sec']:.1f} rows/sec"
+    )
+
+
+if __name__ == "__main__":
+    main()
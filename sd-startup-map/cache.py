@@ -0,0 +1,203 @@
+from collections import OrderedDict, deque
+from functools import wraps
+import streamlit as st
+from config import setting
+import threading
+import logging
+import time
+import sys
+
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Number of past versions whose changed company UUIDs are remembered
+CHANGE_LOG_SIZE = 1000
+# Seconds between checks of the database change cursor, which is how writes
+# from other processes (bulk_import.py, other app replicas) are noticed
+DEFAULT_POLL_INTERVAL = 5.0
+# Size estimate per item of cached lists, such as Tags
+ITEM_BYTES = 256
+
+
+def _freeze(value):
+    # Hashable, order independent form of function arguments
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+def estimate_bytes(value) -> int:
+    # Cheap stand-in for measuring: CompanyTable.nbytes, or a per item guess
+    nbytes = getattr(value, "nbytes", None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, (list, tuple, set, frozenset, dict)):
+        return sys.getsizeof(value) + len(value) * ITEM_BYTES
+    return sys.getsizeof(value)
+
+
+class VersionedCache:
+    """Results of read functions, valid until the dataset version changes.
+
+    Writes call bump() which invalidates everything at once, so reads never go
+    back to the database while nothing has changed. Writes made elsewhere are
+    found by poll(), which reads the database change cursor at most every
+    poll_interval seconds and bumps when it has moved. Entries are evicted
+    least recently used first once their estimated size passes max_bytes.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.cursor = None  # database change cursor at the last poll
+        # Change numbers of this process's writes above the cursor
+        self._own_changes = set()
+        self._polled = None  # monotonic time of the last poll
+        self.version = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, size)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)  # (version, changed, deleted)
+
+    def get_or_load(self, key, loader):
+        with self._lock:
+            key = (self.version, key)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+
+        value = loader()
+        size = estimate_bytes(value)
+
+        with self._lock:
+            # A write landed while loading, the value may already be stale
+            if key[0] != self.version or size > self.max_bytes:
+                return value
+            if key in self._entries:
+                self._bytes -= self._entries[key][1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return value
+
+    def bump(self, changed=(), deleted=(), reload=False, change=None):
+        """New version after a write to the changed/deleted company UUIDs. With
+        reload, anything may have changed and changes_since() cannot say what.
+        change, the write's change number, moves the cursor past it once every
+        change before it is accounted for, so poll() doesn't reload for it."""
+        with self._lock:
+            if change is not None and self.cursor is not None and change > self.cursor:
+                self._own_changes.add(change)
+                while self.cursor + 1 in self._own_changes:
+                    self.cursor += 1
+                    self._own_changes.remove(self.cursor)
+            self.version += 1
+            self._entries.clear()
+            self._bytes = 0
+            if reload:
+                self._changes.append((self.version, None, None))
+            else:
+                self._changes.append((self.version, set(changed), set(deleted)))
+        logging.debug(f"Dataset version bumped to {self.version}")
+
+    def poll(self, read_cursor) -> bool:
+        """Bump if the database cursor moved since the last poll. read_cursor()
+        is called at most once per poll_interval and may return None (no
+        cursor, e.g. in snapshot mode). True when this bumped."""
+        now = time.monotonic()
+        with self._lock:
+            if self._polled is not None and now - self._polled < self.poll_interval:
+                return False
+            self._polled = now
+        cursor = read_cursor()
+        with self._lock:
+            previous = self.cursor
+            if cursor is None or previous is None or cursor > previous:
+                self.cursor = cursor
+                self._own_changes = {c for c in self._own_changes if c > (cursor or 0)}
+        if previous is None or cursor is None or cursor <= previous:
+            return False
+        logging.debug(f"Database change cursor moved from {previous} to {cursor}")
+        # Which companies changed is not known here, stores fetch it by cursor
+        self.bump(reload=True)
+        return True
+
+    def changes_since(self, version: int):
+        """Company UUIDs (changed, deleted) after version, or None if the log no
+        longer reaches back that far or a reload happened since."""
+        with self._lock:
+            if version == self.version:
+                return set(), set()
+            if not self._changes or self._changes[0][0] > version + 1:
+                return None
+            changed, deleted = set(), set()
+            for v, c, d in self._changes:
+                if v > version:
+                    if c is None:
+                        return None
+                    changed = (changed - d) | c
+                    deleted = (deleted - c) | d
+            return changed, deleted
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "cursor": self.cursor,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+@st.cache_resource
+def get_dataset_cache() -> VersionedCache:
+    # Shared by every session in this process
+    return VersionedCache(
+        int(setting("DATA_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        float(setting("CHANGE_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)),
+    )
+
+
+def poll_database_changes() -> bool:
+    """Pick up writes made outside this process, at most once per
+    CHANGE_POLL_INTERVAL. Called before every cached read."""
+    # data_functions imports this module, import it late
+    from data_functions import get_change_cursor
+
+    return get_dataset_cache().poll(get_change_cursor)
+
+
+def versioned(func):
+    """Cache func's results in the dataset cache, keyed by its arguments."""
+
+    @wraps(func)
+    def wrapper(*args):
+        key = (func.__qualname__, _freeze(args))
+        poll_database_changes()
+        return get_dataset_cache().get_or_load(key, lambda: func(*args))
+
+    return wrapper
+
+
+def bump_dataset_version(changed=(), deleted=(), reload=False, change=None):
+    """Invalidate cached reads after a write to the given company UUIDs, or
+    after the whole dataset was replaced with reload. change is the write's
+    change number, if it returned one."""
+    get_dataset_cache().bump(changed, deleted, reload, change)
@@ -0,0 +1,149 @@
+import math
+
+
+# Points closer than this many screen pixels at a zoom level share a cluster
+CLUSTER_RADIUS_PX = 60
+# Above this zoom level every company gets its own pin
+MAX_CLUSTER_ZOOM = 16
+TILE_SIZE = 256
+
+
+def _cell(lat, lon, zoom):
+    # Web Mercator pixel coordinates, bucketed into CLUSTER_RADIUS_PX squares
+    scale = TILE_SIZE * 2**zoom / CLUSTER_RADIUS_PX
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = (lon + 180.0) / 360.0 * scale
+    sin = math.sin(math.radians(lat))
+    y = (0.5 - math.log((1 + sin) / (1 - sin)) / (4 * math.pi)) * scale
+    return math.floor(x), math.floor(y)
+
+
+class Cluster:
+    __slots__ = ("count", "lat_sum", "lon_sum", "id_sum")
+
+    def __init__(self):
+        self.count = 0
+        self.lat_sum = 0.0
+        self.lon_sum = 0.0
+        # With integer ids, a cluster of one holds exactly id_sum
+        self.id_sum = 0
+
+    @property
+    def lat(self):
+        return self.lat_sum / self.count
+
+    @property
+    def lon(self):
+        return self.lon_sum / self.count
+
+
+def _in_bounds(cluster, bounds):
+    if bounds is None:
+        return True
+    south, west, north, east = bounds
+    return south <= cluster.lat <= north and west <= cluster.lon <= east
+
+
+class ClusterIndex:
+    """Grid cluster aggregates for every zoom level up to MAX_CLUSTER_ZOOM.
+
+    Each level keeps a count and coordinate sums per cell, so adding or removing
+    a point touches one cell per level and nothing is recomputed from scratch.
+    A level is computed in one pass the first time it is queried and maintained
+    from then on, so zoom levels nobody looks at cost no memory.
+    Ids must be integers.
+    """
+
+    def __init__(self, max_zoom: int = MAX_CLUSTER_ZOOM):
+        self.max_zoom = max_zoom
+        self._levels = [None] * (max_zoom + 1)
+        self._points = {}  # id -> (lat, lon)
+
+    def _built_levels(self):
+        return ((z, cells) for z, cells in enumerate(self._levels) if cells is not None)
+
+    def _build(self, zoom):
+        # Same _cell as add/remove, so later updates land in the same cells
+        cells = {}
+        for id, (lat, lon) in self._points.items():
+            cluster = cells.setdefault(_cell(lat, lon, zoom), Cluster())
+            cluster.count += 1
+            cluster.lat_sum += lat
+            cluster.lon_sum += lon
+            cluster.id_sum += id
+        self._levels[zoom] = cells
+        return cells
+
+    def add(self, id: int, lat, lon):
+        self.remove(id)
+        if lat is None or lon is None:
+            return
+        self._points[id] = (lat, lon)
+        for zoom, cells in self._built_levels():
+            cluster = cells.setdefault(_cell(lat, lon, zoom), Cluster())
+            cluster.count += 1
+            cluster.lat_sum += lat
+            cluster.lon_sum += lon
+            cluster.id_sum += id
+
+    def remove(self, id: int):
+        point = self._points.pop(id, None)
+        if point is None:
+            return
+        lat, lon = point
+        for zoom, cells in self._built_levels():
+            key = _cell(lat, lon, zoom)
+            cluster = cells[key]
+            cluster.count -= 1
+            if cluster.count == 0:
+                del cells[key]
+                continue
+            cluster.lat_sum -= lat
+            cluster.lon_sum -= lon
+            cluster.id_sum -= id
+
+    def clear(self):
+        self._levels = [None] * (self.max_zoom + 1)
+        self._points.clear()
+
+    def query(self, zoom: int, bounds=None):
+        """Clusters at zoom as (lat, lon, count, id); id is None unless count is 1.
+
+        Returns None above max_zoom, where points should be drawn individually.
+        """
+        if zoom > self.max_zoom:
+            return None
+        zoom = max(int(zoom), 0)
+        cells = self._levels[zoom]
+        if cells is None:
+            cells = self._build(zoom)
+        return [
+            (c.lat, c.lon, c.count, c.id_sum if c.count == 1 else None)
+            for c in cells.values()
+            if _in_bounds(c, bounds)
+        ]
+
+
+def cluster_points(points, zoom: int, bounds=None):
+    """One-off clustering of (id, lat, lon) points at a single zoom level, for
+    filtered subsets that have no precomputed index. Same output as
+    ClusterIndex.query, with ids of any type."""
+    if zoom > MAX_CLUSTER_ZOOM:
+        return None
+    cells = {}
+    for id, lat, lon in points:
+        if lat is None or lon is None:
+            continue
+        cell = cells.setdefault(_cell(lat, lon, max(int(zoom), 0)), [0, 0.0, 0.0, id])
+        cell[0] += 1
+        cell[1] += lat
+        cell[2] += lon
+    results = []
+    for count, lat_sum, lon_sum, first_id in cells.values():
+        lat, lon = lat_sum / count, lon_sum / count
+        if bounds is not None and not (
+            bounds[0] <= lat <= bounds[2] and bounds[1] <= lon <= bounds[3]
+        ):
+            continue
+        results.append((lat, lon, count, first_id if count == 1 else None))
+    return results
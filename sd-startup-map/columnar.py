@@ -0,0 +1,415 @@
+from models import Company
+from itertools import chain
+import numpy as np
+import sys
+
+
+# Stands in for a missing StartupYear in the int32 column
+MISSING_YEAR = np.iinfo(np.int32).min
+
+# Company fields kept as plain Python string lists
+TEXT_FIELDS = (
+    "UUID",
+    "Name",
+    "Description",
+    "Url",
+    "LinkedInUrl",
+    "Logo",
+    "Address",
+    "ZipCode",
+)
+
+# Checked like Company's Optional[str] fields: a string or None, never coerced
+CHECKED_TEXT_FIELDS = TEXT_FIELDS + ("City", "State")
+
+# Rough memory per row of the text columns and tags, for cache accounting
+TEXT_BYTES_PER_ROW = 1024
+
+
+_TEXT_TYPES = {str, type(None)}
+
+
+def _check_text(field: str, values):
+    if not _TEXT_TYPES.issuperset(map(type, values)):
+        raise TypeError(f"{field} must be a string")
+
+
+class StringDictionary:
+    """Interns repeated strings (cities, states, tags) as small integer codes."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, value) -> int:
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(sys.intern(value))
+        return code
+
+    def decode(self, code: int):
+        return None if code < 0 else self.values[code]
+
+    def code(self, value) -> int:
+        """Code of an existing value, -1 if unknown. Never adds."""
+        return self._codes.get(value, -1)
+
+    def copy(self) -> "StringDictionary":
+        other = StringDictionary()
+        other.values = list(self.values)
+        other._codes = dict(self._codes)
+        return other
+
+
+class CompanyTable:
+    """Companies stored column by column.
+
+    Coordinates and StartupYear live in numpy arrays, City/State/Tags are
+    dictionary encoded and the remaining text fields are Python lists. Rows are
+    addressed by slot; a removed row leaves an empty slot (UUID None) that the
+    caller may reuse. Company objects are only built on demand by company().
+    """
+
+    def __init__(self, capacity: int = 0):
+        capacity = max(capacity, 16)
+        self.size = 0  # slots in use, including emptied ones
+        self.lat = np.full(capacity, np.nan)
+        self.lon = np.full(capacity, np.nan)
+        self.year = np.full(capacity, MISSING_YEAR, dtype=np.int32)
+        self.city = np.full(capacity, -1, dtype=np.int32)
+        self.state = np.full(capacity, -1, dtype=np.int32)
+        self.text = {field: [] for field in TEXT_FIELDS}
+        self.tags = []  # slot -> tuple of tag codes
+        self.cities = StringDictionary()
+        self.states = StringDictionary()
+        self.tag_names = StringDictionary()
+        self.rejects = []  # {"row", "errors"} for records that were skipped
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated memory use: the numeric columns exactly, the rest per row."""
+        numeric = sum(
+            getattr(self, name).nbytes
+            for name in ("lat", "lon", "year", "city", "state")
+        )
+        return numeric + self.size * TEXT_BYTES_PER_ROW
+
+    def copy(self) -> "CompanyTable":
+        other = CompanyTable.__new__(CompanyTable)
+        other.size = self.size
+        for name in ("lat", "lon", "year", "city", "state"):
+            setattr(other, name, getattr(self, name).copy())
+        other.text = {field: list(values) for field, values in self.text.items()}
+        other.tags = list(self.tags)
+        other.cities = self.cities.copy()
+        other.states = self.states.copy()
+        other.tag_names = self.tag_names.copy()
+        other.rejects = list(self.rejects)
+        return other
+
+    def _grow(self, needed: int):
+        capacity = len(self.lat)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        for name, fill in (
+            ("lat", np.nan),
+            ("lon", np.nan),
+            ("year", MISSING_YEAR),
+            ("city", -1),
+            ("state", -1),
+        ):
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _new_slot(self) -> int:
+        self._grow(self.size + 1)
+        for values in self.text.values():
+            values.append(None)
+        self.tags.append(())
+        self.size += 1
+        return self.size - 1
+
+    def set_row(
+        self,
+        slot,
+        uuid,
+        name,
+        description,
+        url,
+        linkedin,
+        logo,
+        address,
+        zip_code,
+        city,
+        state,
+        lat,
+        lon,
+        year,
+        tags,
+    ):
+        """Write one row, coercing the numeric fields. Raises ValueError or
+        TypeError for values a Company could not hold, leaving the slot as it was."""
+        if not isinstance(name, str):
+            raise TypeError("Name must be a string")
+        for field, value in (
+            ("UUID", uuid),
+            ("Description", description),
+            ("Url", url),
+            ("LinkedInUrl", linkedin),
+            ("Logo", logo),
+            ("Address", address),
+            ("ZipCode", zip_code),
+            ("City", city),
+            ("State", state),
+        ):
+            _check_text(field, (value,))
+        _check_text("Tags", tags or ())
+        lat = np.nan if lat is None else float(lat)
+        lon = np.nan if lon is None else float(lon)
+        if year is None:
+            year = MISSING_YEAR
+        else:
+            year = int(year)
+            if not MISSING_YEAR < year <= np.iinfo(np.int32).max:
+                raise OverflowError("StartupYear out of range")
+        tags = tuple(self.tag_names.encode(t) for t in (tags or ()))
+
+        if slot is None:
+            slot = self._new_slot()
+        text = self.text
+        text["UUID"][slot] = uuid
+        text["Name"][slot] = name
+        text["Description"][slot] = description
+        text["Url"][slot] = url
+        text["LinkedInUrl"][slot] = linkedin
+        text["Logo"][slot] = logo
+        text["Address"][slot] = address
+        text["ZipCode"][slot] = zip_code
+        self.city[slot] = self.cities.encode(city)
+        self.state[slot] = self.states.encode(state)
+        self.lat[slot] = lat
+        self.lon[slot] = lon
+        self.year[slot] = year
+        self.tags[slot] = tags
+        return slot
+
+    def set_company(self, slot, c: Company) -> int:
+        return self.set_row(
+            slot,
+            c.UUID,
+            c.Name,
+            c.Description,
+            c.Url,
+            c.LinkedInUrl,
+            c.Logo,
+            c.Address,
+            c.ZipCode,
+            c.City,
+            c.State,
+            c.Lat,
+            c.Lon,
+            c.StartupYear,
+            c.Tags,
+        )
+
+    def clear_row(self, slot: int):
+        for values in self.text.values():
+            values[slot] = None
+        self.lat[slot] = self.lon[slot] = np.nan
+        self.year[slot] = MISSING_YEAR
+        self.city[slot] = self.state[slot] = -1
+        self.tags[slot] = ()
+
+    def copy_row(self, other: "CompanyTable", row: int, slot=None) -> int:
+        """Copy row of another table into slot (or a new slot)."""
+        text = other.text
+        year = other.year[row]
+        lat, lon = other.lat[row], other.lon[row]
+        return self.set_row(
+            slot,
+            text["UUID"][row],
+            text["Name"][row],
+            text["Description"][row],
+            text["Url"][row],
+            text["LinkedInUrl"][row],
+            text["Logo"][row],
+            text["Address"][row],
+            text["ZipCode"][row],
+            other.cities.decode(other.city[row]),
+            other.states.decode(other.state[row]),
+            None if np.isnan(lat) else lat,
+            None if np.isnan(lon) else lon,
+            None if year == MISSING_YEAR else year,
+            other.row_tags(row),
+        )
+
+    def row_tags(self, slot: int) -> list[str]:
+        return [self.tag_names.values[code] for code in self.tags[slot]]
+
+    def company(self, slot: int) -> Company:
+        text = self.text
+        if text["UUID"][slot] is None:
+            return None
+        lat, lon, year = self.lat[slot], self.lon[slot], self.year[slot]
+        # Values were checked on the way in
+        return Company.model_construct(
+            UUID=text["UUID"][slot],
+            Name=text["Name"][slot],
+            Description=text["Description"][slot],
+            Url=text["Url"][slot],
+            LinkedInUrl=text["LinkedInUrl"][slot],
+            Logo=text["Logo"][slot],
+            Address=text["Address"][slot],
+            ZipCode=text["ZipCode"][slot],
+            City=self.cities.decode(self.city[slot]),
+            State=self.states.decode(self.state[slot]),
+            Lat=None if np.isnan(lat) else float(lat),
+            Lon=None if np.isnan(lon) else float(lon),
+            StartupYear=None if year == MISSING_YEAR else int(year),
+            Tags=self.row_tags(slot),
+        )
+
+    def __iter__(self):
+        for slot in range(self.size):
+            company = self.company(slot)
+            if company is not None:
+                yield company
+
+    @classmethod
+    def from_records(cls, records, keys) -> "CompanyTable":
+        """Build straight from neo4j records without per row dicts or models.
+
+        Records are transposed into columns in one pass. Should any value fail
+        to convert, rows are added one at a time instead so only the bad ones
+        are rejected.
+        """
+        n = len(records)
+        # neo4j.Record overrides __iter__ in Python; tuple's own is far faster
+        rows = [tuple.__iter__(r) for r in records]
+        columns = list(zip(*rows)) if n else [() for _ in keys]
+        at = {key: i for i, key in enumerate(keys)}
+
+        def column(key):
+            i = at.get(key)
+            return columns[i] if i is not None else (None,) * n
+
+        try:
+            table = cls(n)
+            names = column("Name")
+            if not all(type(name) is str for name in names):
+                raise TypeError("Name must be a string")
+            for field in CHECKED_TEXT_FIELDS:
+                _check_text(field, column(field))
+            _check_text("Tags", chain.from_iterable(t or () for t in column("Tags")))
+            table.lat[:n] = [np.nan if v is None else v for v in column("Lat")]
+            table.lon[:n] = [np.nan if v is None else v for v in column("Lon")]
+            table.year[:n] = [
+                MISSING_YEAR if v is None else v for v in column("StartupYear")
+            ]
+        except (TypeError, ValueError, OverflowError):
+            return cls._from_rows(records, keys)
+
+        for field in TEXT_FIELDS:
+            table.text[field] = list(column(field))
+        encode = table.cities.encode
+        table.city[:n] = [encode(v) for v in column("City")]
+        encode = table.states.encode
+        table.state[:n] = [encode(v) for v in column("State")]
+        encode = table.tag_names.encode
+        table.tags = [tuple(encode(t) for t in tags or ()) for tags in column("Tags")]
+        table.size = n
+        return table
+
+    @classmethod
+    def _from_rows(cls, records, keys) -> "CompanyTable":
+        table = cls(len(records))
+        at = {key: i for i, key in enumerate(keys)}
+        order = [
+            at.get(k)
+            for k in (
+                "UUID",
+                "Name",
+                "Description",
+                "Url",
+                "LinkedInUrl",
+                "Logo",
+                "Address",
+                "ZipCode",
+                "City",
+                "State",
+                "Lat",
+                "Lon",
+                "StartupYear",
+                "Tags",
+            )
+        ]
+        for r in records:
+            try:
+                table.set_row(None, *(None if i is None else r[i] for i in order))
+            except (TypeError, ValueError, OverflowError) as e:
+                table.rejects.append(
+                    {"row": dict(zip(keys, tuple.__iter__(r))), "errors": [str(e)]}
+                )
+        return table
+
+
+class CompanySelection:
+    """A subset of a CompanyTable's slots with vectorized column access."""
+
+    def __init__(self, table: CompanyTable, slots):
+        self.table = table
+        self.slots = np.asarray(slots, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __iter__(self):
+        for slot in self.slots:
+            yield self.table.company(slot)
+
+    @property
+    def lats(self) -> np.ndarray:
+        return self.table.lat[self.slots]
+
+    @property
+    def lons(self) -> np.ndarray:
+        return self.table.lon[self.slots]
+
+    @property
+    def names(self) -> list[str]:
+        names = self.table.text["Name"]
+        return [names[s] for s in self.slots]
+
+    @property
+    def uuids(self) -> list[str]:
+        uuids = self.table.text["UUID"]
+        return [uuids[s] for s in self.slots]
+
+    def located(self) -> "CompanySelection":
+        """Only rows that have coordinates."""
+        keep = ~(np.isnan(self.lats) | np.isnan(self.lons))
+        return CompanySelection(self.table, self.slots[keep])
+
+    def median_center(self):
+        """(median lat, median lon), ignoring missing coordinates."""
+        return float(np.nanmedian(self.lats)), float(np.nanmedian(self.lons))
+
+    def bounds(self):
+        """(south, west, north, east) around every located company."""
+        lats, lons = self.lats, self.lons
+        return (
+            float(np.nanmin(lats)),
+            float(np.nanmin(lons)),
+            float(np.nanmax(lats)),
+            float(np.nanmax(lons)),
+        )
@@ -0,0 +1,318 @@
+from cache import get_dataset_cache, poll_database_changes
+from data_functions import (
+    get_companies,
+    get_companies_by_uuid,
+    get_change_cursor,
+    get_changes,
+    query_companies,
+)
+from models import Company
+from columnar import CompanyTable, CompanySelection
+from spatial import GridIndex
+from clustering import ClusterIndex
+from text_search import TextIndex, tokenize
+from tag_stats import TagStats, DEFAULT_TOP_K
+import streamlit as st
+import numpy as np
+import threading
+import logging
+
+
+# How far from a company a map click may land and still be on its marker
+MARKER_MATCH_KM = 0.001
+
+
+def bit_positions(bits: int) -> np.ndarray:
+    """Indexes of the set bits in an int bitset, in ascending order."""
+    if bits == 0:
+        return np.empty(0, dtype=np.int64)
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    unpacked = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")
+    return np.flatnonzero(unpacked)
+
+
+def bits_from_positions(positions, size: int) -> int:
+    """Inverse of bit_positions."""
+    flags = np.zeros(size, dtype=bool)
+    flags[positions] = True
+    return int.from_bytes(np.packbits(flags, bitorder="little").tobytes(), "little")
+
+
+class CompanyStore:
+    """All companies held in memory with a tag -> bitset index.
+
+    Companies live in a columnar CompanyTable, one slot each; bit i of a tag's
+    bitset is set when the company in slot i has that tag. Tag filters are then
+    a handful of big-int ANDs/ORs and return a CompanySelection of slots.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None  # Dataset version the contents reflect
+        self.cursor = None  # Change number the contents reflect, if known
+        self._table = CompanyTable()
+        self._free = []  # reusable empty slots
+        self._by_uuid = {}  # UUID -> slot
+        self._tag_bits = {}  # tag name -> int bitset of slots
+        self._all_bits = 0
+        self._grid = GridIndex()  # slot locations
+        self._clusters = ClusterIndex()  # per zoom level aggregates of slots
+        self._search_index = None  # TextIndex of slots, built on first search
+        self._tag_stats = TagStats()  # tag counts and co-occurrences
+
+    def load(self, table: CompanyTable):
+        # Query results are shared through the dataset cache, so the store
+        # works on a copy. Read-only tables (a mapped snapshot) are used as is.
+        if table.lat.flags.writeable:
+            table = table.copy()
+        # Later rows win when a UUID appears twice
+        by_uuid, free = {}, []
+        for slot, uuid in enumerate(table.text["UUID"]):
+            if uuid in by_uuid:
+                table.clear_row(by_uuid[uuid])
+                free.append(by_uuid[uuid])
+            by_uuid[uuid] = slot
+        slots = sorted(by_uuid.values())
+
+        # Bitsets are built once from slot lists rather than OR-ing bit by bit
+        tag_slots = {}
+        for slot in slots:
+            for code in set(table.tags[slot]):
+                tag_slots.setdefault(code, []).append(slot)
+        with self.lock:
+            self._table, self._free, self._by_uuid = table, free, by_uuid
+            self._tag_bits = {
+                table.tag_names.values[code]: bits_from_positions(positions, len(table))
+                for code, positions in tag_slots.items()
+            }
+            self._all_bits = bits_from_positions(slots, len(table))
+            self._grid.clear()
+            self._clusters.clear()
+            self._search_index = None
+            self._tag_stats.build(table.row_tags(slot) for slot in slots)
+            for slot in slots:
+                self._index_location(slot)
+
+    def _index_location(self, slot):
+        lat, lon = self._table.lat[slot], self._table.lon[slot]
+        if np.isnan(lat) or np.isnan(lon):
+            return
+        self._grid.add(slot, float(lat), float(lon))
+        self._clusters.add(slot, float(lat), float(lon))
+
+    def _add(self, write_row) -> int:
+        # write_row(slot or None) stores the row and returns its slot
+        slot = write_row(self._free.pop() if self._free else None)
+        self._by_uuid[self._table.text["UUID"][slot]] = slot
+        bit = 1 << slot
+        self._all_bits |= bit
+        self._index_location(slot)
+        tags = self._table.row_tags(slot)
+        for tag in set(tags):
+            self._tag_bits[tag] = self._tag_bits.get(tag, 0) | bit
+        self._tag_stats.add(tags)
+        if self._search_index is not None:
+            self._search_index.add(slot, self._text_fields(slot))
+        return slot
+
+    def _text_fields(self, slot) -> dict:
+        text = self._table.text
+        return {
+            "Name": text["Name"][slot],
+            "Description": text["Description"][slot],
+            "Tags": self._table.row_tags(slot),
+        }
+
+    def _text_index(self) -> TextIndex:
+        if self._search_index is None:
+            index = TextIndex()
+            for slot in self._by_uuid.values():
+                index.add(slot, self._text_fields(slot))
+            self._search_index = index
+        return self._search_index
+
+    def upsert(self, company: Company):
+        with self.lock:
+            self.remove(company.UUID)
+            self._add(lambda slot: self._table.set_company(slot, company))
+
+    def upsert_row(self, table: CompanyTable, row: int):
+        """Insert or replace from a row of another table, e.g. a query result."""
+        with self.lock:
+            self.remove(table.text["UUID"][row])
+            self._add(lambda slot: self._table.copy_row(table, row, slot))
+
+    def remove(self, uuid: str):
+        with self.lock:
+            slot = self._by_uuid.pop(uuid, None)
+            if slot is None:
+                return
+            mask = ~(1 << slot)
+            self._all_bits &= mask
+            self._grid.remove(slot)
+            self._clusters.remove(slot)
+            if self._search_index is not None:
+                self._search_index.remove(slot)
+            tags = self._table.row_tags(slot)
+            self._tag_stats.remove(tags)
+            for tag in set(tags):
+                bits = self._tag_bits[tag] & mask
+                if bits:
+                    self._tag_bits[tag] = bits
+                else:
+                    del self._tag_bits[tag]
+            self._table.clear_row(slot)
+            self._free.append(slot)
+
+    def get(self, uuid: str) -> Company:
+        """Company materialized from its columns, or None."""
+        slot = self._by_uuid.get(uuid)
+        return None if slot is None else self._table.company(slot)
+
+    def at(self, lat, lon, name: str = None) -> str:
+        """UUID of the company located at (lat, lon), or None. name, such as
+        a clicked marker's tooltip, picks between companies at the same spot."""
+        with self.lock:
+            slots, _ = self._grid.nearest(lat, lon, radius_km=MARKER_MATCH_KM)
+            uuids = self._table.text["UUID"]
+            names = self._table.text["Name"]
+            for slot in slots:
+                if names[slot] == name:
+                    return uuids[slot]
+            return uuids[slots[0]] if slots else None
+
+    def __len__(self):
+        return len(self._by_uuid)
+
+    def tags(self) -> list[str]:
+        return sorted(self._tag_bits)
+
+    def tag_counts(self) -> dict:
+        """tag -> number of companies with it."""
+        with self.lock:
+            return dict(self._tag_stats.counts)
+
+    def related_tags(self, tags: list[str], k: int = DEFAULT_TOP_K) -> list[str]:
+        """Tags most often found together with tags, best first."""
+        with self.lock:
+            return self._tag_stats.suggest(tags, k)
+
+    def select(self, slots) -> CompanySelection:
+        return CompanySelection(self._table, slots)
+
+    def search(self, query: str, limit: int = None) -> CompanySelection:
+        """Companies whose Name, Description or tags match every word of query
+        (words match as prefixes), best BM25 score first."""
+        with self.lock:
+            ranked = self._text_index().search(query, limit)
+            return self.select([slot for slot, _ in ranked])
+
+    def filter(
+        self, tags: list[str], match_all: bool = False, bounds=None, text: str = None
+    ) -> CompanySelection:
+        """Companies with any (or, with match_all, every) of tags. No tags
+        returns every company. bounds, as (south, west, north, east), further
+        limits results to companies located inside it, and text to those that
+        search(text) finds, best match first."""
+        with self.lock:
+            if not tags:
+                bits = self._all_bits
+            elif match_all:
+                bits = self._all_bits
+                for tag in tags:
+                    bits &= self._tag_bits.get(tag, 0)
+            else:
+                bits = 0
+                for tag in tags:
+                    bits |= self._tag_bits.get(tag, 0)
+            if bounds is not None:
+                bits &= bits_from_positions(self._grid.query(bounds), len(self._table))
+            if tokenize(text):
+                # Ranked order, keeping the matches the other filters allow
+                ranked = self.search(text).slots
+                allowed = np.zeros(len(self._table), dtype=bool)
+                allowed[bit_positions(bits)] = True
+                return self.select(ranked[allowed[ranked]])
+            return self.select(bit_positions(bits))
+
+    def nearby(
+        self, lat, lon, radius_km: float = None, k: int = None, among=None
+    ) -> tuple:
+        """Companies nearest to (lat, lon), closest first: every one within
+        radius_km, the k nearest, or the k nearest within radius_km. among, a
+        CompanySelection such as the current filter results, limits the
+        candidates. Returns (CompanySelection, distances in km)."""
+        with self.lock:
+            keep = None
+            if among is not None:
+                allowed = np.zeros(len(self._table), dtype=bool)
+                allowed[among.slots] = True
+                keep = lambda slots: [slot for slot in slots if allowed[slot]]
+            slots, distances = self._grid.nearest(lat, lon, k, radius_km, keep)
+            return self.select(slots), distances
+
+    def clusters(self, zoom: int, bounds=None):
+        """Precomputed clusters of all companies as (lat, lon, count, slot),
+        slot being set for clusters of one. None above the clustering zoom."""
+        with self.lock:
+            return self._clusters.query(zoom, bounds)
+
+
+@st.cache_resource
+def get_company_store() -> CompanyStore:
+    # Shared by every session in this process
+    return CompanyStore()
+
+
+def current_store() -> CompanyStore:
+    """The shared store, brought up to date with the dataset version.
+
+    Once loaded, the store catches up by asking the database for the changes
+    since its change cursor, whether the version moved for a write in this
+    process or for one the cursor poll found. Without a cursor (snapshot mode)
+    the in-process change log is used, and a full reload happens when it cannot
+    say what changed.
+    """
+    store = get_company_store()
+    cache = get_dataset_cache()
+    poll_database_changes()
+    with store.lock:
+        target = cache.version
+        if store.version == target:
+            return store
+
+        if store.version is not None and store.cursor is not None:
+            fetched, deleted, cursor = get_changes(store.cursor)
+            logging.debug(
+                f"Syncing company store from change {store.cursor} to {cursor}: {len(fetched)} changed, {len(deleted)} deleted"
+            )
+            for uuid in deleted:
+                store.remove(uuid)
+            for row in range(len(fetched)):
+                store.upsert_row(fetched, row)
+            store.cursor = cursor
+            store.version = target
+            return store
+
+        changes = None if store.version is None else cache.changes_since(store.version)
+        if changes is None:
+            logging.debug(f"Loading company store at version {target}")
+            # Read first, so changes during the load are fetched again later.
+            # The load skips the dataset cache, whose table may predate the
+            # cursor, and a snapshot has no cursor and nothing to miss.
+            cursor = get_change_cursor()
+            store.load(get_companies([]) if cursor is None else query_companies([]))
+            store.cursor = cursor
+        else:
+            changed, deleted = changes
+            logging.debug(
+                f"Refreshing company store to version {target}: {len(changed)} changed, {len(deleted)} deleted"
+            )
+            for uuid in deleted | changed:
+                store.remove(uuid)
+            if changed:
+                fetched = get_companies_by_uuid(changed)
+                for row in range(len(fetched)):
+                    store.upsert_row(fetched, row)
+        store.version = target
+    return store
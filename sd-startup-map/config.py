@@ -0,0 +1,18 @@
+import streamlit as st
+
+
+def setting(key, default):
+    """Optional value from st.secrets, or default when unset or no secrets file."""
+    try:
+        return st.secrets.get(key, default)
+    except FileNotFoundError:
+        return default
+
+
+def flag(key, default: bool) -> bool:
+    """Boolean setting. Strings, as env style secrets give, are false when
+    empty or one of "0", "false", "no" and "off"."""
+    value = setting(key, default)
+    if isinstance(value, str):
+        return value.strip().lower() not in ("", "0", "false", "no", "off")
+    return bool(value)
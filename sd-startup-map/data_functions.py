@@ -1,32 +1,38 @@
 from models import Tag, Company
-import streamlit as st
 from n4j import execute_query
-import uuid
-import datetime
-import requests
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from geocoding import get_geocoder
+from cache import versioned, bump_dataset_version
+from columnar import CompanyTable
+from read_pipeline import read, validated
+from snapshot import active_snapshot, check_writable
+from pydantic import TypeAdapter
 import logging
 
 
-@st.cache_data(ttl=15)
+_tags_adapter = TypeAdapter(list[Tag])
+_companies_adapter = TypeAdapter(list[Company])
+
+
+def _company_table(keys, records, report):
+    # Decoding and validation happen in the same vectorized pass
+    with report.stage("decode"):
+        table = CompanyTable.from_records(records, keys)
+    report.rejects += table.rejects
+    return table
+
+
+@versioned
 def get_tags():
     logging.debug(f"get_tags called")
+    snapshot = active_snapshot()
+    if snapshot is not None:
+        return [Tag(Name=name) for name in snapshot.tags()]
     tags_query = """
     MATCH (c:Company)-[:TAGGED]-(t)
     RETURN DISTINCT t
     ORDER BY t.Name
     """
-    records, _, _ = execute_query(tags_query, {})
-    results = []
-    for r in records:
-        data = r.data()["t"]
-        try:
-            tag = Tag(**data)
-            results.append(tag)
-        except Exception as e:
-            logging.error(f"\nProblem parsing Tag record: {r}: {e}")
-            continue
+    results, _ = read("get_tags", tags_query, {}, validated(_tags_adapter, "t"))
     return results
 
 
@@ -35,89 +41,112 @@ def sorted_tags():
     return sorted(set(t.Name for t in tags_list))
 
 
-@st.cache_data(ttl=15)
-def get_companies(tags: list[str]):
+@versioned
+def get_companies(tags: list[str]) -> CompanyTable:
+    snapshot = active_snapshot()
+    if snapshot is not None:
+        return snapshot.companies(tags)
+    return query_companies(tags)
+
 
+def query_companies(tags: list[str]) -> CompanyTable:
+    """get_companies straight from Neo4j, uncached."""
     if len(tags) > 0:
         query = """
         MATCH (l:Location)<-[:HAS_OFFICE]-(c:Company)
         OPTIONAL MATCH (c)-[:TAGGED]->(t:Tag)
         WHERE t.Name IN $tags
-        RETURN DISTINCT c.UUID as UUID, c.Description as Description, c.StartupYear as StartupYear, c.LinkedInUrl as LinkedInUrl, c.Url as Url, c.Name as Name, c.Logo as Logo, l.Latitude as Lat, l.Longitude as Lon, collect(t.Name) as Tags,l.Address as Address, l.City as City, l.State as State, l.Zip as Zip
+        RETURN DISTINCT c.UUID as UUID, c.Description as Description, c.StartupYear as StartupYear, c.LinkedInUrl as LinkedInUrl, c.Url as Url, c.Name as Name, c.Logo as Logo, l.Latitude as Lat, l.Longitude as Lon, collect(t.Name) as Tags,l.Address as Address, l.City as City, l.State as State, l.ZipCode as ZipCode
         """
         params = {"tags": tags}
     else:
         query = """
         MATCH (l:Location)<-[:HAS_OFFICE]-(c:Company)
         OPTIONAL MATCH (c)-[:TAGGED]->(t:Tag)
-        RETURN DISTINCT c.UUID as UUID, c.Description as Description, c.StartupYear as StartupYear, c.LinkedInUrl as LinkedInUrl, c.Url as Url, c.Name as Name, c.Logo as Logo, l.Latitude as Lat, l.Longitude as Lon, collect(t.Name) as Tags, l.Address as Address, l.City as City, l.State as State, l.Zip as Zip
+        RETURN DISTINCT c.UUID as UUID, c.Description as Description, c.StartupYear as StartupYear, c.LinkedInUrl as LinkedInUrl, c.Url as Url, c.Name as Name, c.Logo as Logo, l.Latitude as Lat, l.Longitude as Lon, collect(t.Name) as Tags, l.Address as Address, l.City as City, l.State as State, l.ZipCode as ZipCode
         """
         params = {}
 
-    records, _, _ = execute_query(query, params)
+    # Columnar, Company objects are only built when a row is needed
+    table, _ = read("get_companies", query, params, _company_table)
+    return table
+
+
+GET_COMPANIES_BY_UUID_QUERY = """
+UNWIND $uuids as uuid
+MATCH (l:Location)<-[:HAS_OFFICE]-(c:Company {UUID: uuid})
+OPTIONAL MATCH (c)-[:TAGGED]->(t:Tag)
+RETURN c.UUID as UUID, c.Description as Description, c.StartupYear as StartupYear, c.LinkedInUrl as LinkedInUrl, c.Url as Url, c.Name as Name, c.Logo as Logo, l.Latitude as Lat, l.Longitude as Lon, collect(t.Name) as Tags, l.Address as Address, l.City as City, l.State as State, l.ZipCode as ZipCode
+"""
+
+
+def get_companies_by_uuid(uuids: list[str]) -> CompanyTable:
+    """Uncached fetch of specific companies, used to refresh in-memory stores."""
+    snapshot = active_snapshot()
+    if snapshot is not None:
+        return snapshot.companies_by_uuid(uuids)
+    table, _ = read(
+        "get_companies_by_uuid",
+        GET_COMPANIES_BY_UUID_QUERY,
+        {"uuids": list(uuids)},
+        _company_table,
+    )
+    return table
 
-    results = []
-    for r in records:
-        data = r.data()
-        try:
-            company = Company(**data)
-            results.append(company)
-        except Exception as e:
-            logging.debug(f"\nProblem parsing Company record: {r}: {e}. Skipping...")
-            continue
 
-    return results
+FIND_COMPANY_QUERY = """
+MATCH (c:Company {Name: $name})-[:HAS_OFFICE]->(l:Location)
+OPTIONAL MATCH (c)-[:TAGGED]->(t:Tag)
+RETURN c.UUID as UUID, c.Description as Description, c.StartupYear as StartupYear, c.LinkedInUrl as LinkedInUrl, c.Url as Url, c.Name as Name, c.Logo as Logo, l.Latitude as Lat, l.Longitude as Lon, collect(t.Name) as Tags,l.Address as Address, l.City as City, l.State as State, l.ZipCode as ZipCode
+"""
 
 
 def find_company(name: str) -> Company:
-    query = """
-    MATCH (c:Company {Name: $name})-[:HAS_OFFICE]->(l:Location)
-    OPTIONAL MATCH (c)-[:TAGGED]->(t:Tag)
-    RETURN c.UUID as UUID, c.Description as Description, c.StartupYear as StartupYear, c.LinkedInUrl as LinkedInUrl, c.Url as Url, c.Name as Name, c.Logo as Logo, l.Latitude as Lat, l.Longitude as Lon, collect(t.Name) as Tags,l.Address as Address, l.City as City, l.State as State, l.Zip as Zip
-    """
+    snapshot = active_snapshot()
+    if snapshot is not None:
+        found = snapshot.find(name)
+        return found[0] if found else None
     params = {"name": name}
-    records, _, _ = execute_query(query, params)
-    for r in records:
-        data = r.data()
-        try:
-            company = Company(**data)
-            return company
-        except Exception as e:
-            logging.debug(f"\nProblem parsing Company record: {r}: {e}. Skipping...")
-            continue
-    return None
+    results, _ = read(
+        "find_company", FIND_COMPANY_QUERY, params, validated(_companies_adapter)
+    )
+    return results[0] if results else None
+
+
+CREATE_TAGS_QUERY = """
+UNWIND $tags as tag
+MERGE (t:Tag {
+    Name: tag
+})
+"""
 
 
 def create_new_tags(tags: list[str]):
-    query = """
-    UNWIND $tags as tag
-    MERGE (t:Tag {
-        Name: tag
-    })
-    """
+    check_writable()
     params = {"tags": tags}
-    return execute_query(query, params)
+    return execute_query(CREATE_TAGS_QUERY, params)
 
 
-@st.cache_data(ttl=10)
 def get_lat_lon_from_address(street_address, city, state, zip_code):
     address = f"{street_address}, {city}, {state}, {zip_code}"
 
-    try:
-        loc = Nominatim(user_agent="Geopy Library")
-
-        # entering the location name
-        getLoc = loc.geocode(address)
+    coordinates = get_geocoder().geocode(address)
+    if coordinates is None:
+        return None, None
+    return coordinates
 
-        return getLoc.latitude, getLoc.longitude
 
-    except (GeocoderTimedOut, GeocoderServiceError) as e:
-        logging.error(f"Geocoding error: {e}")
-        return None, None
+def get_lat_lons_from_addresses(addresses: list[tuple]) -> dict:
+    """Geocode many (street_address, city, state, zip_code) tuples concurrently.
 
+    Returns a dict of address tuple -> (lat, lon), (None, None) when not found.
+    """
+    joined = {a: ", ".join(str(part) for part in a) for a in addresses}
+    found = get_geocoder().geocode_many(list(joined.values()))
+    return {a: found[j] or (None, None) for a, j in joined.items()}
 
-def create_new_location(address: str, city: str, state: str, zip: str):
 
+def geocode_address(address: str, city: str, state: str, zip: str):
     # Find latitude and longitude from address
     lat, lon = get_lat_lon_from_address(address, city, state, zip)
 
@@ -127,17 +156,28 @@ def create_new_location(address: str, city: str, state: str, zip: str):
         )
         raise ValueError("Unable to find latitude and longitude for address")
 
-    query = """
-    MERGE (l:Location {
-        Address: $address,
-        City: $city,
-        State: $state,
-        ZipCode: $zip
-    })
-    ON CREATE SET
-        l.Latitude = $lat,
-        l.Longitude = $lon
-    """
+    return lat, lon
+
+
+# Coordinates duplicates Latitude/Longitude as a point for the point index
+CREATE_LOCATION_QUERY = """
+MERGE (l:Location {
+    Address: $address,
+    City: $city,
+    State: $state,
+    ZipCode: $zip
+})
+ON CREATE SET
+    l.Latitude = $lat,
+    l.Longitude = $lon,
+    l.Coordinates = point({latitude: $lat, longitude: $lon})
+"""
+
+
+def create_new_location(address: str, city: str, state: str, zip: str):
+    check_writable()
+    lat, lon = geocode_address(address, city, state, zip)
+
     params = {
         "address": address,
         "city": city,
@@ -146,30 +186,108 @@ def create_new_location(address: str, city: str, state: str, zip: str):
         "lat": lat,
         "lon": lon,
     }
-    return execute_query(query, params)
+    return execute_query(CREATE_LOCATION_QUERY, params)
+
+
+# Each mutation below is a single statement sent through execute_query, which
+# runs it as one managed (retried) write transaction. Either every node and
+# relationship is written or none are.
+
+# Every company write starts by taking the next change number and stamps it on
+# what it touched as ChangeSeq. Writes lock the sequence node, so numbers
+# follow commit order and get_changes() can use them as a cursor.
+NEXT_CHANGE_QUERY = """
+MERGE (seq:ChangeSequence {Name: "companies"})
+SET seq.Value = coalesce(seq.Value, 0) + 1
+WITH seq.Value AS change
+"""
+
+ADD_COMPANY_QUERY = (
+    NEXT_CHANGE_QUERY
+    + """
+MERGE (l:Location {Address: $Address, City: $City, State: $State, ZipCode: $ZipCode})
+ON CREATE SET
+    l.Latitude = $Lat,
+    l.Longitude = $Lon,
+    l.Coordinates = point({latitude: $Lat, longitude: $Lon})
+MERGE (c:Company {Url: $Url})
+ON CREATE SET
+    c.UUID = $UUID,
+    c.Description = $Description,
+    c.StartupYear = $StartupYear,
+    c.LinkedInUrl = $LinkedInUrl,
+    c.Name = $Name,
+    c.Logo = $Logo
+SET c.ChangeSeq = change
+MERGE (c)-[:HAS_OFFICE]->(l)
+FOREACH (tag IN $Tags |
+    MERGE (t:Tag {Name: tag})
+    MERGE (c)-[:TAGGED]->(t)
+)
+RETURN c.UUID AS UUID, change
+"""
+)
+
+UPDATE_COMPANY_QUERY = (
+    NEXT_CHANGE_QUERY
+    + """
+MATCH (c:Company {UUID: $UUID})
+SET
+    c.Url = $Url,
+    c.Description = $Description,
+    c.StartupYear = $StartupYear,
+    c.LinkedInUrl = $LinkedInUrl,
+    c.Name = $Name,
+    c.Logo = $Logo,
+    c.ChangeSeq = change
+WITH c, change
+OPTIONAL MATCH (c)-[removed:TAGGED]->(old_tag:Tag)
+WHERE old_tag.Name IN $removed_tags
+DELETE removed
+WITH DISTINCT c, change
+FOREACH (tag IN $added_tags |
+    MERGE (t:Tag {Name: tag})
+    MERGE (c)-[:TAGGED]->(t)
+)
+"""
+)
+
+# Appended to UPDATE_COMPANY_QUERY only when the address changed
+MOVE_OFFICE_QUERY = """
+WITH c, change
+MERGE (l:Location {Address: $Address, City: $City, State: $State, ZipCode: $ZipCode})
+ON CREATE SET
+    l.Latitude = $Lat,
+    l.Longitude = $Lon,
+    l.Coordinates = point({latitude: $Lat, longitude: $Lon})
+WITH c, change, l
+OPTIONAL MATCH (c)-[r:HAS_OFFICE]->(old:Location)
+WHERE old <> l
+FOREACH (_ IN CASE WHEN old IS NULL THEN [] ELSE [1] END |
+    MERGE (c)-[:HAD_OFFICE]->(old)
+)
+DELETE r
+WITH DISTINCT c, change, l
+MERGE (c)-[:HAS_OFFICE]->(l)
+"""
+
+# Ends UPDATE_COMPANY_QUERY, with or without MOVE_OFFICE_QUERY
+RETURN_CHANGE_QUERY = """
+RETURN change
+"""
+
+
+def _change(records):
+    # Change number a write returned, None when it matched nothing
+    return records[0]["change"] if records else None
 
 
 def add_company(company: Company):
-
-    # Create Location
-    # print(f"\nCreating new location for company: {company.__dict__}")
-
-    _, summary, _ = create_new_location(
+    check_writable()
+    lat, lon = geocode_address(
         company.Address, company.City, company.State, company.ZipCode
     )
-    logging.debug(f"Created new location with summary: {summary.__dict__}")
-
-    # Create Company
-    query = """
-    MERGE (c:Company {Url: $Url})
-    ON CREATE SET
-        c.UUID = $UUID,
-        c.Description = $Description,
-        c.StartupYear = $StartupYear,
-        c.LinkedInUrl = $LinkedInUrl,
-        c.Name = $Name,
-        c.Logo = $Logo
-    """
+
     params = {
         "UUID": company.UUID,
         "Description": company.Description,
@@ -178,114 +296,69 @@ def add_company(company: Company):
         "Url": company.Url,
         "Name": company.Name,
         "Logo": company.Logo,
-    }
-    _, summary, _ = execute_query(query, params)
-    logging.debug(f"Company created: {summary.__dict__}")
-
-    # Create Company -> Office relationship
-    query = """
-    MATCH (c:Company {Url: $Url})
-    WITH c
-    MATCH (l:Location {Address: $Address, City: $City, State: $State, ZipCode: $ZipCode})
-    MERGE (c)-[:HAS_OFFICE]->(l)
-    """
-    params = {
-        "Url": company.Url,
         "Address": company.Address,
         "City": company.City,
         "State": company.State,
         "ZipCode": company.ZipCode,
+        "Lat": lat,
+        "Lon": lon,
+        "Tags": company.Tags or [],
     }
-    _, summary, _ = execute_query(query, params)
-    logging.debug(
-        f"(Company)-[:HAS_OFFICE]->(Location) relationship created: {summary.__dict__}"
-    )
-
-    # Create Tags
-    if len(company.Tags) > 0:
-        _, summary, _ = create_new_tags(company.Tags)
-        logging.debug(f"Tags created: {summary.__dict__}")
-
-        # Create Company -> Tags Relationships
-        query = """
-        UNWIND $tags as tag
-        MATCH (c:Company {Url: $Url}), (t:Tag {Name: tag})
-        MERGE (c)-[:TAGGED]->(t)
-        """
-        params = {
-            "Url": company.Url,
-            "tags": company.Tags,
-        }
-        _, summary, _ = execute_query(query, params)
-        logging.debug(
-            f"(Company)-[:TAGGED]->(Tag) relationships created: {summary.__dict__}"
-        )
+    records, summary, _ = execute_query(ADD_COMPANY_QUERY, params)
+    bump_dataset_version(changed=[r["UUID"] for r in records], change=_change(records))
+    logging.debug(f"Company created: {summary.counters}")
 
     return
 
 
-def update_company(original: Company, new: Company):
-
-    # Create New Location if needed
-    if (
-        original.Address != new.Address
-        or original.City != new.City
-        or original.State != new.State
-        or original.ZipCode != new.ZipCode
-    ):
-        _, summary, _ = create_new_location(
-            new.Address, new.City, new.State, new.ZipCode
-        )
-        logging.debug(
-            f"Created new location for updated company: '{new.Name}' with summary: {summary.__dict__}"
-        )
+ADD_COMPANIES_QUERY = (
+    NEXT_CHANGE_QUERY
+    + """
+UNWIND $rows AS row
+MERGE (l:Location {Address: row.Address, City: row.City, State: row.State, ZipCode: row.ZipCode})
+ON CREATE SET
+    l.Latitude = row.Lat,
+    l.Longitude = row.Lon,
+    l.Coordinates = point({latitude: row.Lat, longitude: row.Lon})
+MERGE (c:Company {Url: row.Url})
+ON CREATE SET
+    c.UUID = row.UUID,
+    c.Description = row.Description,
+    c.StartupYear = row.StartupYear,
+    c.LinkedInUrl = row.LinkedInUrl,
+    c.Name = row.Name,
+    c.Logo = row.Logo
+SET c.ChangeSeq = change
+MERGE (c)-[:HAS_OFFICE]->(l)
+FOREACH (tag IN coalesce(row.Tags, []) |
+    MERGE (t:Tag {Name: tag})
+    MERGE (c)-[:TAGGED]->(t)
+)
+RETURN c.UUID AS UUID, change
+"""
+)
+
+
+def add_companies(companies: list[Company]):
+    """Write many already geocoded companies in one transaction."""
+    check_writable()
+    rows = [c.model_dump() for c in companies]
+    records, summary, _ = execute_query(ADD_COMPANIES_QUERY, {"rows": rows})
+    bump_dataset_version(changed=[r["UUID"] for r in records], change=_change(records))
+    logging.debug(f"{len(rows)} companies created: {summary.counters}")
+    return summary
+
+
+def tag_changes(original: list[str], new: list[str]):
+    """Return (added, removed) tag names between two tag lists."""
+    original = set(original or [])
+    new = set(new or [])
+    return sorted(new - original), sorted(original - new)
 
-        # Remove old (Company)-[:HAS_OFFICE]->(Location) relationship
-        query = """
-        MATCH (c:Company {Url: $Url})-[r:HAS_OFFICE]->(l)
-        MERGE (c)-[:HAD_OFFICE]->(l)
-        DELETE r
-        """
-        params = {
-            "Url": new.Url,
-            "Lat": new.Lat,
-            "Lon": new.Lon,
-        }
-        _, summary, _ = execute_query(query, params)
-        logging.debug(
-            f"(Company)-[:HAS_OFFICE]->(Location) relationship converted to [:HAD_OFFICE]: {summary.__dict__}"
-        )
-
-        # Add new (Company)-[:HAS_OFFICE]->(Location) relationship
-        query = """
-        MATCH (c:Company {Url: $Url}) 
-        WITH c
-        MATCH (l:Location {Address: $Address, City: $City, State: $State, ZipCode: $ZipCode})       
-        MERGE (c)-[:HAS_OFFICE]->(l)
-        """
-        params = {
-            "Url": new.Url,
-            "Address": new.Address,
-            "City": new.City,
-            "State": new.State,
-            "ZipCode": new.ZipCode,
-        }
-        _, summary, _ = execute_query(query, params)
-        logging.debug(
-            f"(Company)-[:HAS_OFFICE]->(Location) relationship created: {summary.__dict__}"
-        )
 
-    # Update Company record
-    query = """
-    MATCH (c:Company {UUID: $UUID})
-    SET
-        c.Url = $Url,
-        c.Description = $Description,
-        c.StartupYear = $StartupYear,
-        c.LinkedInUrl = $LinkedInUrl,
-        c.Name = $Name,
-        c.Logo = $Logo,
-    """
+def update_company(original: Company, new: Company):
+    check_writable()
+    added_tags, removed_tags = tag_changes(original.Tags, new.Tags)
     params = {
         "UUID": original.UUID,
         "Url": new.Url,
@@ -294,52 +367,112 @@ def update_company(original: Company, new: Company):
         "LinkedInUrl": new.LinkedInUrl,
         "Name": new.Name,
         "Logo": new.Logo,
+        "added_tags": added_tags,
+        "removed_tags": removed_tags,
     }
+    query = UPDATE_COMPANY_QUERY
 
-    # Remove old tags
-    query = """
-    MATCH (c:Company {UUID: $UUID})-[r:TAGGED]->(t:Tag)
-    DELETE r
-    """
-    params = {
-        "UUID": original.UUID,
-    }
-    _, summary, _ = execute_query(query, params)
+    # Move to a new Location if needed, keeping a [:HAD_OFFICE] to the old one
+    if (
+        original.Address != new.Address
+        or original.City != new.City
+        or original.State != new.State
+        or original.ZipCode != new.ZipCode
+    ):
+        lat, lon = geocode_address(new.Address, new.City, new.State, new.ZipCode)
+        params.update(
+            {
+                "Address": new.Address,
+                "City": new.City,
+                "State": new.State,
+                "ZipCode": new.ZipCode,
+                "Lat": lat,
+                "Lon": lon,
+            }
+        )
+        query += MOVE_OFFICE_QUERY
+
+    records, summary, _ = execute_query(query + RETURN_CHANGE_QUERY, params)
+    bump_dataset_version(changed=[original.UUID], change=_change(records))
     logging.debug(
-        f"Old tags removed from company: '{original.Name}' with summary: {summary.__dict__}"
+        f"Company '{new.Name}' updated, tags +{added_tags} -{removed_tags}: {summary.counters}"
     )
 
-    # Add any new tags
-    if len(new.Tags) > 0:
-        _, summary, _ = create_new_tags(new.Tags)
-        logging.debug(f"Tags created: {summary.__dict__}")
+    return
 
-        # Add (Company)-[:TAGGED]->(Tag) relationships
-        query = """
-        UNWIND $tags as tag
-        MATCH (c:Company {UUID: $UUID}), (t:Tag {Name: tag})
-        MERGE (c)-[:TAGGED]->(t)
-        """
-        params = {
-            "UUID": original.UUID,
-            "tags": new.Tags,
-        }
-        _, summary, _ = execute_query(query, params)
-        logging.debug(
-            f"(Company)-[:TAGGED]->(Tag) relationships created: {summary.__dict__}"
-        )
 
-    return
+# DETACH also removes (Company)-[:TAGGED]->(Tag) and office relationships. A
+# DeletedCompany tombstone lets get_changes() report the delete.
+DELETE_COMPANY_QUERY = (
+    NEXT_CHANGE_QUERY
+    + """
+MATCH (c:Company {UUID: $UUID})
+MERGE (d:DeletedCompany {UUID: c.UUID})
+SET d.ChangeSeq = change, d.DeletedAt = datetime()
+DETACH DELETE c
+RETURN change
+"""
+)
 
 
 def delete_company(uuid: str):
-    # Remove (Company)-[:TAGGED]->(Tag) relationships
-    query = """
-    MATCH (c:Company {UUID: $UUID})
-    DETACH DELETE c
-    """
+    check_writable()
     params = {
         "UUID": uuid,
     }
-    _, summary, _ = execute_query(query, params)
-    logging.debug(f"Company deleted: {summary.__dict__}")
+    records, summary, _ = execute_query(DELETE_COMPANY_QUERY, params)
+    bump_dataset_version(deleted=[uuid], change=_change(records))
+    logging.debug(f"Company deleted: {summary.counters}")
+
+
+CHANGE_CURSOR_QUERY = """
+OPTIONAL MATCH (seq:ChangeSequence {Name: "companies"})
+RETURN coalesce(seq.Value, 0) AS cursor
+"""
+
+DELETED_SINCE_QUERY = """
+OPTIONAL MATCH (seq:ChangeSequence {Name: "companies"})
+OPTIONAL MATCH (d:DeletedCompany)
+WHERE d.ChangeSeq > $since
+RETURN coalesce(seq.Value, 0) AS cursor, collect(d.UUID) AS deleted
+"""
+
+# Tags and office come with the company, so a changed tag edge or location
+# shows up as its company's row
+COMPANIES_CHANGED_SINCE_QUERY = """
+MATCH (c:Company)
+WHERE c.ChangeSeq > $since
+MATCH (l:Location)<-[:HAS_OFFICE]-(c)
+OPTIONAL MATCH (c)-[:TAGGED]->(t:Tag)
+RETURN c.UUID as UUID, c.Description as Description, c.StartupYear as StartupYear, c.LinkedInUrl as LinkedInUrl, c.Url as Url, c.Name as Name, c.Logo as Logo, l.Latitude as Lat, l.Longitude as Lon, collect(t.Name) as Tags, l.Address as Address, l.City as City, l.State as State, l.ZipCode as ZipCode
+"""
+
+
+def _first_row(keys, records, report):
+    return tuple(tuple.__iter__(records[0]))
+
+
+def get_change_cursor() -> int | None:
+    """The latest change number, None when serving a snapshot. Read it before
+    a full load; get_changes() from it then returns what the load missed."""
+    if active_snapshot() is not None:
+        return None
+    (cursor,), _ = read("get_change_cursor", CHANGE_CURSOR_QUERY, {}, _first_row)
+    return cursor
+
+
+def get_changes(since: int):
+    """Companies written and UUIDs deleted after the since cursor, as
+    (CompanyTable, deleted UUIDs, cursor to pass next time). Writes landing
+    while this runs may be returned again next time but are never missed."""
+    params = {"since": since}
+    # The cursor is read first, so it never covers a change not fetched
+    (cursor, deleted), _ = read(
+        "get_changes_deleted", DELETED_SINCE_QUERY, params, _first_row
+    )
+    changed, _ = read(
+        "get_changes", COMPANIES_CHANGED_SINCE_QUERY, params, _company_table
+    )
+    # Deleted and then added again
+    deleted = set(deleted) - set(changed.text["UUID"])
+    return changed, deleted, cursor
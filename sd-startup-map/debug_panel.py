@@ -0,0 +1,45 @@
+from instrumentation import (
+    recent_spans,
+    reset_spans,
+    script_run_stats,
+    span_aggregates,
+)
+from read_pipeline import last_reports
+from cache import get_dataset_cache
+from snapshot import snapshot_path
+from n4j import pool_metrics
+import streamlit as st
+
+
+def debug_panel():
+    """Span timings and resource stats, shown while TRACING is on."""
+    with st.expander("Debug"):
+        aggregates = span_aggregates()
+        st.caption("Span durations over recent runs (ms)")
+        # Shared by the whole process, e.g. to measure after a change of settings
+        st.button("Reset span timings", on_click=reset_spans)
+        st.dataframe(
+            [{"span": name, **stats} for name, stats in aggregates.items()],
+            hide_index=True,
+        )
+        st.caption("Latest spans")
+        st.dataframe(recent_spans(), hide_index=True)
+        st.caption("Latest reads")
+        st.dataframe(
+            [
+                {k: v for k, v in report.as_dict().items() if k != "rejects"}
+                for report in last_reports().values()
+            ],
+            hide_index=True,
+        )
+        c1, c2, c3 = st.columns(3)
+        c1.caption("Script runs")
+        c1.json(script_run_stats())
+        c2.caption("Dataset cache")
+        c2.json(get_dataset_cache().stats())
+        c3.caption("Neo4j pool")
+        # Asking for pool metrics would create a driver, which needs secrets
+        if snapshot_path() is not None:
+            c3.json({"snapshot mode": snapshot_path()})
+        else:
+            c3.json(pool_metrics())
@@ -0,0 +1,297 @@
+"""In-process stand-in for n4j.execute_query.
+
+FakeGraph answers the Cypher statements in data_functions (and schema) from a
+dict of companies and returns real neo4j.Record / EagerResult objects, so
+everything downstream of the driver runs as it does against a database. It
+counts round trips per statement. No network or database is involved:
+
+    graph = FakeGraph(synthetic_companies(10_000))
+    restore = install(graph)
+"""
+
+from neo4j import EagerResult, Record
+from collections import Counter
+from models import Company
+import data_functions as df
+import n4j
+import sys
+
+
+# Column order of the company read queries' RETURN clauses
+COMPANY_KEYS = [
+    "UUID",
+    "Description",
+    "StartupYear",
+    "LinkedInUrl",
+    "Url",
+    "Name",
+    "Logo",
+    "Lat",
+    "Lon",
+    "Tags",
+    "Address",
+    "City",
+    "State",
+    "ZipCode",
+]
+
+
+class FakeCounters:
+    def __init__(self, **counts):
+        self.nodes_created = 0
+        self.nodes_deleted = 0
+        self.relationships_created = 0
+        self.relationships_deleted = 0
+        self.properties_set = 0
+        self.__dict__.update(counts)
+
+    def __repr__(self):
+        return repr({k: v for k, v in self.__dict__.items() if v})
+
+
+class FakeSummary:
+    def __init__(self, counters: FakeCounters = None):
+        self.counters = counters or FakeCounters()
+        self.result_available_after = 0
+        self.result_consumed_after = 0
+        self.plan = None
+
+
+class FakeResult:
+    # What a result_transformer_ receives
+    def __init__(self, records, keys, summary):
+        self._records = records
+        self._keys = keys
+        self._summary = summary
+
+    def keys(self):
+        return self._keys
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def consume(self):
+        return self._summary
+
+
+def company_record(c: Company, tags=None) -> Record:
+    values = c.model_dump()
+    if tags is not None:
+        values["Tags"] = tags
+    return Record(zip(COMPANY_KEYS, (values[k] for k in COMPANY_KEYS)))
+
+
+class FakeGraph:
+    def __init__(self, companies=()):
+        self.companies = {}  # UUID -> Company
+        self._by_url = {}
+        # Built once per dataset version, so benchmarks time the code under
+        # test rather than the fake making records
+        self._all_records = None
+        self._tagged_records = {}  # frozenset of tags -> records
+        self.round_trips = 0
+        self.statements = Counter()  # handler name -> calls
+        # Change numbers as the write queries stamp them; loaded companies get 0
+        self.sequence = 0
+        self.change_seq = {}  # UUID -> ChangeSeq
+        self.tombstones = {}  # deleted UUID -> ChangeSeq
+        for company in companies:
+            self._put(company)
+
+    def __call__(self, query, params={}, result_transformer_=None, **kwargs):
+        self.round_trips += 1
+        handler = self._handler(query)
+        self.statements[handler.__name__] += 1
+        records, keys, counters = handler(params or {})
+        summary = FakeSummary(counters)
+        if result_transformer_ is not None:
+            return result_transformer_(FakeResult(records, keys, summary))
+        return EagerResult(records, summary, keys)
+
+    def reset_counts(self):
+        self.round_trips = 0
+        self.statements.clear()
+
+    def _handler(self, query):
+        handler = {
+            df.GET_COMPANIES_BY_UUID_QUERY: self.companies_by_uuid,
+            df.FIND_COMPANY_QUERY: self.company_by_name,
+            df.CREATE_TAGS_QUERY: self.no_op,
+            df.CREATE_LOCATION_QUERY: self.no_op,
+            df.ADD_COMPANY_QUERY: self.add_company,
+            df.ADD_COMPANIES_QUERY: self.add_companies,
+            df.UPDATE_COMPANY_QUERY + df.RETURN_CHANGE_QUERY: self.update_company,
+            df.UPDATE_COMPANY_QUERY
+            + df.MOVE_OFFICE_QUERY
+            + df.RETURN_CHANGE_QUERY: self.update_company,
+            df.DELETE_COMPANY_QUERY: self.delete_company,
+            df.CHANGE_CURSOR_QUERY: self.change_cursor,
+            df.DELETED_SINCE_QUERY: self.deleted_since,
+            df.COMPANIES_CHANGED_SINCE_QUERY: self.companies_changed_since,
+        }.get(query)
+        if handler is not None:
+            return handler
+        # get_tags and get_companies build their statements inline
+        if "RETURN DISTINCT t" in query:
+            return self.tags
+        if "WHERE t.Name IN $tags" in query:
+            return self.companies_tagged
+        if "RETURN DISTINCT c.UUID" in query:
+            return self.all_companies
+        if query.lstrip().startswith(
+            ("CREATE", "EXPLAIN", "MATCH (l:Location)", "MATCH (c:Company)")
+        ):
+            # Schema statements and backfills
+            return self.no_op
+        raise NotImplementedError(f"FakeGraph has no handler for: {query}")
+
+    def _put(self, company: Company, change: int = 0):
+        self.companies[company.UUID] = company
+        self._by_url[company.Url] = company.UUID
+        self.change_seq[company.UUID] = change
+        self._changed()
+
+    def _next_change(self) -> int:
+        self.sequence += 1
+        return self.sequence
+
+    def _changed(self):
+        self._all_records = None
+        self._tagged_records.clear()
+
+    # Reads
+
+    def tags(self, params):
+        names = sorted({t for c in self.companies.values() for t in c.Tags or []})
+        return [Record([("t", {"Name": name})]) for name in names], ["t"], None
+
+    def all_companies(self, params):
+        if self._all_records is None:
+            self._all_records = [company_record(c) for c in self.companies.values()]
+        return self._all_records, COMPANY_KEYS, None
+
+    def companies_tagged(self, params):
+        # Matches the query as written: every company, Tags narrowed to $tags
+        wanted = frozenset(params["tags"])
+        records = self._tagged_records.get(wanted)
+        if records is None:
+            records = self._tagged_records[wanted] = [
+                company_record(c, [t for t in c.Tags or [] if t in wanted])
+                for c in self.companies.values()
+            ]
+        return records, COMPANY_KEYS, None
+
+    def companies_by_uuid(self, params):
+        found = (self.companies.get(uuid) for uuid in params["uuids"])
+        return [company_record(c) for c in found if c is not None], COMPANY_KEYS, None
+
+    def change_cursor(self, params):
+        return [Record([("cursor", self.sequence)])], ["cursor"], None
+
+    def deleted_since(self, params):
+        deleted = [u for u, seq in self.tombstones.items() if seq > params["since"]]
+        record = Record([("cursor", self.sequence), ("deleted", deleted)])
+        return [record], ["cursor", "deleted"], None
+
+    def companies_changed_since(self, params):
+        records = [
+            company_record(self.companies[uuid])
+            for uuid, seq in self.change_seq.items()
+            if seq > params["since"]
+        ]
+        return records, COMPANY_KEYS, None
+
+    def company_by_name(self, params):
+        records = [
+            company_record(c)
+            for c in self.companies.values()
+            if c.Name == params["name"]
+        ]
+        return records, COMPANY_KEYS, None
+
+    # Writes
+
+    def add_company(self, params, change=None):
+        change = change or self._next_change()
+        existing = self._by_url.get(params["Url"])
+        if existing is not None:
+            company = self.companies[existing]
+            tags = sorted(set(company.Tags or []) | set(params["Tags"] or []))
+            self._put(company.model_copy(update={"Tags": tags}), change)
+            record = Record([("UUID", existing), ("change", change)])
+            return [record], ["UUID", "change"], FakeCounters()
+        self._put(Company(**params), change)
+        counters = FakeCounters(nodes_created=2, properties_set=len(params))
+        record = Record([("UUID", params["UUID"]), ("change", change)])
+        return [record], ["UUID", "change"], counters
+
+    def add_companies(self, params):
+        records = []
+        created = 0
+        # One change number for the whole statement
+        change = self._next_change()
+        for row in params["rows"]:
+            (record,), _, counters = self.add_company(row, change)
+            records.append(record)
+            created += counters.nodes_created
+        return records, ["UUID", "change"], FakeCounters(nodes_created=created)
+
+    def update_company(self, params):
+        change = self._next_change()
+        company = self.companies.get(params["UUID"])
+        if company is None:
+            return [], [], FakeCounters()
+        tags = set(company.Tags or []) - set(params["removed_tags"])
+        update = {
+            k: params[k]
+            for k in (
+                "Url",
+                "Description",
+                "StartupYear",
+                "LinkedInUrl",
+                "Name",
+                "Logo",
+            )
+        }
+        update["Tags"] = sorted(tags | set(params["added_tags"]))
+        # Present only when MOVE_OFFICE_QUERY is appended
+        for k in ("Address", "City", "State", "ZipCode", "Lat", "Lon"):
+            if k in params:
+                update[k] = params[k]
+        self._by_url.pop(company.Url, None)
+        self._put(company.model_copy(update=update), change)
+        record = Record([("change", change)])
+        return [record], ["change"], FakeCounters(properties_set=len(update))
+
+    def delete_company(self, params):
+        change = self._next_change()
+        company = self.companies.pop(params["UUID"], None)
+        if company is None:
+            return [], [], FakeCounters()
+        self._by_url.pop(company.Url, None)
+        self.change_seq.pop(company.UUID, None)
+        self.tombstones[company.UUID] = change
+        self._changed()
+        return [Record([("change", change)])], ["change"], FakeCounters(nodes_deleted=1)
+
+    def no_op(self, params):
+        return [], [], FakeCounters()
+
+
+def install(fake):
+    """Route n4j.execute_query, and every module that imported it, to fake.
+    Returns a function that undoes this."""
+    original = n4j.execute_query
+    patched = [
+        module
+        for module in list(sys.modules.values())
+        if getattr(module, "execute_query", None) is original
+    ]
+    for module in patched:
+        module.execute_query = fake
+
+    def restore():
+        for module in patched:
+            module.execute_query = original
+
+    return restore
@@ -0,0 +1,309 @@
+"""Local stand-in for the Firebase Auth REST API used by auth_functions.
+
+    python sd-startup-map/firebase_stub.py --port 9099 --user me@example.com:secret
+
+prints the secrets.toml lines that point the app at it. In-process:
+
+    stub = FirebaseStub(users={"me@example.com": "secret"})
+    restore = install(stub)
+
+Accounts live in memory. ID tokens are unsigned JWTs with a real exp claim, so
+auth_functions caches and refreshes them as it would Google's. Verification
+and password reset emails are recorded in stub.outbox instead of being sent;
+stub.verify_email() marks an address verified. It counts requests per endpoint
+and TCP connections, which shows whether keep-alive connections are reused.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from collections import Counter
+import auth_functions
+import argparse
+import threading
+import base64
+import secrets
+import json
+import time
+
+
+TOKEN_LIFETIME = 3600  # seconds, as Firebase issues them
+AUTH_PATH = "/identitytoolkit/v3/relyingparty"
+TOKEN_PATH = "/v1/token"
+AUTH_ENDPOINTS = (
+    "verifyPassword",
+    "getAccountInfo",
+    "getOobConfirmationCode",
+    "signupNewUser",
+    "deleteAccount",
+)
+
+
+class StubError(Exception):
+    # Firebase answers 400 with {"error": {"message": CODE}}
+    pass
+
+
+def _b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+
+class FirebaseStub:
+    def __init__(self, users: dict = None, token_lifetime: int = TOKEN_LIFETIME):
+        self.token_lifetime = token_lifetime
+        self._lock = threading.Lock()
+        self.accounts = {}  # email -> account
+        self.id_tokens = {}  # token -> (localId, expires)
+        self.refresh_tokens = {}  # token -> localId
+        self.outbox = []  # (requestType, email)
+        self.requests = Counter()  # endpoint -> calls
+        self.connections = 0
+        for email, password in (users or {}).items():
+            self._create(email, password)["emailVerified"] = True
+        self._server = None
+
+    # Accounts
+
+    def _create(self, email: str, password: str) -> dict:
+        account = self.accounts[email] = {
+            "localId": secrets.token_hex(14),
+            "email": email,
+            "password": password,
+            "emailVerified": False,
+            "createdAt": str(int(time.time() * 1000)),
+        }
+        return account
+
+    def verify_email(self, email: str):
+        with self._lock:
+            self.accounts[email]["emailVerified"] = True
+
+    def _by_id(self, local_id: str) -> dict:
+        return next(a for a in self.accounts.values() if a["localId"] == local_id)
+
+    def _issue(self, account: dict) -> dict:
+        now = int(time.time())
+        claims = {
+            "iss": "firebase-stub",
+            "sub": account["localId"],
+            "email": account["email"],
+            "iat": now,
+            "exp": now + self.token_lifetime,
+            "jti": secrets.token_hex(8),
+        }
+        id_token = f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(claims)}.stub"
+        refresh_token = secrets.token_urlsafe(32)
+        self.id_tokens[id_token] = (account["localId"], claims["exp"])
+        self.refresh_tokens[refresh_token] = account["localId"]
+        return {
+            "idToken": id_token,
+            "refreshToken": refresh_token,
+            "expiresIn": str(self.token_lifetime),
+            "localId": account["localId"],
+            "email": account["email"],
+        }
+
+    def _account_for(self, id_token: str) -> dict:
+        local_id, expires = self.id_tokens.get(id_token, (None, 0))
+        if local_id is None:
+            raise StubError("INVALID_ID_TOKEN")
+        if expires <= time.time():
+            raise StubError("TOKEN_EXPIRED")
+        return self._by_id(local_id)
+
+    # Endpoints
+
+    def verifyPassword(self, body: dict) -> dict:
+        if not body.get("password"):
+            raise StubError("MISSING_PASSWORD")
+        account = self.accounts.get(body.get("email"))
+        if account is None:
+            raise StubError("EMAIL_NOT_FOUND")
+        if account["password"] != body["password"]:
+            raise StubError("INVALID_PASSWORD")
+        return {"registered": True, **self._issue(account)}
+
+    def getAccountInfo(self, body: dict) -> dict:
+        account = self._account_for(body.get("idToken"))
+        user = {k: v for k, v in account.items() if k != "password"}
+        return {"kind": "identitytoolkit#GetAccountInfoResponse", "users": [user]}
+
+    def getOobConfirmationCode(self, body: dict) -> dict:
+        if body.get("requestType") == "VERIFY_EMAIL":
+            email = self._account_for(body.get("idToken"))["email"]
+        else:
+            email = body.get("email")
+            if not email:
+                raise StubError("MISSING_EMAIL")
+            if email not in self.accounts:
+                raise StubError("EMAIL_NOT_FOUND")
+        self.outbox.append((body.get("requestType"), email))
+        return {"email": email}
+
+    def signupNewUser(self, body: dict) -> dict:
+        email, password = body.get("email"), body.get("password")
+        if not email:
+            raise StubError("MISSING_EMAIL")
+        if "@" not in email:
+            raise StubError("INVALID_EMAIL")
+        if not password:
+            raise StubError("MISSING_PASSWORD")
+        if len(password) < 6:
+            raise StubError("WEAK_PASSWORD : Password should be at least 6 characters")
+        if email in self.accounts:
+            raise StubError("EMAIL_EXISTS")
+        return self._issue(self._create(email, password))
+
+    def deleteAccount(self, body: dict) -> dict:
+        account = self._account_for(body.get("idToken"))
+        del self.accounts[account["email"]]
+        local_id = account["localId"]
+        self.id_tokens = {t: v for t, v in self.id_tokens.items() if v[0] != local_id}
+        self.refresh_tokens = {
+            t: v for t, v in self.refresh_tokens.items() if v != local_id
+        }
+        return {}
+
+    def token(self, form: dict) -> dict:
+        if form.get("grant_type") != "refresh_token":
+            raise StubError("INVALID_GRANT_TYPE")
+        local_id = self.refresh_tokens.pop(form.get("refresh_token"), None)
+        if local_id is None:
+            raise StubError("INVALID_REFRESH_TOKEN")
+        issued = self._issue(self._by_id(local_id))
+        return {
+            "id_token": issued["idToken"],
+            "refresh_token": issued["refreshToken"],
+            "expires_in": issued["expiresIn"],
+            "token_type": "Bearer",
+            "user_id": local_id,
+            "project_id": "firebase-stub",
+        }
+
+    def handle(self, path: str, body: bytes):
+        """(status, response) for a POST to path."""
+        if path == TOKEN_PATH:
+            endpoint = "token"
+            payload = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+        else:
+            endpoint = path.removeprefix(AUTH_PATH + "/")
+            if endpoint not in AUTH_ENDPOINTS:
+                return 404, {"error": {"code": 404, "message": "NOT_FOUND"}}
+            payload = json.loads(body or b"{}")
+        with self._lock:
+            self.requests[endpoint] += 1
+            try:
+                return 200, getattr(self, endpoint)(payload)
+            except StubError as e:
+                return 400, {"error": {"code": 400, "message": str(e)}}
+
+    # Server
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on a background thread. Returns the base URL."""
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="firebase-stub", daemon=True
+        ).start()
+        return self.url
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _handler_for(stub: FirebaseStub):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 so clients keep connections open between requests
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with stub._lock:
+                stub.connections += 1
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            status, response = stub.handle(
+                urlsplit(self.path).path,
+                self.rfile.read(length),
+            )
+            encoded = json.dumps(response).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=UTF-8")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def secrets_toml(url: str) -> str:
+    return "\n".join(
+        [
+            'FIREBASE_WEB_API_KEY = "stub"',
+            f'FIREBASE_AUTH_URL = "{url}{AUTH_PATH}"',
+            f'FIREBASE_TOKEN_URL = "{url}{TOKEN_PATH}"',
+        ]
+    )
+
+
+def install(stub: FirebaseStub):
+    """Start stub if needed and point auth_functions at it, for use without a
+    secrets file. Returns a function that undoes this."""
+    url = stub.url if stub._server is not None else stub.start()
+    original = (
+        auth_functions.FIREBASE_AUTH_URL,
+        auth_functions.FIREBASE_TOKEN_URL,
+        auth_functions._api_key,
+    )
+    auth_functions.FIREBASE_AUTH_URL = url + AUTH_PATH
+    auth_functions.FIREBASE_TOKEN_URL = url + TOKEN_PATH
+    auth_functions._api_key = lambda: "stub"
+
+    def restore():
+        (
+            auth_functions.FIREBASE_AUTH_URL,
+            auth_functions.FIREBASE_TOKEN_URL,
+            auth_functions._api_key,
+        ) = original
+
+    return restore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9099)
+    parser.add_argument(
+        "--user",
+        action="append",
+        default=[],
+        help="email:password of a verified account, may be repeated",
+    )
+    parser.add_argument("--token-lifetime", type=int, default=TOKEN_LIFETIME)
+    args = parser.parse_args()
+
+    users = dict(user.split(":", 1) for user in args.user)
+    stub = FirebaseStub(users, args.token_lifetime)
+    url = stub.start(args.host, args.port)
+    print(f"Firebase stub on {url}, add to .streamlit/secrets.toml:")
+    print(secrets_toml(url))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
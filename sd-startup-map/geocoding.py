@@ -0,0 +1,188 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from geopy.geocoders import Nominatim
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+import streamlit as st
+from config import setting
+import threading
+import sqlite3
+import logging
+import json
+import time
+import re
+
+
+DEFAULT_CACHE_PATH = ".geocode_cache.sqlite"
+# Nominatim usage policy allows at most one request per second
+DEFAULT_MIN_INTERVAL = 1.0
+# Failed lookups are retried after this long, successful ones never expire
+FAILURE_TTL = 24 * 60 * 60
+
+
+def normalize_address(address: str) -> str:
+    address = re.sub(r"[\s,]+", " ", address.lower())
+    return address.strip()
+
+
+## -------------------------------------------------------------------------------------------------
+## Backends ----------------------------------------------------------------------------------------
+## -------------------------------------------------------------------------------------------------
+
+
+class NominatimBackend:
+    def __init__(self, user_agent: str = "Geopy Library", timeout: float = 10):
+        self.client = Nominatim(user_agent=user_agent, timeout=timeout)
+
+    def geocode(self, address: str):
+        """Returns (lat, lon), or None when the address is not found."""
+        location = self.client.geocode(address)
+        if location is None:
+            return None
+        return location.latitude, location.longitude
+
+
+class StaticBackend:
+    """Offline stand-in answering from a dict of address -> (lat, lon)."""
+
+    def __init__(self, locations: dict = None):
+        self.locations = {
+            normalize_address(k): tuple(v) for k, v in (locations or {}).items()
+        }
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def geocode(self, address: str):
+        self.calls += 1
+        return self.locations.get(normalize_address(address))
+
+
+## -------------------------------------------------------------------------------------------------
+## Cache and throttling ----------------------------------------------------------------------------
+## -------------------------------------------------------------------------------------------------
+
+
+class GeocodeCache:
+    """SQLite backed address -> coordinates store, safe to share across threads."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS geocodes (
+                address TEXT PRIMARY KEY,
+                lat REAL,
+                lon REAL,
+                looked_up_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.commit()
+
+    def get(self, key: str):
+        """Returns (hit, coordinates). Coordinates are None for a cached miss."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT lat, lon, looked_up_at FROM geocodes WHERE address = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return False, None
+        lat, lon, looked_up_at = row
+        if lat is None or lon is None:
+            if time.time() - looked_up_at > FAILURE_TTL:
+                return False, None
+            return True, None
+        return True, (lat, lon)
+
+    def put(self, key: str, coordinates):
+        lat, lon = coordinates if coordinates else (None, None)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?)",
+                (key, lat, lon, time.time()),
+            )
+            self._db.commit()
+
+
+class Throttle:
+    """Spaces calls at least min_interval seconds apart across all threads."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Geocoder:
+    """Cached, rate limited geocoding with concurrent duplicate requests coalesced."""
+
+    def __init__(self, backend, cache: GeocodeCache, min_interval: float = 0.0):
+        self.backend = backend
+        self.cache = cache
+        self.throttle = Throttle(min_interval)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+    def geocode(self, address: str):
+        """Returns (lat, lon), or None if the address could not be found."""
+        key = normalize_address(address)
+        hit, coordinates = self.cache.get(key)
+        if hit:
+            return coordinates
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            self.throttle.wait()
+            coordinates = self.backend.geocode(address)
+            self.cache.put(key, coordinates)
+            future.set_result(coordinates)
+        except (GeocoderTimedOut, GeocoderServiceError) as e:
+            # Not cached, the next call will try again
+            logging.error(f"Geocoding error: {e}")
+            future.set_result(None)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+        return future.result()
+
+    def geocode_many(self, addresses: list[str], max_workers: int = 4) -> dict:
+        """Geocode addresses concurrently. Returns address -> (lat, lon) or None."""
+        unique = list(dict.fromkeys(addresses))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return dict(zip(unique, pool.map(self.geocode, unique)))
+
+
+@st.cache_resource
+def get_geocoder() -> Geocoder:
+    # GEOCODER = "offline" reads coordinates from GEOCODER_OFFLINE_FILE instead
+    # of calling Nominatim
+    if setting("GEOCODER", "nominatim") == "offline":
+        backend = StaticBackend.from_file(setting("GEOCODER_OFFLINE_FILE", ""))
+        min_interval = 0.0
+    else:
+        backend = NominatimBackend()
+        min_interval = float(setting("GEOCODER_MIN_INTERVAL", DEFAULT_MIN_INTERVAL))
+    cache = GeocodeCache(setting("GEOCODE_CACHE_PATH", DEFAULT_CACHE_PATH))
+    return Geocoder(backend, cache, min_interval)
@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+from collections import deque
+from config import flag
+import streamlit as st
+import numpy as np
+import threading
+import hashlib
+import logging
+import pickle
+import json
+import time
+
+
+# Spans kept for the debug panel, and durations kept per span name for p50/p95
+SPAN_HISTORY = 500
+DURATION_HISTORY = 1000
+
+# Structured span logs, one JSON object per line at DEBUG
+trace_logger = logging.getLogger("sd_startup_map.trace")
+
+# Process wide totals across every session
+_lock = threading.Lock()
+_totals = {"sessions": 0, "runs": 0}
+_spans = deque(maxlen=SPAN_HISTORY)
+_durations = {}  # span name -> deque of milliseconds
+_local = threading.local()
+_tracing = None  # from the TRACING setting on first use
+
+
+def count_script_run() -> int:
+    """Record one execution of app.py. Returns how many times it has run for
+    this session. In a browser st_folium's first post of the view adds a run
+    to every page load, and each pan, zoom or click adds another."""
+    runs = st.session_state.get("script_runs", 0) + 1
+    st.session_state["script_runs"] = runs
+    with _lock:
+        _totals["runs"] += 1
+        if runs == 1:
+            _totals["sessions"] += 1
+    return runs
+
+
+def script_run_stats() -> dict:
+    with _lock:
+        stats = dict(_totals)
+    stats["runs_per_session"] = (
+        stats["runs"] / stats["sessions"] if stats["sessions"] else 0.0
+    )
+    return stats
+
+
+def tracing_enabled() -> bool:
+    global _tracing
+    if _tracing is None:
+        _tracing = flag("TRACING", False)
+    return _tracing
+
+
+def set_tracing(enabled: bool):
+    global _tracing
+    _tracing = enabled
+
+
+class Span:
+    __slots__ = ("name", "parent", "attrs", "started", "duration_ms")
+
+    def __init__(self, name: str, parent, attrs: dict):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.started = time.time()
+        self.duration_ms = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def as_dict(self) -> dict:
+        return {
+            "span": self.name,
+            "parent": self.parent,
+            "started": self.started,
+            "duration_ms": self.duration_ms,
+            **self.attrs,
+        }
+
+
+class _NoSpan:
+    # Stands in for Span while tracing is off, so callers need no checks
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs):
+    """Context manager timing a block as a named span; the yielded span's
+    set() adds attributes such as rows or bytes. A no-op while tracing is off."""
+    if not tracing_enabled():
+        return _NO_SPAN
+    return _traced(name, attrs)
+
+
+@contextmanager
+def _traced(name, attrs):
+    stack = _local.__dict__.setdefault("stack", [])
+    current = Span(name, stack[-1].name if stack else None, attrs)
+    stack.append(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - started) * 1000
+        stack.pop()
+        with _lock:
+            _spans.append(current)
+            durations = _durations.get(name)
+            if durations is None:
+                durations = _durations[name] = deque(maxlen=DURATION_HISTORY)
+            durations.append(current.duration_ms)
+        trace_logger.debug(json.dumps(current.as_dict(), default=str))
+
+
+def query_hash(query: str) -> str:
+    """Short stable id for a Cypher statement, ignoring whitespace."""
+    return hashlib.sha1(" ".join(query.split()).encode()).hexdigest()[:12]
+
+
+def payload_bytes(records) -> int:
+    """Approximate size of query records, pickled. None if they won't pickle."""
+    try:
+        rows = [tuple(tuple.__iter__(r)) for r in records]
+        return len(pickle.dumps(rows, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return None
+
+
+def recent_spans(limit: int = 50) -> list[dict]:
+    with _lock:
+        spans = list(_spans)[-limit:]
+    return [s.as_dict() for s in reversed(spans)]
+
+
+def span_aggregates() -> dict:
+    """span name -> count, p50, p95 and max milliseconds over recent spans."""
+    with _lock:
+        durations = {name: list(values) for name, values in _durations.items()}
+    aggregates = {}
+    for name, values in sorted(durations.items()):
+        p50, p95 = np.percentile(values, [50, 95])
+        aggregates[name] = {
+            "count": len(values),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "max_ms": round(max(values), 3),
+        }
+    return aggregates
+
+
+def reset_spans():
+    with _lock:
+        _spans.clear()
+        _durations.clear()
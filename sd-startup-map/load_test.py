@@ -0,0 +1,372 @@
+"""Simulate many concurrent users of app.py against an in-memory dataset.
+
+    python sd-startup-map/load_test.py --users 50 --actions 20 --size 10000
+
+Each user is an AppTest session on its own thread. It loads the page, then
+searches by keyword or text, clicks pins, pans the map and, for the --editors
+share of users who are signed in, saves edits. st_folium is replaced by a
+stand-in browser that clicks markers actually drawn on the map and keeps the
+view between runs. Like the real component, a click or pan posts the new map
+value into session state and then reruns. Data comes from fake_neo4j and
+editors sign in to a firebase_stub, so no database or network is needed.
+Prints JSON: throughput, latency percentiles per action, memory per session,
+dataset cache hit ratio, and Neo4j round trips per script run.
+"""
+
+from fake_neo4j import FakeGraph, install
+from firebase_stub import FirebaseStub
+from synthetic_data import synthetic_companies, TAGS
+from cache import get_dataset_cache
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1.util import patch_config_options
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import data_functions
+import auth_functions
+import firebase_stub
+import streamlit_folium
+import streamlit as st
+import numpy as np
+import folium
+import argparse
+import threading
+import tracemalloc
+import random
+import json
+import gc
+import os
+import time
+
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Relative frequency of what a user does after loading the page
+ACTION_WEIGHTS = {"keyword": 35, "text": 15, "click": 30, "pan": 15, "edit": 5}
+TEXT_QUERIES = ["bio", "ai", "robot", "sorrento", "health", "labs", "carlsbad", ""]
+# Browser viewport the simulated map is drawn in
+VIEWPORT_PX = (1000, 700)
+# Session state key holding a user's simulated browser
+BROWSER_KEY = "load_test_browser"
+# app.py's st_folium key
+MAP_KEY = "map"
+RUN_TIMEOUT = 600
+# Editors sign in to a local Firebase stub as userN@example.com
+EDITOR_PASSWORD = "load-test"
+
+
+def _bounds(lat, lon, zoom):
+    degrees_per_px = 360 / (256 * 2**zoom)
+    dlon = VIEWPORT_PX[0] / 2 * degrees_per_px
+    dlat = VIEWPORT_PX[1] / 2 * degrees_per_px * np.cos(np.radians(lat))
+    return {
+        "_southWest": {"lat": lat - dlat, "lng": lon - dlon},
+        "_northEast": {"lat": lat + dlat, "lng": lon + dlon},
+    }
+
+
+def _drawn_markers(m):
+    # (lat, lon, tooltip, is_cluster) for every Marker on the map
+    for child in m._children.values():
+        if not isinstance(child, folium.Marker):
+            continue
+        tooltip = next(
+            (c.text for c in child._children.values() if isinstance(c, folium.Tooltip)),
+            None,
+        )
+        cluster = any(isinstance(c, folium.DivIcon) for c in child._children.values())
+        yield child.location[0], child.location[1], tooltip, cluster
+
+
+def browser_st_folium(m, key=None, **kwargs):
+    """Stands in for st_folium. Remembers the markers drawn on m for the next
+    click and returns the browser's view, as st_folium would."""
+    browser = st.session_state[BROWSER_KEY]
+    browser["markers"] = list(_drawn_markers(m))
+    browser.setdefault("center", tuple(m.location))
+    browser.setdefault("zoom", m.options["zoom"])
+    return _posted(browser)
+
+
+def _posted(browser) -> dict:
+    # The component value the map posts back
+    (lat, lon), zoom = browser["center"], browser["zoom"]
+    clicked, tooltip = browser.get("clicked") or (None, None)
+    return {
+        "last_clicked": None,
+        "last_object_clicked": clicked,
+        "last_object_clicked_tooltip": tooltip,
+        "bounds": _bounds(lat, lon, zoom),
+        "zoom": zoom,
+        "center": {"lat": lat, "lng": lon},
+    }
+
+
+def interact(browser, action: str) -> dict:
+    """Click one of the drawn markers or pan the map. Returns the value the
+    map then posts, which Streamlit stores under the st_folium key before
+    rerunning."""
+    rng = browser["rng"]
+    (lat, lon), zoom = browser["center"], browser["zoom"]
+    if action == "click":
+        markers = browser.get("markers")
+        if markers:
+            lat_, lon_, tooltip, cluster = rng.choice(markers)
+            if cluster:
+                # Clicking a cluster zooms into it
+                lat, lon, zoom = lat_, lon_, min(zoom + 2, 18)
+            else:
+                browser["clicked"] = {"lat": lat_, "lng": lon_}, tooltip
+    elif action == "pan":
+        lat += rng.uniform(-0.05, 0.05)
+        lon += rng.uniform(-0.05, 0.05)
+        zoom = max(8, min(16, zoom + rng.choice([-1, 0, 1])))
+    browser["center"], browser["zoom"] = (lat, lon), zoom
+    return _posted(browser)
+
+
+@contextmanager
+def concurrent_app_tests():
+    """Let AppTest sessions run side by side on threads.
+
+    AppTest installs a stand-in Runtime singleton for each run and clears it
+    when the run ends, which breaks any other session mid-run; while this is
+    active the last installed stand-in keeps answering for all of them. Each
+    run also patches the appTest config option for its duration, so another
+    session finishing would switch it off; it stays on throughout. And each
+    run parses app.py afresh while ast.parse is not thread safe on some
+    Python 3.11 releases, so parsing is serialised."""
+    original = (
+        Runtime.__dict__["instance"],
+        Runtime.__dict__["exists"],
+        ScriptCache.get_bytecode,
+    )
+    last = []
+    parsing = threading.Lock()
+
+    def instance(cls):
+        if cls._instance is not None:
+            last[:] = [cls._instance]
+        elif not last:
+            raise RuntimeError("Runtime hasn't been created!")
+        return cls._instance or last[0]
+
+    def get_bytecode(self, script_path):
+        with parsing:
+            return original[2](self, script_path)
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or bool(last))
+    ScriptCache.get_bytecode = get_bytecode
+    try:
+        with patch_config_options({"global.appTest": True}):
+            yield
+    finally:
+        Runtime.instance, Runtime.exists, ScriptCache.get_bytecode = original
+
+
+def _widget(widgets, label):
+    return next(w for w in widgets if w.label == label)
+
+
+class SimulatedUser:
+    def __init__(self, number: int, seed: int, editor: bool):
+        self.rng = random.Random(seed)
+        self.editor = editor
+        self.test = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT)
+        self.test.session_state[BROWSER_KEY] = {"rng": random.Random(seed + 1)}
+        if editor:
+            self.sign_in(f"user{number}@example.com", EDITOR_PASSWORD)
+        self.timings = []  # (action, seconds)
+        self.errors = []
+
+    def sign_in(self, email: str, password: str):
+        # What auth_functions.sign_in leaves in session state
+        signed_in = auth_functions.sign_in_with_email_and_password(email, password)
+        id_token = signed_in["idToken"]
+        state = self.test.session_state
+        state["user_info"] = auth_functions.get_account_info(id_token)["users"][0]
+        state["auth_tokens"] = auth_functions.token_state(
+            id_token, signed_in["refreshToken"], signed_in["expiresIn"]
+        )
+
+    def _interact(self, action: str):
+        browser = self.test.session_state[BROWSER_KEY]
+        posted = interact(browser, action)
+        self.test.session_state[BROWSER_KEY] = browser
+        self.test.session_state[MAP_KEY] = posted
+
+    def _save_buttons(self):
+        # The edit form is only drawn once a company's pin has been clicked
+        state = self.test.session_state
+        if "selected_uuid" not in state or state["selected_uuid"] is None:
+            return []
+        return [b for b in self.test.sidebar.button if b.label == "Save Edit"]
+
+    def act(self, action: str):
+        test, rng = self.test, self.rng
+        if action == "keyword":
+            _widget(test.multiselect, "Keyword Search").set_value(
+                rng.sample(TAGS[:20], rng.choice([0, 1, 1, 2]))
+            )
+        elif action == "text":
+            _widget(test.text_input, "Search").input(rng.choice(TEXT_QUERIES))
+        elif action in ("click", "pan"):
+            self._interact(action)
+        elif action == "edit":
+            if not self.editor:
+                return self.act("click")
+            if not self._save_buttons():
+                # Open a company's edit form first
+                self.act("click")
+                if not self._save_buttons():
+                    return
+            _widget(test.sidebar.text_area, "Description").input(
+                f"Edited by a load test at {time.time()}"
+            )
+            self._save_buttons()[0].click()
+        started = time.perf_counter()
+        test.run()
+        self.timings.append((action, time.perf_counter() - started))
+        if test.exception:
+            self.errors.append(test.exception[0].message)
+
+    def session(self, actions: int):
+        self.act("load")
+        names = list(ACTION_WEIGHTS)
+        weights = list(ACTION_WEIGHTS.values())
+        for _ in range(actions):
+            self.act(self.rng.choices(names, weights=weights)[0])
+
+
+def percentiles(values) -> dict:
+    if not values:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(p95 * 1000, 2),
+        "p99_ms": round(p99 * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+def memory_per_session(sessions: int) -> float:
+    """Bytes allocated per additional page load session, AppTest's copy of the
+    rendered page included, with the shared store already loaded."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tests = []
+    for i in range(sessions):
+        test = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT)
+        test.session_state[BROWSER_KEY] = {"rng": random.Random(i)}
+        test.run()
+        tests.append(test)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / sessions
+
+
+def run_load_test(users: int, actions: int, size: int, editors: float, seed: int):
+    graph = FakeGraph(synthetic_companies(size, seed))
+    restore = install(graph)
+    original_st_folium = streamlit_folium.st_folium
+    streamlit_folium.st_folium = browser_st_folium
+    data_functions.get_lat_lon_from_address = lambda *address: (32.7157, -117.1611)
+    auth = FirebaseStub({f"user{i}@example.com": EDITOR_PASSWORD for i in range(users)})
+    restore_auth = firebase_stub.install(auth)
+    try:
+        # First page load of the process fills the shared store
+        st.cache_resource.clear()
+        started = time.perf_counter()
+        warm = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT)
+        warm.session_state[BROWSER_KEY] = {"rng": random.Random(seed)}
+        warm.run()
+        first_load = time.perf_counter() - started
+
+        rng = random.Random(seed)
+        simulated = [
+            SimulatedUser(i, rng.randrange(2**32), rng.random() < editors)
+            for i in range(users)
+        ]
+        cache_before = get_dataset_cache().stats()
+        graph.reset_counts()
+        auth.requests.clear()
+        start = threading.Barrier(users)
+
+        def drive(user):
+            start.wait()
+            user.session(actions)
+
+        started = time.perf_counter()
+        with concurrent_app_tests(), ThreadPoolExecutor(max_workers=users) as pool:
+            list(pool.map(drive, simulated))
+        elapsed = time.perf_counter() - started
+        cache_after = get_dataset_cache().stats()
+
+        timings = [t for user in simulated for t in user.timings]
+        by_action = {}
+        for action, seconds in timings:
+            by_action.setdefault(action, []).append(seconds)
+        hits = cache_after["hits"] - cache_before["hits"]
+        misses = cache_after["misses"] - cache_before["misses"]
+        return {
+            "users": users,
+            "actions_per_user": actions,
+            "companies": size,
+            "first_load_s": round(first_load, 3),
+            "elapsed_s": round(elapsed, 3),
+            "script_runs": len(timings),
+            "runs_per_second": round(len(timings) / elapsed, 2),
+            "latency": percentiles([s for _, s in timings]),
+            "latency_by_action": {a: percentiles(v) for a, v in by_action.items()},
+            "errors": sum(len(user.errors) for user in simulated),
+            "error_samples": sorted({e for user in simulated for e in user.errors})[:5],
+            "dataset_cache": {
+                "hits": hits,
+                "misses": misses,
+                "hit_ratio": round(hits / (hits + misses), 4)
+                if hits + misses
+                else None,
+            },
+            "neo4j_round_trips": graph.round_trips,
+            "neo4j_round_trips_per_run": round(graph.round_trips / len(timings), 4),
+            "neo4j_statements": dict(graph.statements),
+            "firebase_requests": dict(auth.requests),
+            "memory_per_session_bytes": round(memory_per_session(min(users, 10))),
+        }
+    finally:
+        streamlit_folium.st_folium = original_st_folium
+        restore()
+        restore_auth()
+        auth.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--actions", type=int, default=10, help="Per user, after load")
+    parser.add_argument("--size", type=int, default=10000, help="Companies")
+    parser.add_argument(
+        "--editors", type=float, default=0.1, help="Share of signed in users"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_load_test(
+        args.users, args.actions, args.size, args.editors, args.seed
+    )
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from columnar import CompanySelection
+import folium
+
+
+def clicked_company_uuid(map_data: dict, store) -> str:
+    """UUID of the company whose marker was last clicked, or None. Markers
+    carry no ids, so the company is found by the clicked position."""
+    clicked = (map_data or {}).get("last_object_clicked")
+    if not clicked:
+        return None
+    return store.at(
+        clicked["lat"], clicked["lng"], map_data.get("last_object_clicked_tooltip")
+    )
+
+
+def add_company_markers(m, companies: CompanySelection):
+    """One folium.Marker per company. Markers only carry a tooltip; details are
+    looked up by UUID when clicked, so no description HTML ships with the map."""
+    companies = companies.located()
+    for lat, lon, name in zip(
+        companies.lats.tolist(), companies.lons.tolist(), companies.names
+    ):
+        folium.Marker([lat, lon], tooltip=name).add_to(m)
+
+
+def company_feature_collection(lats, lons, names) -> dict:
+    """GeoJSON FeatureCollection of points from parallel coordinate/name columns."""
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                "properties": {"Name": name},
+            }
+            for lat, lon, name in zip(lats, lons, names)
+        ],
+    }
+
+
+def add_company_layer(m, companies: CompanySelection):
+    """All companies as a single GeoJSON layer styled in the browser, instead of
+    a Python object per marker."""
+    companies = companies.located()
+    lats, lons, names = (
+        companies.lats.tolist(),
+        companies.lons.tolist(),
+        companies.names,
+    )
+    add_point_layer(m, lats, lons, names)
+
+
+def add_point_layer(m, lats, lons, names):
+    # GeoJsonTooltip refuses a layer with no features to take fields from
+    if not len(names):
+        return
+    folium.GeoJson(
+        company_feature_collection(lats, lons, names),
+        name="Startups",
+        marker=folium.CircleMarker(
+            radius=7, color="#1f5f99", weight=1, fill=True, fill_opacity=0.8
+        ),
+        tooltip=folium.GeoJsonTooltip(fields=["Name"], labels=False),
+    ).add_to(m)
+
+
+def add_cluster_marker(m, lat, lon, count):
+    size = 30 + 6 * min(len(str(count)), 4)
+    icon = folium.DivIcon(
+        icon_size=(size, size),
+        icon_anchor=(size // 2, size // 2),
+        html=f"""<div style="width:{size}px;height:{size}px;line-height:{size}px;border-radius:50%;
+        background:rgba(49,132,204,0.8);color:white;font-weight:bold;text-align:center">{count}</div>""",
+    )
+    folium.Marker([lat, lon], icon=icon, tooltip=f"{count} startups").add_to(m)
@@ -1,11 +1,11 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 import uuid
 
 
 class Company(BaseModel):
     Name: str
-    UUID: str = str(uuid.uuid4())
+    UUID: str = Field(default_factory=lambda: str(uuid.uuid4()))
     Url: Optional[str] = ""
     Description: Optional[str] = ""
     # CreatedAt: Optional[datetime] = None
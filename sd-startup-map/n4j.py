@@ -1,14 +1,158 @@
 from neo4j import GraphDatabase
+from contextlib import contextmanager
 import streamlit as st
+from config import setting
+from instrumentation import span, query_hash
+import threading
+import logging
+import time
 
 
-# Experimental query
-def execute_query(query, params={}):
+# Pool defaults, overridable through st.secrets
+DEFAULT_MAX_POOL_SIZE = 50
+DEFAULT_LIVENESS_CHECK_TIMEOUT = 30.0  # seconds idle before a connection is pinged
+DEFAULT_ACQUISITION_TIMEOUT = 30.0  # seconds to wait for a free connection
 
-    host = st.secrets["NEO4J_URI"]
-    user = st.secrets["NEO4J_USERNAME"]
-    password = st.secrets["NEO4J_PASSWORD"]
 
-    # Returns a tuple of records, summary, keys
-    with GraphDatabase.driver(host, auth=(user, password)) as driver:
-        return driver.execute_query(query, params)
+class PoolMetrics:
+    """Counters for connections handed out by this module. Thread safe."""
+
+    def __init__(self, max_pool_size: int):
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_acquire(self, waited: float):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.acquired += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def record_release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            avg = self.wait_total / self.acquired if self.acquired else 0.0
+            return {
+                "max_pool_size": self.max_pool_size,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": avg * 1000,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+class DriverManager:
+    """Owns one long-lived neo4j Driver and gates access to its connection pool.
+
+    Callers block on a semaphore sized to the pool before touching the driver,
+    so time spent waiting for a connection can be measured and bounded by the
+    acquisition timeout.
+    """
+
+    def __init__(
+        self,
+        uri: str,
+        auth: tuple,
+        max_pool_size: int = DEFAULT_MAX_POOL_SIZE,
+        liveness_check_timeout: float = DEFAULT_LIVENESS_CHECK_TIMEOUT,
+        acquisition_timeout: float = DEFAULT_ACQUISITION_TIMEOUT,
+    ):
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=auth,
+            max_connection_pool_size=max_pool_size,
+            liveness_check_timeout=liveness_check_timeout,
+            connection_acquisition_timeout=acquisition_timeout,
+        )
+        self.acquisition_timeout = acquisition_timeout
+        self.metrics = PoolMetrics(max_pool_size)
+        self._slots = threading.BoundedSemaphore(max_pool_size)
+
+    @contextmanager
+    def slot(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquisition_timeout):
+            self.metrics.record_timeout()
+            raise TimeoutError(
+                f"No Neo4j connection available after {self.acquisition_timeout}s"
+            )
+        self.metrics.record_acquire(time.perf_counter() - start)
+        try:
+            yield
+        finally:
+            self._slots.release()
+            self.metrics.record_release()
+
+    def pool_metrics(self) -> dict:
+        result = self.metrics.snapshot()
+        # The driver does not publish pool state, read it defensively
+        in_use = idle = 0
+        pool = getattr(self.driver, "_pool", None)
+        for connections in list(getattr(pool, "connections", {}).values()):
+            for connection in list(connections):
+                if getattr(connection, "in_use", False):
+                    in_use += 1
+                else:
+                    idle += 1
+        result["in_use"] = in_use
+        result["idle"] = idle
+        return result
+
+    def close(self):
+        self.driver.close()
+
+
+@st.cache_resource
+def get_manager() -> DriverManager:
+    # Shared by every session and rerun in this process
+    logging.info("Creating Neo4j driver")
+    return DriverManager(
+        st.secrets["NEO4J_URI"],
+        (st.secrets["NEO4J_USERNAME"], st.secrets["NEO4J_PASSWORD"]),
+        max_pool_size=int(setting("NEO4J_MAX_POOL_SIZE", DEFAULT_MAX_POOL_SIZE)),
+        liveness_check_timeout=float(
+            setting("NEO4J_LIVENESS_CHECK_TIMEOUT", DEFAULT_LIVENESS_CHECK_TIMEOUT)
+        ),
+        acquisition_timeout=float(
+            setting("NEO4J_ACQUISITION_TIMEOUT", DEFAULT_ACQUISITION_TIMEOUT)
+        ),
+    )
+
+
+def execute_query(query, params={}, **kwargs):
+    manager = get_manager()
+    # Returns a tuple of records, summary, keys unless a result_transformer_ is
+    # passed through kwargs
+    with span("neo4j.query", query=query_hash(query)) as traced, manager.slot():
+        result = manager.driver.execute_query(query, params, **kwargs)
+        if "result_transformer_" not in kwargs:
+            traced.set(rows=len(result.records))
+        return result
+
+
+@contextmanager
+def session(**kwargs):
+    """Session on the shared driver, for work that needs explicit transactions."""
+    manager = get_manager()
+    with manager.slot(), manager.driver.session(**kwargs) as s:
+        yield s
+
+
+def pool_metrics() -> dict:
+    return get_manager().pool_metrics()
@@ -0,0 +1,135 @@
+from contextlib import contextmanager
+from pydantic import TypeAdapter, ValidationError
+from n4j import execute_query
+from instrumentation import span, query_hash, payload_bytes, tracing_enabled
+import threading
+import logging
+import time
+
+
+# Most recent report per read, for debugging and profiling
+_last_reports = {}
+_lock = threading.Lock()
+
+
+class ReadReport:
+    """What happened during one read: row counts, rejects and stage timings.
+
+    Stages are "network" (driver round trip and record decoding, less the
+    server's own time), "server", "decode" (records into rows) and
+    "validation". Times are in milliseconds.
+    """
+
+    def __init__(self, name: str, query: str):
+        self.name = name
+        self.query = query
+        self.rows = 0
+        self.rejects = []
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "rows": self.rows,
+            "rejected": len(self.rejects),
+            "timings_ms": {k: round(v, 3) for k, v in self.timings.items()},
+            "rejects": self.rejects,
+        }
+
+    def summary(self) -> str:
+        timings = ", ".join(f"{k} {v:.1f}ms" for k, v in self.timings.items())
+        return (
+            f"{self.name}: {self.rows} rows, {len(self.rejects)} rejected ({timings})"
+        )
+
+
+def last_reports() -> dict:
+    with _lock:
+        return dict(_last_reports)
+
+
+def validate_batch(adapter: TypeAdapter, rows: list):
+    """Validate a whole list in one pass. Returns (items, rejects), rejects being
+    {"row", "errors"} dicts for the rows that failed."""
+    try:
+        return adapter.validate_python(rows), []
+    except ValidationError as e:
+        bad = {}
+        for error in e.errors():
+            index = error["loc"][0]
+            bad.setdefault(index, []).append(
+                f"{'.'.join(str(l) for l in error['loc'][1:])}: {error['msg']}"
+            )
+    good = [row for i, row in enumerate(rows) if i not in bad]
+    rejects = [{"row": rows[i], "errors": errors} for i, errors in bad.items()]
+    return adapter.validate_python(good), rejects
+
+
+def _collect(result):
+    # Result transformer: drain the stream inside the managed transaction
+    keys = result.keys()
+    records = list(result)
+    return keys, records, result.consume()
+
+
+def read(name: str, query: str, params: dict, transform):
+    """Run a read query and turn its records into results.
+
+    transform(keys, records, report) returns the results; it can time its own
+    stages with report.stage() and append to report.rejects. Returns
+    (results, report).
+    """
+    report = ReadReport(name, query)
+    with span(f"read.{name}", query=query_hash(query)) as traced:
+        started = time.perf_counter()
+        keys, records, summary = execute_query(
+            query, params, result_transformer_=_collect
+        )
+        elapsed = (time.perf_counter() - started) * 1000
+        server = (summary.result_available_after or 0) + (
+            summary.result_consumed_after or 0
+        )
+        report.timings["server"] = float(server)
+        report.timings["network"] = max(elapsed - server, 0.0)
+        report.rows = len(records)
+
+        with span(f"parse.{name}", rows=report.rows) as parsing:
+            results = transform(keys, records, report)
+            parsing.set(rejects=len(report.rejects))
+        traced.set(rows=report.rows, rejects=len(report.rejects))
+        if tracing_enabled():
+            traced.set(bytes=payload_bytes(records))
+
+    with _lock:
+        _last_reports[name] = report
+    logging.debug(report.summary())
+    if report.rejects:
+        logging.warning(f"{name}: {len(report.rejects)} records failed validation")
+    return results, report
+
+
+def validated(adapter: TypeAdapter, column: str = None):
+    """Transform that validates every record (or one column of it) with adapter."""
+
+    def transform(keys, records, report):
+        with report.stage("decode"):
+            if column is None:
+                rows = [dict(zip(keys, tuple.__iter__(r))) for r in records]
+            else:
+                i = list(keys).index(column)
+                rows = [dict(tuple.__getitem__(r, i)) for r in records]
+        with report.stage("validation"):
+            items, rejects = validate_batch(adapter, rows)
+        report.rejects += rejects
+        return items
+
+    return transform
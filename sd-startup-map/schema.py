@@ -0,0 +1,217 @@
+"""Constraints and indexes for every key data_functions looks nodes up by.
+
+    python sd-startup-map/schema.py          # create anything missing
+    python sd-startup-map/schema.py --check  # also EXPLAIN each lookup query
+
+Every statement uses IF NOT EXISTS, so running this again is a no-op. The app
+runs ensure_schema() once per process on startup.
+"""
+
+from n4j import execute_query
+from config import flag
+from snapshot import snapshot_path
+from neo4j.exceptions import ClientError
+import data_functions
+import streamlit as st
+import argparse
+import json
+import logging
+
+
+# (name, statement, fallback). Uniqueness constraints cannot be created while
+# duplicates exist; the fallback is a plain index on the same properties so
+# lookups are still served by an index until the data is cleaned up.
+SCHEMA = [
+    (
+        "company_uuid",
+        "CREATE CONSTRAINT company_uuid IF NOT EXISTS FOR (c:Company) REQUIRE c.UUID IS UNIQUE",
+        "CREATE INDEX company_uuid_index IF NOT EXISTS FOR (c:Company) ON (c.UUID)",
+    ),
+    (
+        "company_url",
+        "CREATE CONSTRAINT company_url IF NOT EXISTS FOR (c:Company) REQUIRE c.Url IS UNIQUE",
+        "CREATE INDEX company_url_index IF NOT EXISTS FOR (c:Company) ON (c.Url)",
+    ),
+    (
+        "company_name",
+        "CREATE INDEX company_name IF NOT EXISTS FOR (c:Company) ON (c.Name)",
+        None,
+    ),
+    (
+        "location_address",
+        "CREATE CONSTRAINT location_address IF NOT EXISTS FOR (l:Location) REQUIRE (l.Address, l.City, l.State, l.ZipCode) IS UNIQUE",
+        "CREATE INDEX location_address_index IF NOT EXISTS FOR (l:Location) ON (l.Address, l.City, l.State, l.ZipCode)",
+    ),
+    (
+        "location_coordinates",
+        "CREATE POINT INDEX location_coordinates IF NOT EXISTS FOR (l:Location) ON (l.Coordinates)",
+        None,
+    ),
+    (
+        "tag_name",
+        "CREATE CONSTRAINT tag_name IF NOT EXISTS FOR (t:Tag) REQUIRE t.Name IS UNIQUE",
+        "CREATE INDEX tag_name_index IF NOT EXISTS FOR (t:Tag) ON (t.Name)",
+    ),
+    (
+        "change_sequence_name",
+        "CREATE CONSTRAINT change_sequence_name IF NOT EXISTS FOR (s:ChangeSequence) REQUIRE s.Name IS UNIQUE",
+        None,
+    ),
+    (
+        "company_change_seq",
+        "CREATE INDEX company_change_seq IF NOT EXISTS FOR (c:Company) ON (c.ChangeSeq)",
+        None,
+    ),
+    (
+        "deleted_company_uuid",
+        "CREATE CONSTRAINT deleted_company_uuid IF NOT EXISTS FOR (d:DeletedCompany) REQUIRE d.UUID IS UNIQUE",
+        "CREATE INDEX deleted_company_uuid_index IF NOT EXISTS FOR (d:DeletedCompany) ON (d.UUID)",
+    ),
+    (
+        "deleted_company_change_seq",
+        "CREATE INDEX deleted_company_change_seq IF NOT EXISTS FOR (d:DeletedCompany) ON (d.ChangeSeq)",
+        None,
+    ),
+]
+
+# Locations written before Coordinates existed
+BACKFILL_COORDINATES_QUERY = """
+MATCH (l:Location)
+WHERE l.Coordinates IS NULL AND l.Latitude IS NOT NULL AND l.Longitude IS NOT NULL
+SET l.Coordinates = point({latitude: l.Latitude, longitude: l.Longitude})
+"""
+
+# Companies written before change numbers existed; 0 is before any cursor
+BACKFILL_CHANGE_SEQ_QUERY = """
+MATCH (c:Company)
+WHERE c.ChangeSeq IS NULL
+SET c.ChangeSeq = 0
+"""
+
+_company = {
+    "UUID": "",
+    "Url": "",
+    "Description": None,
+    "StartupYear": None,
+    "LinkedInUrl": None,
+    "Name": "",
+    "Logo": None,
+    "Address": "",
+    "City": "",
+    "State": "",
+    "ZipCode": "",
+    "Lat": 0.0,
+    "Lon": 0.0,
+    "Tags": [],
+}
+
+# Queries that look nodes up by key, with placeholder parameters for EXPLAIN.
+# Full reads such as get_companies([]) scan by design and are not listed.
+LOOKUP_QUERIES = {
+    "get_companies_by_uuid": (
+        data_functions.GET_COMPANIES_BY_UUID_QUERY,
+        {"uuids": [""]},
+    ),
+    "find_company": (data_functions.FIND_COMPANY_QUERY, {"name": ""}),
+    "create_new_tags": (data_functions.CREATE_TAGS_QUERY, {"tags": [""]}),
+    "create_new_location": (
+        data_functions.CREATE_LOCATION_QUERY,
+        {"address": "", "city": "", "state": "", "zip": "", "lat": 0.0, "lon": 0.0},
+    ),
+    "add_company": (data_functions.ADD_COMPANY_QUERY, _company),
+    "add_companies": (data_functions.ADD_COMPANIES_QUERY, {"rows": [_company]}),
+    "update_company": (
+        data_functions.UPDATE_COMPANY_QUERY
+        + data_functions.MOVE_OFFICE_QUERY
+        + data_functions.RETURN_CHANGE_QUERY,
+        {**_company, "added_tags": [""], "removed_tags": [""]},
+    ),
+    "delete_company": (data_functions.DELETE_COMPANY_QUERY, {"UUID": ""}),
+    "get_changes": (data_functions.COMPANIES_CHANGED_SINCE_QUERY, {"since": 0}),
+    "get_changes_deleted": (data_functions.DELETED_SINCE_QUERY, {"since": 0}),
+}
+
+# Plan operators that touch every node with a label (or every node)
+SCAN_OPERATORS = ("NodeByLabelScan", "AllNodesScan")
+
+
+def apply_schema() -> dict:
+    """Create any missing constraint or index. Returns name -> the statement
+    that now backs it ("fallback: ..." when a constraint could not be made)."""
+    applied = {}
+    for name, statement, fallback in SCHEMA:
+        try:
+            execute_query(statement)
+            applied[name] = statement
+        except ClientError as e:
+            if fallback is None:
+                raise
+            logging.warning(
+                f"Could not create constraint {name}, using a plain index: {e.message}"
+            )
+            execute_query(fallback)
+            applied[name] = f"fallback: {fallback}"
+    _, summary, _ = execute_query(BACKFILL_COORDINATES_QUERY)
+    _, sequenced, _ = execute_query(BACKFILL_CHANGE_SEQ_QUERY)
+    logging.info(
+        f"Schema ensured, {summary.counters.properties_set} Location coordinates and {sequenced.counters.properties_set} Company change numbers backfilled"
+    )
+    return applied
+
+
+@st.cache_resource
+def ensure_schema() -> dict:
+    """apply_schema() once per process, unless NEO4J_ENSURE_SCHEMA is off or
+    reads come from a snapshot."""
+    if not flag("NEO4J_ENSURE_SCHEMA", True) or snapshot_path() is not None:
+        return {}
+    return apply_schema()
+
+
+def _operators(plan: dict):
+    # Operator types look like "NodeUniqueIndexSeek(Locking)@neo4j"
+    yield plan["operatorType"].split("@")[0]
+    for child in plan.get("children", []):
+        yield from _operators(child)
+
+
+def _plan(result):
+    return result.consume().plan
+
+
+def check_query_plans() -> dict:
+    """EXPLAIN every lookup query. Returns name -> {"indexed", "index_operators",
+    "scans"}; a query is indexed when it seeks an index and scans no label."""
+    report = {}
+    for name, (query, params) in LOOKUP_QUERIES.items():
+        plan = execute_query("EXPLAIN " + query, params, result_transformer_=_plan)
+        operators = list(_operators(plan))
+        index_operators = sorted({op for op in operators if "Index" in op})
+        scans = sorted({op for op in operators if op.startswith(SCAN_OPERATORS)})
+        report[name] = {
+            "indexed": bool(index_operators) and not scans,
+            "index_operators": index_operators,
+            "scans": scans,
+        }
+        if not report[name]["indexed"]:
+            logging.warning(f"{name} does not use an index: {operators}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--check", action="store_true", help="EXPLAIN lookup queries afterwards"
+    )
+    args = parser.parse_args()
+
+    results = {"schema": apply_schema()}
+    if args.check:
+        results["plans"] = check_query_plans()
+    print(json.dumps(results, indent=2))
+    if args.check and not all(p["indexed"] for p in results["plans"].values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,290 @@
 import streamlit as st
 import auth_functions
-from data_functions import find_company
+from company_store import current_store
 from datetime import datetime
-from data_functions import sorted_tags, add_company, delete_company, update_company
+from data_functions import sorted_tags
+from write_queue import get_write_queue, QUEUED, RUNNING, DONE
 from models import Company
 import logging
+import time
+
+
+# Each form is a fragment: its widgets rerun only the fragment, not the app and
+# its map. Writes are queued for a background worker (write_queue) and the
+# form returns at once; write_status() follows the jobs and reruns the app
+# when one finishes so the map picks up the change.
+
+# Seconds between checks on this session's queued writes
+JOB_POLL_INTERVAL = 2
+
+
+def show_notice():
+    # Set by a form, write_status() or a session check just before a full
+    # rerun, shown once
+    if "auth_warning" in st.session_state:
+        st.warning(st.session_state.auth_warning)
+        del st.session_state.auth_warning
+    if "sidebar_notice" in st.session_state:
+        st.success(st.session_state.sidebar_notice)
+        del st.session_state.sidebar_notice
+    if "sidebar_error" in st.session_state:
+        st.error(st.session_state.sidebar_error)
+        del st.session_state.sidebar_error
+
+
+def track_job(job_id: int):
+    jobs = st.session_state.setdefault("write_jobs", [])
+    if job_id not in jobs:
+        jobs.append(job_id)
+
+
+def _write_status():
+    jobs = get_write_queue().jobs(st.session_state.get("write_jobs", []))
+    finished = False
+    for job_id, job in jobs.items():
+        what = f'{job["kind"].capitalize()} "{job["label"]}"'
+        if job["status"] == QUEUED and job["attempts"]:
+            wait = max(job["next_attempt"] - time.time(), 0)
+            st.caption(
+                f"{what}: attempt {job['attempts']} failed ({job['error']}), retrying in {wait:.0f}s"
+            )
+        elif job["status"] in (QUEUED, RUNNING):
+            st.caption(f"{what}: {'saving' if job['status'] == RUNNING else 'queued'}")
+        elif job["status"] == DONE:
+            st.session_state.sidebar_notice = f"{what}: saved"
+            finished = True
+        else:
+            st.session_state.sidebar_error = f"{what} failed: {job['error']}"
+            finished = True
+    if finished:
+        st.session_state["write_jobs"] = [
+            job_id for job_id, job in jobs.items() if job["status"] in (QUEUED, RUNNING)
+        ]
+        st.rerun()
+
+
+# Polls while this session has writes in flight
+write_status = st.fragment(_write_status, run_every=JOB_POLL_INTERVAL)
+
+
+@st.fragment
+def authentication_form():
+    # Authentication form layout
+    do_you_have_an_account = st.selectbox(
+        label="Do you have an account?",
+        options=("Yes", "I forgot my password"),
+    )
+    auth_form = st.form(key="Authentication form", clear_on_submit=False)
+    email = auth_form.text_input(label="Email")
+    password = (
+        auth_form.text_input(label="Password", type="password")
+        if do_you_have_an_account in {"Yes", "No"}
+        else auth_form.empty()
+    )
+    auth_notification = st.empty()
+
+    # Sign In
+    if do_you_have_an_account == "Yes" and auth_form.form_submit_button(
+        label="Sign In", use_container_width=True, type="primary"
+    ):
+        with auth_notification, st.spinner("Signing in"):
+            auth_functions.sign_in(email, password)
+
+    # Create Account
+    elif do_you_have_an_account == "No" and auth_form.form_submit_button(
+        label="Create Account", use_container_width=True, type="primary"
+    ):
+        with auth_notification, st.spinner("Creating account"):
+            auth_functions.create_account(email, password)
+
+    # Password Reset
+    elif (
+        do_you_have_an_account == "I forgot my password"
+        and auth_form.form_submit_button(
+            label="Send Password Reset Email",
+            use_container_width=True,
+            type="primary",
+        )
+    ):
+        with auth_notification, st.spinner("Sending password reset link"):
+            auth_functions.reset_password(email)
+
+    # Authentication success and warning messages
+    if "auth_success" in st.session_state:
+        auth_notification.success(st.session_state.auth_success)
+        del st.session_state.auth_success
+    elif "auth_warning" in st.session_state:
+        auth_notification.warning(st.session_state.auth_warning)
+        del st.session_state.auth_warning
+
+
+@st.fragment
+def edit_form(uuid: str):
+    # Resolved from the in-memory store, no database round trip
+    company = current_store().get(uuid)
+    logging.debug(f"Startup selected: {uuid}, company data: {company}")
+    if company:
+        with st.form("Edit Startup"):
+            name = st.text_input(
+                label="Name",
+                value=company.Name,
+            )
+            description = st.text_area(
+                label="Description",
+                value=company.Description,
+            )
+            startup_year = st.number_input(
+                label="Year of founding",
+                value=company.StartupYear,
+            )
+            url = st.text_input(
+                label="Website Url",
+                value=company.Url,
+            )
+            linkedin = st.text_input(
+                label="LinkedIn Url",
+                value=company.LinkedInUrl,
+            )
+            logo_url = st.text_input(
+                label="Logo Url",
+                value=company.Logo,
+            )
+            # lat = st.text_input(label="Office Latitude", value=company.Lat)
+            # lon = st.text_input(label="Office Longitude", value=company.Lon)
+            address = st.text_input(
+                label="Address",
+                value=company.Address,
+            )
+            city = st.text_input(
+                label="City",
+                value=company.City,
+            )
+            state = st.text_input(
+                label="State",
+                value=company.State,
+            )
+            zip_code = st.text_input(
+                label="Zip Code",
+                value=company.ZipCode,
+            )
+
+            logging.debug(f"tags: {company.Tags}")
+
+            associated_tags = st.multiselect(
+                label="Tags",
+                options=sorted_tags(),
+                default=company.Tags,
+            )
+
+            st.markdown("**Note:** Click off pin to reset")
+
+            submitted = st.form_submit_button(
+                label="Save Edit",
+                type="primary",
+            )
+            if submitted:
+                if not auth_functions.check_session():
+                    st.rerun()
+                try:
+                    new_company = Company(
+                        UUID=company.UUID,
+                        Name=name,
+                        Description=description,
+                        StartupYear=startup_year,
+                        Url=url,
+                        LinkedInUrl=linkedin,
+                        Logo=logo_url,
+                        Address=address,
+                        City=city,
+                        State=state,
+                        ZipCode=zip_code,
+                        Tags=associated_tags,
+                    )
+                    track_job(get_write_queue().update(company, new_company))
+                except Exception as e:
+                    logging.error(e)
+                    st.error("Error updating startup")
+                else:
+                    st.rerun()
+
+            delete_button = st.form_submit_button(
+                "Delete Startup",
+                type="secondary",
+            )
+            if delete_button:
+                if not auth_functions.check_session():
+                    st.rerun()
+                try:
+                    track_job(get_write_queue().delete(company.UUID, company.Name))
+                    st.session_state["selected_uuid"] = None
+                except Exception as e:
+                    logging.error(e)
+                    st.error("Error deleting startup")
+                else:
+                    st.rerun()
+
+
+@st.fragment
+def add_form():
+    # Form for new startup
+    with st.form("Add New Startup", clear_on_submit=False):
+        name = st.text_input(label="Name")
+        description = st.text_area(label="Description")
+        startup_year = st.number_input(
+            label="Year of founding",
+            value=datetime.now().year,
+        )
+        url = st.text_input(label="Website Url")
+        linkedin = st.text_input(label="LinkedIn Url")
+        logo_url = st.text_input(label="Logo Url")
+        address = st.text_input(label="Address")
+        city = st.text_input(label="City")
+        state = st.text_input(label="State", value="CA")
+        zipcode = st.text_input(label="Zipcode")
+        associated_tags = st.multiselect(
+            label="Tags",
+            options=sorted_tags(),
+        )
+
+        new_submission = st.form_submit_button(
+            label="Create",
+            args=[
+                name,
+                description,
+                startup_year,
+                url,
+                linkedin,
+                logo_url,
+                address,
+                city,
+                state,
+                zipcode,
+                associated_tags,
+            ],
+            type="primary",
+        )
+        if new_submission:
+            if not auth_functions.check_session():
+                st.rerun()
+            try:
+                new_company = Company(
+                    Name=name,
+                    Description=description,
+                    StartupYear=startup_year,
+                    Url=url,
+                    LinkedInUrl=linkedin,
+                    Logo=logo_url,
+                    Address=address,
+                    City=city,
+                    State=state,
+                    ZipCode=zipcode,
+                    Tags=associated_tags,
+                )
+                track_job(get_write_queue().add(new_company))
+            except Exception as e:
+                st.error(e)
+            else:
+                st.rerun()
 
 
 def sidebar():
@@ -13,54 +293,7 @@ def sidebar():
     ## -------------------------------------------------------------------------------------------------
     with st.sidebar:
         if "user_info" not in st.session_state:
-
-            # Authentication form layout
-            do_you_have_an_account = st.selectbox(
-                label="Do you have an account?",
-                options=("Yes", "I forgot my password"),
-            )
-            auth_form = st.form(key="Authentication form", clear_on_submit=False)
-            email = auth_form.text_input(label="Email")
-            password = (
-                auth_form.text_input(label="Password", type="password")
-                if do_you_have_an_account in {"Yes", "No"}
-                else auth_form.empty()
-            )
-            auth_notification = st.empty()
-
-            # Sign In
-            if do_you_have_an_account == "Yes" and auth_form.form_submit_button(
-                label="Sign In", use_container_width=True, type="primary"
-            ):
-                with auth_notification, st.spinner("Signing in"):
-                    auth_functions.sign_in(email, password)
-
-            # Create Account
-            elif do_you_have_an_account == "No" and auth_form.form_submit_button(
-                label="Create Account", use_container_width=True, type="primary"
-            ):
-                with auth_notification, st.spinner("Creating account"):
-                    auth_functions.create_account(email, password)
-
-            # Password Reset
-            elif (
-                do_you_have_an_account == "I forgot my password"
-                and auth_form.form_submit_button(
-                    label="Send Password Reset Email",
-                    use_container_width=True,
-                    type="primary",
-                )
-            ):
-                with auth_notification, st.spinner("Sending password reset link"):
-                    auth_functions.reset_password(email)
-
-            # Authentication success and warning messages
-            if "auth_success" in st.session_state:
-                auth_notification.success(st.session_state.auth_success)
-                del st.session_state.auth_success
-            elif "auth_warning" in st.session_state:
-                auth_notification.warning(st.session_state.auth_warning)
-                del st.session_state.auth_warning
+            authentication_form()
 
         ## -------------------------------------------------------------------------------------------------
         ## Logged in --------------------------------------------------------------------------------------
@@ -73,172 +306,19 @@ def sidebar():
 
             st.divider()
 
-            # Edit Startup Form
-            if (
-                "map_data" in st.session_state
-                and "last_object_clicked_tooltip" in st.session_state["map_data"]
-                and st.session_state["map_data"]["last_object_clicked_tooltip"]
-                is not None
-            ):
+            show_notice()
+            if st.session_state.get("write_jobs"):
+                write_status()
+
+            # Edit Startup Form, for the startup last clicked on the map
+            if st.session_state.get("selected_uuid") is not None:
                 with st.expander("Edit Startup Info"):
-                    c_name = st.session_state["map_data"]["last_object_clicked_tooltip"]
-                    company = find_company(c_name)
-                    logging.debug(
-                        f"Startup selected: {c_name}, company data: {company}"
-                    )
-                    if company:
-                        with st.form("Edit Startup"):
-                            name = st.text_input(
-                                label="Name",
-                                value=c_name,
-                            )
-                            description = st.text_area(
-                                label="Description",
-                                value=company.Description,
-                            )
-                            startup_year = st.number_input(
-                                label="Year of founding",
-                                value=company.StartupYear,
-                            )
-                            url = st.text_input(
-                                label="Website Url",
-                                value=company.Url,
-                            )
-                            linkedin = st.text_input(
-                                label="LinkedIn Url",
-                                value=company.LinkedInUrl,
-                            )
-                            logo_url = st.text_input(
-                                label="Logo Url",
-                                value=company.Logo,
-                            )
-                            # lat = st.text_input(label="Office Latitude", value=company.Lat)
-                            # lon = st.text_input(label="Office Longitude", value=company.Lon)
-                            address = st.text_input(
-                                label="Address",
-                                value=company.Address,
-                            )
-                            city = st.text_input(
-                                label="City",
-                                value=company.City,
-                            )
-                            state = st.text_input(
-                                label="State",
-                                value=company.State,
-                            )
-                            zip_code = st.text_input(
-                                label="Zip Code",
-                                value=company.ZipCode,
-                            )
-
-                            logging.debug(f"tags: {company.Tags}")
-
-                            associated_tags = st.multiselect(
-                                label="Tags",
-                                options=sorted_tags(),
-                                default=company.Tags,
-                            )
-
-                            st.markdown("**Note:** Click off pin to reset")
-
-                            submitted = st.form_submit_button(
-                                label="Save Edit",
-                                type="primary",
-                            )
-                            if submitted:
-                                try:
-                                    new_company = Company(
-                                        UUID=company.UUID,
-                                        Name=name,
-                                        Description=description,
-                                        StartupYear=startup_year,
-                                        Url=url,
-                                        LinkedInUrl=linkedin,
-                                        Logo=logo_url,
-                                        Address=address,
-                                        City=city,
-                                        State=state,
-                                        ZipCode=zip_code,
-                                        Tags=associated_tags,
-                                    )
-                                    update_company(company, new_company)
-                                    st.success(
-                                        f'Successfully updated Startup named "{name}"'
-                                    )
-                                except Exception as e:
-                                    logging.error(e)
-                                    st.error("Error updating startup")
-
-                            delete_button = st.form_submit_button(
-                                "Delete Startup",
-                                type="secondary",
-                            )
-                            if delete_button:
-                                try:
-                                    delete_company(company.UUID)
-                                except Exception as e:
-                                    logging.error(e)
-                                    st.error("Error deleting startup")
+                    edit_form(st.session_state["selected_uuid"])
 
                 st.divider()
 
             with st.expander("Add New Startup"):
-                # Form for new startup
-                with st.form("Add New Startup", clear_on_submit=False):
-                    name = st.text_input(label="Name")
-                    description = st.text_area(label="Description")
-                    startup_year = st.number_input(
-                        label="Year of founding",
-                        value=datetime.now().year,
-                    )
-                    url = st.text_input(label="Website Url")
-                    linkedin = st.text_input(label="LinkedIn Url")
-                    logo_url = st.text_input(label="Logo Url")
-                    address = st.text_input(label="Address")
-                    city = st.text_input(label="City")
-                    state = st.text_input(label="State", value="CA")
-                    zipcode = st.text_input(label="Zipcode")
-                    associated_tags = st.multiselect(
-                        label="Tags",
-                        options=st.session_state["tags"],
-                    )
-
-                    new_submission = st.form_submit_button(
-                        label="Create",
-                        args=[
-                            name,
-                            description,
-                            startup_year,
-                            url,
-                            linkedin,
-                            logo_url,
-                            address,
-                            city,
-                            state,
-                            zipcode,
-                            associated_tags,
-                        ],
-                        type="primary",
-                    )
-                    if new_submission:
-                        try:
-                            new_company = Company(
-                                Name=name,
-                                Description=description,
-                                StartupYear=startup_year,
-                                Url=url,
-                                LinkedInUrl=linkedin,
-                                Logo=logo_url,
-                                Address=address,
-                                City=city,
-                                State=state,
-                                ZipCode=zipcode,
-                                Tags=associated_tags,
-                            )
-                            add_company(new_company)
-                            st.success("New startup added!")
-                        except Exception as e:
-                            st.error(e)
+                add_form()
 
             st.divider()
 
@@ -0,0 +1,325 @@
+"""Read-only snapshots of the map dataset in one memory-mapped file.
+
+    python sd-startup-map/snapshot.py export map.snapshot  # from Neo4j
+    python sd-startup-map/snapshot.py info map.snapshot
+
+With SNAPSHOT_PATH set the app serves companies and tags from the snapshot and
+never connects to Neo4j; writes are refused. Coordinates, years and the
+city/state/tag codes are used straight from the mapping without copying. A
+watcher thread picks up a newer file at the same path (export writes a
+temporary file and renames it over the old one) and swaps it in while sessions
+keep reading the old mapping.
+
+File layout: MAGIC, the header length as uint64, a JSON header, then one
+ALIGNMENT aligned block per column. Text columns are NUL separated UTF-8 with a
+null mask, tags are int32 codes with int64 row offsets.
+"""
+
+from columnar import CompanyTable, StringDictionary, TEXT_FIELDS
+from cache import bump_dataset_version
+from config import setting
+from models import Company
+import numpy as np
+import argparse
+import datetime
+import threading
+import logging
+import json
+import os
+import time
+
+
+MAGIC = b"SDMAPSN1"
+ALIGNMENT = 64
+DEFAULT_REFRESH_INTERVAL = 30  # seconds between checks for a newer file
+
+# Numeric CompanyTable columns stored as is
+NUMERIC_COLUMNS = ("lat", "lon", "year", "city", "state")
+
+
+class ReadOnlySnapshotError(RuntimeError):
+    pass
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(table: CompanyTable, path: str) -> dict:
+    """Write every company in table to path, replacing it atomically.
+    Returns the header."""
+    # Later rows win when a UUID appears twice, as in CompanyStore.load
+    by_uuid = {}
+    for slot, uuid in enumerate(table.text["UUID"][: len(table)]):
+        if uuid is not None:
+            by_uuid[uuid] = slot
+    slots = np.array(sorted(by_uuid.values()), dtype=np.int64)
+
+    # Dictionaries are re-encoded so values no longer used are dropped
+    cities, states, tag_names = (
+        StringDictionary(),
+        StringDictionary(),
+        StringDictionary(),
+    )
+    columns = {name: getattr(table, name)[slots] for name in ("lat", "lon", "year")}
+    columns["city"] = np.array(
+        [cities.encode(table.cities.decode(c)) for c in table.city[slots]],
+        dtype=np.int32,
+    )
+    columns["state"] = np.array(
+        [states.encode(table.states.decode(c)) for c in table.state[slots]],
+        dtype=np.int32,
+    )
+    row_tags = [[tag_names.encode(t) for t in table.row_tags(s)] for s in slots]
+    columns["tag_codes"] = np.array(
+        [code for codes in row_tags for code in codes], dtype=np.int32
+    )
+    columns["tag_offsets"] = np.concatenate(
+        ([0], np.cumsum([len(codes) for codes in row_tags], dtype=np.int64))
+    )
+    for field in TEXT_FIELDS:
+        values = [table.text[field][s] for s in slots]
+        if any("\0" in v for v in values if v is not None):
+            raise ValueError(f"{field} values may not contain NUL characters")
+        joined = "\0".join("" if v is None else v for v in values)
+        columns[f"{field}.text"] = np.frombuffer(joined.encode(), dtype=np.uint8)
+        columns[f"{field}.null"] = np.array([v is None for v in values], dtype=bool)
+
+    layout, offset = {}, 0
+    for name, values in columns.items():
+        layout[name] = {
+            "dtype": values.dtype.str,
+            "offset": offset,
+            "length": len(values),
+        }
+        offset = _aligned(offset + values.nbytes)
+    header = {
+        "format": 1,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "rows": len(slots),
+        "cities": cities.values,
+        "states": states.values,
+        "tags": tag_names.values,
+        "columns": layout,
+    }
+    encoded = json.dumps(header).encode()
+    data_start = _aligned(len(MAGIC) + 8 + len(encoded))
+
+    partial = f"{path}.partial"
+    with open(partial, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(encoded)).tobytes())
+        f.write(encoded)
+        for name, values in columns.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(values.tobytes())
+        f.truncate(data_start + offset)
+    # Readers still mapping the old file keep it until they let go
+    os.replace(partial, path)
+    return header
+
+
+def _dictionary(values: list[str]) -> StringDictionary:
+    dictionary = StringDictionary()
+    for value in values:
+        dictionary.encode(value)
+    return dictionary
+
+
+class Snapshot:
+    """A snapshot file mapped into memory. table is a CompanyTable whose
+    numeric columns are read-only views of the mapping."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.identity = _identity(path)
+        self._map = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._map[: len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a map snapshot")
+        length = int(self._map[len(MAGIC) : len(MAGIC) + 8].view(np.uint64)[0])
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(self._map[start : start + length]))
+        self._data_start = _aligned(start + length)
+        self.table = self._table()
+        self._slots = None  # UUID -> slot, built on first lookup
+
+    def column(self, name: str) -> np.ndarray:
+        spec = self.header["columns"][name]
+        return np.frombuffer(
+            self._map,
+            dtype=np.dtype(spec["dtype"]),
+            count=spec["length"],
+            offset=self._data_start + spec["offset"],
+        )
+
+    def _table(self) -> CompanyTable:
+        n = self.header["rows"]
+        table = CompanyTable.__new__(CompanyTable)
+        table.size = n
+        for name in NUMERIC_COLUMNS:
+            setattr(table, name, self.column(name))
+        table.text = {}
+        for field in TEXT_FIELDS:
+            values = self.column(f"{field}.text").tobytes().decode().split("\0")
+            for slot in np.flatnonzero(self.column(f"{field}.null")).tolist():
+                values[slot] = None
+            table.text[field] = values if n else []
+        codes = self.column("tag_codes").tolist()
+        offsets = self.column("tag_offsets").tolist()
+        table.tags = [tuple(codes[a:b]) for a, b in zip(offsets, offsets[1:])]
+        table.cities = _dictionary(self.header["cities"])
+        table.states = _dictionary(self.header["states"])
+        table.tag_names = _dictionary(self.header["tags"])
+        table.rejects = []
+        return table
+
+    def tags(self) -> list[str]:
+        return sorted(self.header["tags"])
+
+    def companies(self, tags: list[str] = ()) -> CompanyTable:
+        """Every company, as get_companies returns them. With tags, each
+        company's Tags are narrowed to those, which takes a copy."""
+        if not tags:
+            return self.table
+        table = self.table.copy()
+        wanted = {table.tag_names.code(t) for t in tags}
+        table.tags = [tuple(c for c in codes if c in wanted) for codes in table.tags]
+        return table
+
+    def companies_by_uuid(self, uuids) -> CompanyTable:
+        if self._slots is None:
+            self._slots = {
+                uuid: slot for slot, uuid in enumerate(self.table.text["UUID"])
+            }
+        found = CompanyTable()
+        for uuid in uuids:
+            slot = self._slots.get(uuid)
+            if slot is not None:
+                found.copy_row(self.table, slot)
+        return found
+
+    def find(self, name: str) -> list[Company]:
+        names = self.table.text["Name"]
+        return [self.table.company(s) for s, n in enumerate(names) if n == name]
+
+
+def _identity(path: str):
+    # Changes whenever the file is replaced or rewritten
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+## -------------------------------------------------------------------------------------------------
+## Snapshot mode -----------------------------------------------------------------------------------
+## -------------------------------------------------------------------------------------------------
+
+_UNSET = object()
+_lock = threading.Lock()
+_path = _UNSET  # from the SNAPSHOT_PATH setting on first use
+_current = None
+_watcher = None
+
+
+def snapshot_path():
+    """Path reads are served from, or None when reading from Neo4j."""
+    global _path
+    if _path is _UNSET:
+        _path = setting("SNAPSHOT_PATH", None) or None
+    return _path
+
+
+def set_snapshot_path(path):
+    global _path, _current
+    with _lock:
+        _path = path
+        _current = None
+
+
+def active_snapshot() -> Snapshot:
+    """The open snapshot, or None when not in snapshot mode. The first call
+    maps the file and starts a watcher thread that swaps in newer files."""
+    global _current, _watcher
+    path = snapshot_path()
+    if path is None:
+        return None
+    with _lock:
+        if _current is None:
+            _current = Snapshot(path)
+            logging.info(f"Serving {_current.header['rows']} companies from {path}")
+        if _watcher is None:
+            interval = float(
+                setting("SNAPSHOT_REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL)
+            )
+            _watcher = threading.Thread(
+                target=_watch, args=(interval,), name="snapshot-watcher", daemon=True
+            )
+            _watcher.start()
+        return _current
+
+
+def check_writable():
+    if snapshot_path() is not None:
+        raise ReadOnlySnapshotError("Serving a read-only snapshot, writes are disabled")
+
+
+def refresh() -> bool:
+    """Swap in the file at the snapshot path if it changed. The new file is
+    mapped and decoded before the swap, so readers never wait on it."""
+    global _current
+    current = _current
+    path = snapshot_path()
+    if current is None or path is None or _identity(path) == current.identity:
+        return False
+    started = time.perf_counter()
+    snapshot = Snapshot(path)
+    with _lock:
+        if _current is not current:
+            return False
+        _current = snapshot
+    # Nothing says which companies changed, stores reload in full
+    bump_dataset_version(reload=True)
+    logging.info(
+        f"Snapshot refreshed to {snapshot.header['created']}, {snapshot.header['rows']} companies in {time.perf_counter() - started:.2f}s"
+    )
+    return True
+
+
+def _watch(interval: float):
+    # data_functions and so the store import this module, import them late
+    from company_store import current_store
+
+    while True:
+        time.sleep(interval)
+        try:
+            if refresh():
+                # Rebuild the shared store here rather than in a session
+                current_store()
+        except Exception as e:
+            logging.warning(f"Snapshot refresh failed, still serving the old one: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=["export", "info"])
+    parser.add_argument("path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "export":
+        # Always from the database, even if SNAPSHOT_PATH is set
+        from data_functions import query_companies
+
+        started = time.perf_counter()
+        header = write_snapshot(query_companies([]), args.path)
+        logging.info(f"Exported in {time.perf_counter() - started:.2f}s")
+    else:
+        header = Snapshot(args.path).header
+    summary = {k: v for k, v in header.items() if k not in ("cities", "states")}
+    summary["tags"] = len(header["tags"])
+    summary["columns"] = len(header["columns"])
+    summary["bytes"] = os.path.getsize(args.path)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
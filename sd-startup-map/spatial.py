@@ -0,0 +1,151 @@
+import numpy as np
+import math
+
+
+# Roughly 5.5 km of latitude per cell
+DEFAULT_CELL_SIZE = 0.05
+
+# Mean earth radius
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def bounds_from_map_data(map_data: dict):
+    """(south, west, north, east) from st_folium's returned bounds, or None."""
+    bounds = (map_data or {}).get("bounds") or {}
+    sw, ne = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    if None in (sw.get("lat"), sw.get("lng"), ne.get("lat"), ne.get("lng")):
+        return None
+    return sw["lat"], sw["lng"], ne["lat"], ne["lng"]
+
+
+def expand_bounds(bounds, margin: float):
+    """Grow bounds by margin (a fraction of the width and height) on every side."""
+    south, west, north, east = bounds
+    dlat, dlon = (north - south) * margin, (east - west) * margin
+    return south - dlat, west - dlon, north + dlat, east + dlon
+
+
+def contains_bounds(outer, inner) -> bool:
+    return (
+        outer[0] <= inner[0]
+        and outer[1] <= inner[1]
+        and outer[2] >= inner[2]
+        and outer[3] >= inner[3]
+    )
+
+
+def haversine_km(lat, lon, lats, lons) -> np.ndarray:
+    """Great circle distances in km from (lat, lon) to arrays of points."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = (
+        np.sin((lats - lat) / 2) ** 2
+        + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def radius_bounds(lat, lon, radius_km: float):
+    """(south, west, north, east) enclosing every point within radius_km."""
+    dlat = radius_km / KM_PER_DEGREE
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    # Longitude degrees shrink towards the poles; use the widest latitude
+    widest = max(abs(south), abs(north))
+    cos = math.cos(math.radians(widest))
+    if widest >= 90.0 or radius_km / (KM_PER_DEGREE * cos) >= 180.0:
+        return south, -180.0, north, 180.0
+    dlon = radius_km / (KM_PER_DEGREE * cos)
+    return south, lon - dlon, north, lon + dlon
+
+
+class GridIndex:
+    """Uniform lat/lon grid of cell -> set of ids, updated one point at a time."""
+
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._points = {}  # id -> (lat, lon)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def add(self, id, lat, lon):
+        self.remove(id)
+        if lat is None or lon is None:
+            return
+        self._points[id] = (lat, lon)
+        self._cells.setdefault(self._cell(lat, lon), set()).add(id)
+
+    def remove(self, id):
+        point = self._points.pop(id, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        self._cells[cell].discard(id)
+        if not self._cells[cell]:
+            del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+
+    def query(self, bounds) -> list:
+        """Ids of points inside (south, west, north, east)."""
+        south, west, north, east = bounds
+        min_row, min_col = self._cell(south, west)
+        max_row, max_col = self._cell(north, east)
+
+        # Wide viewports cover more cells than are occupied, walk those instead
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            cells = (
+                ids
+                for (row, col), ids in self._cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+            )
+        else:
+            cells = (
+                self._cells.get((row, col), ())
+                for row in range(min_row, max_row + 1)
+                for col in range(min_col, max_col + 1)
+            )
+
+        results = []
+        for ids in cells:
+            for id in ids:
+                lat, lon = self._points[id]
+                if south <= lat <= north and west <= lon <= east:
+                    results.append(id)
+        return results
+
+    def _within(self, lat, lon, radius_km, keep):
+        ids = self.query(radius_bounds(lat, lon, radius_km))
+        if keep is not None:
+            ids = keep(ids)
+        points = self._points
+        lats = np.fromiter((points[id][0] for id in ids), float, len(ids))
+        lons = np.fromiter((points[id][1] for id in ids), float, len(ids))
+        distances = haversine_km(lat, lon, lats, lons)
+        inside = distances <= radius_km
+        return [id for id, ok in zip(ids, inside.tolist()) if ok], distances[inside]
+
+    def nearest(self, lat, lon, k: int = None, radius_km: float = None, keep=None):
+        """Points closest to (lat, lon) by haversine distance: the k nearest,
+        every one within radius_km, or the k nearest within radius_km.
+        keep(ids) may narrow candidate ids. Returns (ids, distances in km),
+        closest first.
+
+        k nearest searches a radius that doubles from one cell until it holds
+        k points, so dense areas only touch the cells around the point.
+        """
+        if k is None and radius_km is None:
+            raise ValueError("nearest needs k, radius_km or both")
+        limit = math.pi * EARTH_RADIUS_KM if radius_km is None else radius_km
+        search = limit if k is None else min(self.cell_size * KM_PER_DEGREE, limit)
+        while True:
+            ids, distances = self._within(lat, lon, search, keep)
+            if k is None or len(ids) >= k or search >= limit:
+                break
+            search = min(search * 2, limit)
+        order = np.argsort(distances, kind="stable")[:k]
+        return [ids[i] for i in order.tolist()], distances[order]
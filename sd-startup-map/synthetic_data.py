@@ -0,0 +1,135 @@
+"""Synthetic San Diego startups for benchmarks and offline runs.
+
+Companies sit around real startup hubs, tags follow a Zipf-like popularity
+curve (a few very common, a long tail of rare ones) and every value is derived
+from a seed, so the same size and seed always give the same dataset.
+"""
+
+from models import Company
+import random
+
+
+# (name, city, lat, lon, zip code, share of companies)
+HUBS = [
+    ("Sorrento Valley", "San Diego", 32.8998, -117.2054, "92121", 0.20),
+    ("UTC", "San Diego", 32.8712, -117.2114, "92122", 0.12),
+    ("Downtown", "San Diego", 32.7157, -117.1611, "92101", 0.14),
+    ("Carlsbad", "Carlsbad", 33.1581, -117.3506, "92008", 0.10),
+    ("Kearny Mesa", "San Diego", 32.8323, -117.1383, "92111", 0.07),
+    ("La Jolla", "San Diego", 32.8328, -117.2713, "92037", 0.07),
+    ("Mission Valley", "San Diego", 32.7678, -117.1513, "92108", 0.06),
+    ("Del Mar", "Del Mar", 32.9595, -117.2653, "92014", 0.05),
+    ("Rancho Bernardo", "San Diego", 33.0197, -117.0836, "92127", 0.05),
+    ("North Park", "San Diego", 32.7409, -117.1297, "92104", 0.05),
+    ("Escondido", "Escondido", 33.1192, -117.0864, "92025", 0.04),
+    ("Chula Vista", "Chula Vista", 32.6401, -117.0842, "91910", 0.03),
+    ("Oceanside", "Oceanside", 33.1959, -117.3795, "92054", 0.02),
+]
+
+TAGS = [
+    "Biotech",
+    "SaaS",
+    "AI",
+    "Medical Devices",
+    "Software",
+    "Life Sciences",
+    "Genomics",
+    "Defense",
+    "Wireless",
+    "Cybersecurity",
+    "Cleantech",
+    "Consumer",
+    "Fintech",
+    "E-commerce",
+    "Diagnostics",
+    "Therapeutics",
+    "Robotics",
+    "Hardware",
+    "Marketplace",
+    "Healthcare IT",
+    "Edtech",
+    "Action Sports",
+    "Craft Beverage",
+    "Blue Tech",
+    "Semiconductors",
+    "Drones",
+    "IoT",
+    "Data Analytics",
+    "Gaming",
+    "Agtech",
+    "Real Estate",
+    "Logistics",
+    "Space",
+    "Energy Storage",
+    "Solar",
+    "Water",
+    "Travel",
+    "Media",
+    "Pet Care",
+    "Fitness",
+    "Nutrition",
+    "Legal Tech",
+    "HR Tech",
+    "Insurtech",
+    "Proptech",
+    "Mobility",
+    "AR/VR",
+    "Blockchain",
+    "Quantum",
+    "Synthetic Biology",
+]
+
+_PREFIXES = ["Bio", "Neuro", "Geno", "Aero", "Quant", "Tide", "Sol", "Cyber", "Hyper"]
+_ROOTS = ["nova", "gen", "logic", "wave", "sphere", "path", "scale", "mint", "core"]
+_SUFFIXES = ["Labs", "Therapeutics", "AI", "Systems", "Health", "Robotics", "Inc"]
+_STREETS = [
+    "Science Center Dr",
+    "Towne Centre Dr",
+    "Market St",
+    "Broadway",
+    "Palomar Airport Rd",
+]
+
+# Share of companies with 1, 2, 3 and 4 tags
+_TAG_COUNTS = [0.35, 0.35, 0.2, 0.1]
+# Share of companies whose address never geocoded
+MISSING_COORDINATES = 0.01
+
+
+def tag_weights(exponent: float = 1.1) -> list[float]:
+    return [1 / (rank + 1) ** exponent for rank in range(len(TAGS))]
+
+
+def synthetic_companies(n: int, seed: int = 0) -> list[Company]:
+    rng = random.Random(seed)
+    weights = tag_weights()
+    hubs = rng.choices(HUBS, weights=[h[5] for h in HUBS], k=n)
+    companies = []
+    for i, (hub, city, lat, lon, zip_code, _) in enumerate(hubs):
+        tags = set()
+        for _ in range(rng.choices(range(1, 5), weights=_TAG_COUNTS)[0]):
+            tags.add(rng.choices(TAGS, weights=weights)[0])
+        tags = sorted(tags)
+        name = (
+            f"{rng.choice(_PREFIXES)}{rng.choice(_ROOTS)} {rng.choice(_SUFFIXES)} {i}"
+        )
+        located = rng.random() >= MISSING_COORDINATES
+        companies.append(
+            Company(
+                UUID=f"00000000-0000-4000-8000-{seed:04d}{i:08d}",
+                Name=name,
+                Description=f"{hub} {tags[0].lower()} startup building {' and '.join(t.lower() for t in tags)} products for customers worldwide.",
+                StartupYear=rng.randint(1985, 2024),
+                Url=f"https://www.startup{i}.example.com",
+                LinkedInUrl=f"https://www.linkedin.com/company/startup{i}",
+                Logo="",
+                Lat=rng.gauss(lat, 0.012) if located else None,
+                Lon=rng.gauss(lon, 0.012) if located else None,
+                Tags=tags,
+                Address=f"{rng.randint(100, 9999)} {rng.choice(_STREETS)}",
+                City=city,
+                State="CA",
+                ZipCode=zip_code,
+            )
+        )
+    return companies
@@ -0,0 +1,103 @@
+from collections import Counter
+import heapq
+
+
+# Related tags kept per tag
+DEFAULT_TOP_K = 10
+
+
+class TagStats:
+    """Company counts per tag and a sparse tag co-occurrence matrix.
+
+    counts[tag] is how many companies have tag; the matrix, a Counter per tag,
+    holds how many companies have both tags of a pair, only for pairs that
+    occur. Related tags are ranked by Jaccard similarity, companies with both
+    over companies with either, so tags on nearly every company don't crowd
+    out specific ones. Each tag's top k is worked out when first asked for and
+    kept until a company with that tag or one of its neighbours changes.
+    """
+
+    def __init__(self, k: int = DEFAULT_TOP_K):
+        self.k = k
+        self.counts = Counter()
+        self._pairs = {}  # tag -> Counter of co-occurring tag -> companies
+        self._top = {}  # tag -> [(related tag, companies, similarity)]
+
+    def build(self, rows):
+        """Replace the contents with one pass over rows, each a company's tags."""
+        self.counts.clear()
+        self._pairs.clear()
+        self._top.clear()
+        for tags in rows:
+            self._count(set(tags), 1)
+
+    def add(self, tags):
+        tags = set(tags)
+        self._invalidate(tags)
+        self._count(tags, 1)
+
+    def remove(self, tags):
+        tags = set(tags)
+        self._invalidate(tags)
+        self._count(tags, -1)
+
+    def _invalidate(self, tags):
+        # A changed count shifts the similarity of every pair the tag is in.
+        # Pairs only ever appear between tags, so neighbours before the change
+        # cover everything affected.
+        for tag in tags:
+            self._top.pop(tag, None)
+            for other in self._pairs.get(tag, ()):
+                self._top.pop(other, None)
+
+    def _count(self, tags: set, delta: int):
+        for tag in tags:
+            count = self.counts[tag] + delta
+            if count > 0:
+                self.counts[tag] = count
+            else:
+                del self.counts[tag]
+            pairs = self._pairs.get(tag)
+            if pairs is None:
+                pairs = self._pairs[tag] = Counter()
+            for other in tags:
+                if other == tag:
+                    continue
+                together = pairs[other] + delta
+                if together > 0:
+                    pairs[other] = together
+                else:
+                    del pairs[other]
+            if not pairs:
+                del self._pairs[tag]
+
+    def together(self, tag: str, other: str) -> int:
+        """Companies with both tags."""
+        return self._pairs.get(tag, {}).get(other, 0)
+
+    def related(self, tag: str) -> list:
+        """Up to k (tag, companies with both, similarity), most similar first."""
+        top = self._top.get(tag)
+        if top is None:
+            count = self.counts[tag]
+            scored = (
+                (other, together, together / (count + self.counts[other] - together))
+                for other, together in self._pairs.get(tag, {}).items()
+            )
+            top = self._top[tag] = heapq.nsmallest(
+                self.k, scored, key=lambda r: (-r[2], -r[1], r[0])
+            )
+        return top
+
+    def suggest(self, tags, k: int = DEFAULT_TOP_K) -> list[str]:
+        """Tags related to any of tags, excluding them, best first. A
+        candidate's score is its similarity summed over the tags it is among
+        the top k of."""
+        selected = set(tags)
+        scores = Counter()
+        for tag in selected:
+            for other, _, similarity in self.related(tag):
+                if other not in selected:
+                    scores[other] += similarity
+        ranked = sorted(scores.items(), key=lambda s: (-s[1], s[0]))
+        return [tag for tag, _ in ranked[:k]]
@@ -0,0 +1,114 @@
+from bisect import bisect_left, insort
+from collections import Counter
+import math
+import re
+
+
+# Matches in a name count for more than in a description
+FIELD_WEIGHTS = {"Name": 3.0, "Tags": 2.0, "Description": 1.0}
+# BM25 term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> list[str]:
+    if not text:
+        return []
+    if not isinstance(text, str):
+        text = " ".join(text)
+    return _TOKEN.findall(text.lower())
+
+
+class TextIndex:
+    """Inverted index over weighted text fields, ranked with BM25.
+
+    Field term counts are multiplied by FIELD_WEIGHTS and summed into one
+    weighted frequency per document (BM25F style). Query tokens match any term
+    they prefix, so "bio" finds "biotech". Documents are added and removed one
+    at a time; nothing is rebuilt. Ids can be any hashable.
+    """
+
+    def __init__(self, weights: dict = FIELD_WEIGHTS):
+        self.weights = weights
+        self._postings = {}  # term -> {id: weighted frequency}
+        self._terms = []  # sorted keys of _postings, for prefix lookups
+        self._lengths = {}  # id -> weighted length
+        self._doc_terms = {}  # id -> terms, to find its postings on removal
+        self._total_length = 0.0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, id, fields: dict):
+        """Index fields (name -> text or list of strings) under id, replacing
+        anything previously indexed for it."""
+        self.remove(id)
+        frequencies = {}
+        length = 0.0
+        for field, weight in self.weights.items():
+            tokens = tokenize(fields.get(field))
+            length += weight * len(tokens)
+            for token, count in Counter(tokens).items():
+                frequencies[token] = frequencies.get(token, 0.0) + weight * count
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._terms, term)
+            postings[id] = frequency
+        self._lengths[id] = length
+        self._doc_terms[id] = tuple(frequencies)
+        self._total_length += length
+
+    def remove(self, id):
+        length = self._lengths.pop(id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in self._doc_terms.pop(id):
+            postings = self._postings[term]
+            del postings[id]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def expand(self, prefix: str) -> list[str]:
+        """Indexed terms starting with prefix."""
+        terms = self._terms
+        i = bisect_left(terms, prefix)
+        end = i
+        while end < len(terms) and terms[end].startswith(prefix):
+            end += 1
+        return terms[i:end]
+
+    def search(self, query: str, limit: int = None) -> list[tuple]:
+        """(id, score) for documents matching every query token, best first."""
+        tokens = tokenize(query)
+        if not tokens or not self._lengths:
+            return []
+        n = len(self._lengths)
+        average = self._total_length / n or 1.0
+
+        scores = None
+        for token in dict.fromkeys(tokens):
+            # A token scores by its best matching term in each document
+            best = {}
+            for term in self.expand(token):
+                postings = self._postings[term]
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for id, frequency in postings.items():
+                    norm = K1 * (1 - B + B * self._lengths[id] / average)
+                    score = idf * frequency * (K1 + 1) / (frequency + norm)
+                    if score > best.get(id, 0.0):
+                        best[id] = score
+            if scores is None:
+                scores = best
+            else:
+                scores = {id: s + best[id] for id, s in scores.items() if id in best}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return ranked if limit is None else ranked[:limit]
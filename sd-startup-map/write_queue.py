@@ -0,0 +1,270 @@
+from data_functions import add_company, update_company, delete_company
+from snapshot import check_writable
+from models import Company
+import streamlit as st
+from config import setting
+import threading
+import sqlite3
+import logging
+import random
+import json
+import time
+
+
+DEFAULT_QUEUE_PATH = ".write_queue.sqlite"
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 5
+# Retry delays double from BACKOFF seconds up to MAX_BACKOFF
+BACKOFF = 2.0
+MAX_BACKOFF = 300.0
+# Finished jobs older than this are dropped on startup
+RETENTION = 24 * 60 * 60
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class WriteQueue:
+    """Durable queue of company writes, run by background worker threads.
+
+    Jobs live in SQLite so they survive a restart; jobs left running by a
+    crash go back to the queue. Jobs for the same company run one at a time
+    in the order they were queued, and a queued job that has not started yet
+    absorbs later writes to its company (edit after edit becomes one update,
+    an add then an edit one add, anything then a delete one delete). Failed
+    jobs, such as an address that did not geocode, retry with exponential
+    backoff until max_attempts.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_QUEUE_PATH,
+        workers: int = DEFAULT_WORKERS,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+    ):
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                company TEXT NOT NULL,
+                label TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, company, id)"
+        )
+        now = time.time()
+        recovered = self._db.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?",
+            (QUEUED, now, RUNNING),
+        ).rowcount
+        self._db.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (DONE, FAILED, now - RETENTION),
+        )
+        self._db.commit()
+        if recovered:
+            logging.warning(f"Requeued {recovered} writes interrupted by a restart")
+
+        self._closed = False
+        self._threads = [
+            threading.Thread(target=self._work, name=f"write-queue-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # Queueing
+
+    def add(self, company: Company) -> int:
+        return self._enqueue(
+            "add", company.UUID, company.Name, {"company": company.model_dump()}
+        )
+
+    def update(self, original: Company, new: Company) -> int:
+        payload = {"original": original.model_dump(), "new": new.model_dump()}
+        return self._enqueue("update", original.UUID, new.Name, payload)
+
+    def delete(self, uuid: str, name: str = None) -> int:
+        return self._enqueue("delete", uuid, name, {"uuid": uuid})
+
+    def _enqueue(self, kind: str, company: str, label: str, payload: dict) -> int:
+        """Queue a job, or fold it into the company's queued job. Returns the
+        id of the job that will carry out the write."""
+        check_writable()
+        now = time.time()
+        with self._lock:
+            pending = self._db.execute(
+                "SELECT id, kind, payload FROM jobs WHERE company = ? AND status = ? ORDER BY id DESC LIMIT 1",
+                (company, QUEUED),
+            ).fetchone()
+            merged = pending and _coalesce(
+                pending[1], json.loads(pending[2]), kind, payload
+            )
+            if merged:
+                job_id = pending[0]
+                self._db.execute(
+                    "UPDATE jobs SET kind = ?, label = ?, payload = ?, attempts = 0, next_attempt = ?, error = NULL, updated_at = ? WHERE id = ?",
+                    (merged[0], label, json.dumps(merged[1]), now, now, job_id),
+                )
+                logging.debug(f"Write {kind} for {company} merged into job {job_id}")
+            else:
+                job_id = self._db.execute(
+                    "INSERT INTO jobs (kind, company, label, payload, status, next_attempt, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, company, label, json.dumps(payload), QUEUED, now, now, now),
+                ).lastrowid
+            self._db.commit()
+            self._wake.notify()
+        return job_id
+
+    # Status
+
+    def jobs(self, ids) -> dict:
+        """id -> {"kind", "label", "status", "attempts", "next_attempt", "error"}
+        for the given job ids that still exist."""
+        ids = list(ids)
+        if not ids:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, kind, label, status, attempts, next_attempt, error FROM jobs WHERE id IN ({','.join('?' * len(ids))})",
+                ids,
+            ).fetchall()
+        keys = ("kind", "label", "status", "attempts", "next_attempt", "error")
+        return {row[0]: dict(zip(keys, row[1:])) for row in rows}
+
+    def stats(self) -> dict:
+        """Job counts by status."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, count(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)} | dict(rows)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until nothing is queued or running. False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            stats = self.stats()
+            if not stats[QUEUED] and not stats[RUNNING]:
+                return True
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    # Workers
+
+    def _claim(self):
+        # Oldest due job whose company has nothing running or queued before it
+        now = time.time()
+        row = self._db.execute(
+            """
+            SELECT id, kind, payload, attempts FROM jobs AS j
+            WHERE status = ? AND next_attempt <= ? AND NOT EXISTS (
+                SELECT 1 FROM jobs AS other
+                WHERE other.company = j.company
+                AND (other.status = ? OR (other.status = ? AND other.id < j.id))
+            )
+            ORDER BY id LIMIT 1
+            """,
+            (QUEUED, now, RUNNING, QUEUED),
+        ).fetchone()
+        if row is not None:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, now, row[0]),
+            )
+            self._db.commit()
+        return row
+
+    def _work(self):
+        while True:
+            with self._lock:
+                job = None
+                while not self._closed:
+                    job = self._claim()
+                    if job is not None:
+                        break
+                    # Woken by new jobs; the timeout picks up retries falling due
+                    self._wake.wait(timeout=1.0)
+                if job is None:
+                    return
+            self._run(*job)
+
+    def _run(self, job_id: int, kind: str, payload: str, attempts: int):
+        attempts += 1
+        try:
+            run_job(kind, json.loads(payload))
+        except Exception as e:
+            retry = attempts < self.max_attempts
+            delay = min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+            delay *= random.uniform(1.0, 1.2)
+            logging.warning(
+                f"Write job {job_id} ({kind}) failed on attempt {attempts}: {e}"
+                + (f", retrying in {delay:.0f}s" if retry else ", giving up")
+            )
+            status, next_attempt, error = (
+                QUEUED if retry else FAILED,
+                time.time() + delay,
+                str(e),
+            )
+        else:
+            status, next_attempt, error = DONE, time.time(), None
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, next_attempt = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, attempts, next_attempt, error, time.time(), job_id),
+            )
+            self._db.commit()
+            self._wake.notify_all()
+
+
+def _coalesce(pending_kind: str, pending: dict, kind: str, payload: dict):
+    """(kind, payload) of one job doing both writes, or None if they can't merge."""
+    if kind == "delete":
+        return "delete", payload
+    if kind == "update" and pending_kind == "add":
+        return "add", {"company": payload["new"]}
+    if kind == "update" and pending_kind == "update":
+        return "update", {"original": pending["original"], "new": payload["new"]}
+    return None
+
+
+def run_job(kind: str, payload: dict):
+    if kind == "add":
+        add_company(Company(**payload["company"]))
+    elif kind == "update":
+        update_company(Company(**payload["original"]), Company(**payload["new"]))
+    elif kind == "delete":
+        delete_company(payload["uuid"])
+    else:
+        raise ValueError(f"Unknown write job kind {kind}")
+
+
+@st.cache_resource
+def get_write_queue() -> WriteQueue:
+    # Shared by every session in this process
+    return WriteQueue(
+        setting("WRITE_QUEUE_PATH", DEFAULT_QUEUE_PATH),
+        int(setting("WRITE_QUEUE_WORKERS", DEFAULT_WORKERS)),
+        int(setting("WRITE_QUEUE_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)),
+    )
@@ -0,0 +1,73 @@
+from firebase_stub import FirebaseStub, install
+import auth_functions
+import streamlit as st
+import pytest
+import socket
+
+
+EMAIL, PASSWORD = "editor@example.com", "secret1"
+
+
+@pytest.fixture
+def stub():
+    stub = FirebaseStub(users={EMAIL: PASSWORD})
+    restore = install(stub)
+    yield stub
+    restore()
+    stub.stop()
+
+
+@pytest.fixture
+def session(stub):
+    # Signed in as the sidebar leaves a session
+    signed_in = auth_functions.sign_in_with_email_and_password(EMAIL, PASSWORD)
+    st.session_state["user_info"] = {"email": EMAIL}
+    st.session_state["auth_tokens"] = auth_functions.token_state(
+        signed_in["idToken"], signed_in["refreshToken"], signed_in["expiresIn"]
+    )
+    yield signed_in
+    for key in ("user_info", "auth_tokens", "auth_warning"):
+        st.session_state.pop(key, None)
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_a_valid_session_checks_out(stub, session):
+    assert auth_functions.check_session() is True
+    assert st.session_state["user_info"]["email"] == EMAIL
+
+    # Account info is cached per ID token
+    calls = stub.requests["getAccountInfo"]
+    assert auth_functions.check_session() is True
+    assert stub.requests["getAccountInfo"] == calls
+
+
+def test_an_expiring_token_is_refreshed(stub, session):
+    st.session_state["auth_tokens"]["expires_at"] = 0
+
+    assert auth_functions.check_session() is True
+    assert stub.requests["token"] == 1
+    assert st.session_state["auth_tokens"]["idToken"] != session["idToken"]
+
+
+def test_a_rejected_session_is_signed_out(stub, session):
+    stub.deleteAccount({"idToken": session["idToken"]})
+
+    assert auth_functions.check_session() is False
+    assert "user_info" not in st.session_state
+    assert "auth_tokens" not in st.session_state
+    assert "expired" in st.session_state["auth_warning"]
+
+
+def test_an_unreachable_firebase_keeps_the_session(session, monkeypatch):
+    st.session_state["auth_tokens"]["expires_at"] = 0
+    unreachable = f"http://127.0.0.1:{_closed_port()}"
+    monkeypatch.setattr(auth_functions, "FIREBASE_TOKEN_URL", unreachable)
+
+    assert auth_functions.check_session() is False
+    assert st.session_state["user_info"]["email"] == EMAIL
+    assert "try again" in st.session_state["auth_warning"]
@@ -0,0 +1,68 @@
+from fake_neo4j import FakeGraph, install
+import bulk_import
+import pytest
+import json
+
+
+ROW = {
+    "UUID": "",
+    "Name": "",
+    "Address": "1 Main St",
+    "City": "San Diego",
+    "State": "CA",
+    "ZipCode": "92101",
+    "Lat": 32.7,
+    "Lon": -117.1,
+    "Tags": ["AI"],
+}
+
+
+@pytest.fixture
+def graph():
+    graph = FakeGraph()
+    restore = install(graph)
+    yield graph
+    restore()
+
+
+def _import(tmp_path, rows, **kwargs):
+    path = tmp_path / "companies.json"
+    path.write_text(json.dumps(rows))
+    return bulk_import.run_import(str(path), **kwargs)
+
+
+def test_rows_without_url_are_rejected(graph, tmp_path):
+    rows = [
+        {**ROW, "UUID": "a", "Name": "First"},
+        {**ROW, "UUID": "b", "Name": "Second"},
+    ]
+    report = _import(tmp_path, rows)
+
+    assert report["imported"] == 0
+    assert [r["errors"] for r in report["rejects"]] == [["missing Url"]] * 2
+    assert graph.companies == {}
+
+
+def test_duplicate_urls_keep_the_first_row(graph, tmp_path):
+    rows = [
+        {**ROW, "UUID": "a", "Name": "First", "Url": "https://example.com"},
+        {**ROW, "UUID": "b", "Name": "Second", "Url": "https://example.com"},
+        {**ROW, "UUID": "c", "Name": "Third", "Url": "https://example.org"},
+    ]
+    report = _import(tmp_path, rows)
+
+    assert report["imported"] == 2
+    assert [r["errors"] for r in report["rejects"]] == [["duplicate Url"]]
+    assert sorted(c.Name for c in graph.companies.values()) == ["First", "Third"]
+
+
+def test_resumed_import_rejects_urls_seen_before_the_checkpoint(graph, tmp_path):
+    rows = [
+        {**ROW, "UUID": "a", "Name": "First", "Url": "https://example.com"},
+        {**ROW, "UUID": "b", "Name": "Second", "Url": "https://example.com"},
+    ]
+    bulk_import.save_checkpoint(str(tmp_path / "companies.json"), 1)
+    report = _import(tmp_path, rows, resume=True)
+
+    assert report["imported"] == 0
+    assert [r["errors"] for r in report["rejects"]] == [["duplicate Url"]]
@@ -0,0 +1,100 @@
+from cache import VersionedCache
+import numpy as np
+
+
+def _loads(cache, key, value):
+    loaded = []
+
+    def loader():
+        loaded.append(key)
+        return value
+
+    result = cache.get_or_load(key, loader)
+    return result, bool(loaded)
+
+
+def test_reads_are_cached_until_a_bump():
+    cache = VersionedCache()
+    assert _loads(cache, "tags", ["AI"]) == (["AI"], True)
+    assert _loads(cache, "tags", ["Other"]) == (["AI"], False)
+
+    cache.bump(changed=["a"])
+    assert _loads(cache, "tags", ["Other"]) == (["Other"], True)
+    assert cache.stats()["hits"] == 1
+
+
+def test_changes_since_merges_the_change_log():
+    cache = VersionedCache()
+    cache.bump(changed=["a", "b"])
+    cache.bump(deleted=["a"])
+    cache.bump(changed=["c"])
+
+    assert cache.changes_since(0) == ({"b", "c"}, {"a"})
+    assert cache.changes_since(2) == ({"c"}, set())
+    assert cache.changes_since(3) == (set(), set())
+
+    cache.bump(reload=True)
+    assert cache.changes_since(2) is None
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = VersionedCache(max_bytes=2000)
+    for key in ("a", "b"):
+        cache.get_or_load(key, lambda: np.zeros(100))  # 800 bytes each
+    cache.get_or_load("a", lambda: None)
+    cache.get_or_load("c", lambda: np.zeros(100))
+
+    assert _loads(cache, "a", None)[1] is False
+    assert _loads(cache, "b", np.zeros(100))[1] is True
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_values_larger_than_the_cache_are_not_kept():
+    cache = VersionedCache(max_bytes=100)
+    cache.get_or_load("big", lambda: np.zeros(100))
+    assert cache.stats()["entries"] == 0
+
+
+def test_poll_reloads_when_the_cursor_moves():
+    cache = VersionedCache(poll_interval=0)
+    cursor = [5]
+    assert cache.poll(lambda: cursor[0]) is False  # first read sets the cursor
+    assert cache.poll(lambda: cursor[0]) is False
+
+    cursor[0] = 6
+    assert cache.poll(lambda: cursor[0]) is True
+    assert cache.cursor == 6
+    assert cache.changes_since(0) is None
+
+
+def test_poll_is_throttled():
+    cache = VersionedCache(poll_interval=60)
+    reads = []
+    cache.poll(lambda: reads.append(1) or 1)
+    cache.poll(lambda: reads.append(2) or 2)
+    assert reads == [1]
+
+
+def test_own_writes_move_the_cursor_without_a_reload():
+    cache = VersionedCache(poll_interval=0)
+    cache.poll(lambda: 5)
+
+    # Bumped out of order, as concurrent writes may be
+    cache.bump(changed=["b"], change=7)
+    assert cache.cursor == 5
+    cache.bump(changed=["a"], change=6)
+    assert cache.cursor == 7
+
+    assert cache.poll(lambda: 7) is False
+    assert cache.changes_since(0) == ({"a", "b"}, set())
+
+
+def test_writes_from_elsewhere_still_reload():
+    cache = VersionedCache(poll_interval=0)
+    cache.poll(lambda: 5)
+    # Change 6 was written by another process
+    cache.bump(changed=["a"], change=7)
+    assert cache.cursor == 5
+
+    assert cache.poll(lambda: 7) is True
+    assert cache.cursor == 7
@@ -0,0 +1,63 @@
+from clustering import ClusterIndex, cluster_points
+import random
+import pytest
+
+
+def _points(n=300, seed=0):
+    rng = random.Random(seed)
+    return [
+        (id, 32.6 + rng.random() * 0.5, -117.3 + rng.random() * 0.4) for id in range(n)
+    ]
+
+
+def _summary(clusters):
+    return sorted(
+        (round(lat, 9), round(lon, 9), count, id) for lat, lon, count, id in clusters
+    )
+
+
+@pytest.mark.parametrize("zoom", [8, 12, 16])
+def test_index_matches_one_off_clustering(zoom):
+    index = ClusterIndex()
+    points = _points()
+    for id, lat, lon in points:
+        index.add(id, lat, lon)
+
+    assert _summary(index.query(zoom)) == _summary(cluster_points(points, zoom))
+
+
+def test_adds_and_removes_keep_built_levels_up_to_date():
+    index = ClusterIndex()
+    points = _points()
+    for id, lat, lon in points:
+        index.add(id, lat, lon)
+    index.query(12)  # builds the level, later changes update it in place
+
+    for id, _, _ in points[:100]:
+        index.remove(id)
+    moved = [(id, lat + 0.01, lon) for id, lat, lon in points[100:150]]
+    for id, lat, lon in moved:
+        index.add(id, lat, lon)
+
+    expected = cluster_points(moved + points[150:], 12)
+    assert _summary(index.query(12)) == _summary(expected)
+    assert sum(count for _, _, count, _ in index.query(12)) == 200
+
+
+def test_single_points_carry_their_id():
+    index = ClusterIndex()
+    index.add(7, 32.7, -117.1)
+    index.add(8, 33.2, -116.9)
+
+    assert sorted(id for *_, id in index.query(10)) == [7, 8]
+
+    index.add(9, 32.7, -117.1)
+    counts = sorted((count, id) for *_, count, id in index.query(10))
+    assert counts == [(1, 8), (2, None)]
+
+
+def test_no_clusters_above_max_zoom():
+    index = ClusterIndex(max_zoom=16)
+    index.add(1, 32.7, -117.1)
+    assert index.query(17) is None
+    assert cluster_points([(1, 32.7, -117.1)], 17) is None
@@ -0,0 +1,41 @@
+from fake_neo4j import COMPANY_KEYS, company_record
+from synthetic_data import synthetic_companies
+from columnar import CompanyTable
+from neo4j import Record
+
+
+def _records(companies, **replace):
+    records = [company_record(c) for c in companies]
+    for row, values in replace.items():
+        values = dict(records[int(row)], **values)
+        records[int(row)] = Record(zip(COMPANY_KEYS, (values[k] for k in COMPANY_KEYS)))
+    return records
+
+
+def test_records_load_column_by_column():
+    companies = synthetic_companies(50)
+    table = CompanyTable.from_records(_records(companies), COMPANY_KEYS)
+
+    assert [c.model_dump() for c in table] == [c.model_dump() for c in companies]
+    assert table.rejects == []
+
+
+def test_rows_with_non_string_text_are_rejected():
+    companies = synthetic_companies(5)
+    records = _records(companies, **{"1": {"Url": 42}, "3": {"Address": ["1 Main St"]}})
+    table = CompanyTable.from_records(records, COMPANY_KEYS)
+
+    assert [c.UUID for c in table] == [companies[i].UUID for i in (0, 2, 4)]
+    assert [r["errors"] for r in table.rejects] == [
+        ["Url must be a string"],
+        ["Address must be a string"],
+    ]
+
+
+def test_rows_with_non_string_tags_are_rejected():
+    companies = synthetic_companies(3)
+    records = _records(companies, **{"0": {"Tags": ["AI", 7]}})
+    table = CompanyTable.from_records(records, COMPANY_KEYS)
+
+    assert len(table.rejects) == 1
+    assert [c.UUID for c in table] == [c.UUID for c in companies[1:]]
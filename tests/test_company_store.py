@@ -0,0 +1,36 @@
+from company_store import CompanyStore
+from models import Company
+
+
+def _store(*companies) -> CompanyStore:
+    store = CompanyStore()
+    for company in companies:
+        store.upsert(company)
+    return store
+
+
+def test_text_filter_returns_best_match_first():
+    store = _store(
+        Company(Name="Harbor Labs", Description="Robotics for biotech labs"),
+        Company(Name="Pacific Freight", Description="Shipping"),
+        Company(
+            Name="Biotech Partners", Description="Biotech biotech", Tags=["Biotech"]
+        ),
+        Company(Name="Mesa Health", Description="A biotech clinic"),
+    )
+
+    names = store.filter([], text="biotech").names
+
+    assert names[0] == "Biotech Partners"
+    assert names == [store.get(u).Name for u in store.search("biotech").uuids]
+    assert "Pacific Freight" not in names
+
+
+def test_text_filter_keeps_rank_order_within_tag_filter():
+    store = _store(
+        Company(Name="Sun Bio", Description="Solar", Tags=["Energy"]),
+        Company(Name="Bio Bio Bio", Tags=["Energy", "Biotech"]),
+        Company(Name="Bio Labs", Tags=["Biotech"]),
+    )
+
+    assert store.filter(["Energy"], text="bio").names == ["Bio Bio Bio", "Sun Bio"]
@@ -0,0 +1,23 @@
+import config
+import pytest
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (True, True),
+        (False, False),
+        ("true", True),
+        ("1", True),
+        ("yes", True),
+        ("false", False),
+        ("False", False),
+        ("0", False),
+        (" off ", False),
+        ("", False),
+        (0, False),
+    ],
+)
+def test_flags_parse_strings(monkeypatch, value, expected):
+    monkeypatch.setattr(config, "setting", lambda key, default: value)
+    assert config.flag("NEO4J_ENSURE_SCHEMA", True) is expected
@@ -0,0 +1,45 @@
+from geocoding import GeocodeCache, Geocoder, StaticBackend, FAILURE_TTL
+import geocoding
+import pytest
+import time
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeocodeCache(str(tmp_path / "geocode.sqlite"))
+
+
+def _later(monkeypatch, seconds):
+    now = time.time()
+    monkeypatch.setattr(geocoding.time, "time", lambda: now + seconds)
+
+
+def test_failures_are_cached_until_the_ttl(cache, monkeypatch):
+    cache.put("nowhere", None)
+    assert cache.get("nowhere") == (True, None)
+
+    _later(monkeypatch, FAILURE_TTL + 1)
+    assert cache.get("nowhere") == (False, None)
+
+
+def test_found_coordinates_never_expire(cache, monkeypatch):
+    cache.put("1 main st", (32.7, -117.1))
+
+    _later(monkeypatch, FAILURE_TTL * 10)
+    assert cache.get("1 main st") == (True, (32.7, -117.1))
+
+
+def test_geocoder_retries_an_address_after_the_failure_ttl(cache, monkeypatch):
+    backend = StaticBackend({"1 Main St": (32.7, -117.1)})
+    geocoder = Geocoder(backend, cache)
+
+    assert geocoder.geocode("2 Main St") is None
+    assert geocoder.geocode("2  main st,") is None
+    assert geocoder.geocode("1 Main St") == (32.7, -117.1)
+    assert geocoder.geocode("1 main st") == (32.7, -117.1)
+    assert backend.calls == 2
+
+    _later(monkeypatch, FAILURE_TTL + 1)
+    geocoder.geocode("2 Main St")
+    geocoder.geocode("1 Main St")
+    assert backend.calls == 3
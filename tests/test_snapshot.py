@@ -0,0 +1,76 @@
+from snapshot import Snapshot, ReadOnlySnapshotError, write_snapshot
+from synthetic_data import synthetic_companies
+from columnar import CompanyTable
+from models import Company
+from cache import get_dataset_cache
+import data_functions
+import snapshot
+import pytest
+
+
+def _table(companies) -> CompanyTable:
+    table = CompanyTable()
+    for c in companies:
+        table.set_company(None, c)
+    return table
+
+
+def test_round_trip(tmp_path):
+    companies = synthetic_companies(200)
+    path = str(tmp_path / "map.snapshot")
+    header = write_snapshot(_table(companies), path)
+
+    loaded = Snapshot(path)
+    assert header["rows"] == 200
+    assert [c.model_dump() for c in loaded.table] == [c.model_dump() for c in companies]
+    assert loaded.tags() == sorted({t for c in companies for t in c.Tags})
+    assert not loaded.table.lat.flags.writeable
+
+
+def test_later_rows_win_for_a_repeated_uuid(tmp_path):
+    first = Company(UUID="a", Name="First")
+    second = Company(UUID="a", Name="Second")
+    path = str(tmp_path / "map.snapshot")
+    write_snapshot(_table([first, second]), path)
+
+    assert [c.Name for c in Snapshot(path).table] == ["Second"]
+
+
+def test_lookups(tmp_path):
+    companies = synthetic_companies(50)
+    path = str(tmp_path / "map.snapshot")
+    write_snapshot(_table(companies), path)
+    loaded = Snapshot(path)
+
+    found = loaded.companies_by_uuid([companies[3].UUID, "missing"])
+    assert [c.UUID for c in found] == [companies[3].UUID]
+    assert loaded.find(companies[7].Name) == [loaded.table.company(7)]
+
+    tag = companies[0].Tags[0]
+    narrowed = loaded.companies([tag])
+    assert all(c.Tags in ([], [tag]) for c in narrowed)
+
+
+@pytest.fixture
+def snapshot_mode(tmp_path, monkeypatch):
+    path = str(tmp_path / "map.snapshot")
+    write_snapshot(_table(synthetic_companies(10)), path)
+    monkeypatch.setattr(snapshot, "_path", path)
+    monkeypatch.setattr(snapshot, "_current", Snapshot(path))
+    # An open snapshot needs no watcher in tests
+    monkeypatch.setattr(snapshot, "_watcher", object())
+    yield path
+    # Reads cached from the snapshot must not outlive it
+    get_dataset_cache().bump(reload=True)
+
+
+def test_snapshot_mode_is_read_only(snapshot_mode):
+    with pytest.raises(ReadOnlySnapshotError):
+        snapshot.check_writable()
+    with pytest.raises(ReadOnlySnapshotError):
+        data_functions.delete_company("a")
+
+
+def test_snapshot_mode_serves_reads(snapshot_mode):
+    assert len(data_functions.get_companies([])) == 10
+    assert data_functions.get_change_cursor() is None
@@ -0,0 +1,67 @@
+from spatial import GridIndex, haversine_km
+import numpy as np
+import random
+
+
+def _grid(n=500, seed=0):
+    rng = random.Random(seed)
+    grid = GridIndex()
+    points = {}
+    for id in range(n):
+        points[id] = (32.6 + rng.random() * 0.5, -117.3 + rng.random() * 0.4)
+        grid.add(id, *points[id])
+    return grid, points
+
+
+def _distances(points, lat, lon) -> dict:
+    ids = list(points)
+    lats = np.array([points[id][0] for id in ids])
+    lons = np.array([points[id][1] for id in ids])
+    return dict(zip(ids, haversine_km(lat, lon, lats, lons).tolist()))
+
+
+def test_nearest_matches_a_full_scan():
+    grid, points = _grid()
+    distances = _distances(points, 32.8, -117.15)
+    expected = sorted(distances, key=distances.get)[:10]
+
+    ids, found = grid.nearest(32.8, -117.15, k=10)
+
+    assert ids == expected
+    assert list(found) == sorted(found)
+
+
+def test_within_a_radius_matches_a_full_scan():
+    grid, points = _grid()
+    distances = _distances(points, 32.8, -117.15)
+    expected = {id for id, d in distances.items() if d <= 5}
+
+    ids, found = grid.nearest(32.8, -117.15, radius_km=5)
+
+    assert set(ids) == expected
+    assert all(d <= 5 for d in found)
+
+
+def test_nearest_within_a_radius_and_keep():
+    grid, points = _grid()
+    distances = _distances(points, 32.8, -117.15)
+    even = lambda ids: [id for id in ids if id % 2 == 0]
+    expected = sorted(
+        (id for id, d in distances.items() if d <= 5 and id % 2 == 0),
+        key=distances.get,
+    )[:3]
+
+    ids, _ = grid.nearest(32.8, -117.15, k=3, radius_km=5, keep=even)
+
+    assert ids == expected
+
+
+def test_removed_and_moved_points():
+    grid = GridIndex()
+    grid.add(1, 32.7, -117.1)
+    grid.add(2, 32.7, -117.1)
+    grid.remove(1)
+    grid.add(2, 33.2, -117.3)
+
+    assert grid.nearest(32.7, -117.1, radius_km=1)[0] == []
+    assert grid.query((33.1, -117.4, 33.3, -117.2)) == [2]
@@ -0,0 +1,67 @@
+from tag_stats import TagStats
+import pytest
+
+
+ROWS = [
+    ["AI", "SaaS"],
+    ["AI", "SaaS"],
+    ["AI", "Robotics"],
+    ["Biotech", "Genomics"],
+    ["Biotech"],
+]
+
+
+@pytest.fixture
+def stats():
+    stats = TagStats()
+    stats.build(ROWS)
+    return stats
+
+
+def test_counts_and_pairs(stats):
+    assert stats.counts == {
+        "AI": 3,
+        "SaaS": 2,
+        "Robotics": 1,
+        "Biotech": 2,
+        "Genomics": 1,
+    }
+    assert stats.together("AI", "SaaS") == 2
+    assert stats.together("SaaS", "AI") == 2
+    assert stats.together("AI", "Biotech") == 0
+
+
+def test_related_tags_are_ranked_by_jaccard_similarity(stats):
+    # SaaS: 2 together of 3 with either, Robotics: 1 of 3
+    assert stats.related("AI") == [("SaaS", 2, 2 / 3), ("Robotics", 1, 1 / 3)]
+    assert stats.related("Genomics") == [("Biotech", 1, 1 / 2)]
+
+
+def test_suggestions_exclude_selected_tags(stats):
+    assert stats.suggest(["AI"]) == ["SaaS", "Robotics"]
+    assert stats.suggest(["AI", "SaaS"]) == ["Robotics"]
+    assert stats.suggest(["AI"], k=1) == ["SaaS"]
+
+
+def test_updates_invalidate_cached_rankings(stats):
+    assert stats.related("AI")[0][0] == "SaaS"
+
+    stats.add(["AI", "Robotics"])
+    stats.add(["AI", "Robotics"])
+    assert stats.related("AI")[0][0] == "Robotics"
+    # 3 together of 5 with either
+    assert stats.related("Robotics") == [("AI", 3, 3 / 5)]
+
+    stats.remove(["AI", "Robotics"])
+    stats.remove(["AI", "Robotics"])
+    stats.remove(["AI", "Robotics"])
+    assert "Robotics" not in stats.counts
+    assert [tag for tag, _, _ in stats.related("AI")] == ["SaaS"]
+
+
+def test_build_is_the_same_as_adding_row_by_row(stats):
+    added = TagStats()
+    for row in ROWS:
+        added.add(row)
+    assert added.counts == stats.counts
+    assert added.related("AI") == stats.related("AI")
@@ -0,0 +1,116 @@
+from write_queue import WriteQueue, QUEUED, RUNNING, FAILED, BACKOFF
+from models import Company
+import write_queue
+import pytest
+import json
+import time
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # No workers: tests claim and run jobs themselves
+    queue = WriteQueue(str(tmp_path / "queue.sqlite"), workers=0)
+    yield queue
+    queue.close()
+
+
+def _company(uuid="a", name="Example", **fields) -> Company:
+    return Company(UUID=uuid, Name=name, Url=f"https://{uuid}.example.com", **fields)
+
+
+def _job(queue, job_id) -> tuple:
+    return queue._db.execute(
+        "SELECT kind, payload, status, attempts, next_attempt FROM jobs WHERE id = ?",
+        (job_id,),
+    ).fetchone()
+
+
+def test_queued_updates_merge_into_one(queue):
+    original = _company()
+    first = queue.update(original, _company(name="First"))
+    second = queue.update(_company(name="First"), _company(name="Second"))
+
+    assert first == second
+    kind, payload, *_ = _job(queue, first)
+    payload = json.loads(payload)
+    assert kind == "update"
+    assert payload["original"]["Name"] == "Example"
+    assert payload["new"]["Name"] == "Second"
+
+
+def test_an_update_merges_into_a_queued_add(queue):
+    added = queue.add(_company())
+    updated = queue.update(_company(), _company(name="Renamed"))
+
+    assert added == updated
+    kind, payload, *_ = _job(queue, added)
+    assert kind == "add"
+    assert json.loads(payload)["company"]["Name"] == "Renamed"
+
+
+def test_a_delete_replaces_a_queued_write(queue):
+    updated = queue.update(_company(), _company(name="Renamed"))
+    deleted = queue.delete("a", "Example")
+
+    assert updated == deleted
+    assert _job(queue, deleted)[0] == "delete"
+    assert queue.stats()[QUEUED] == 1
+
+
+def test_jobs_for_a_company_run_one_at_a_time(queue, monkeypatch):
+    monkeypatch.setattr(write_queue, "run_job", lambda kind, payload: None)
+    first = queue.add(_company())
+    claimed = queue._claim()
+    assert claimed[0] == first
+
+    # Queued behind a running job, so not merged and not claimable yet
+    second = queue.update(_company(), _company(name="Renamed"))
+    other = queue.add(_company(uuid="b"))
+    assert second != first
+    assert queue._claim()[0] == other
+    assert queue._claim() is None
+
+    queue._run(*claimed)
+    assert queue._claim()[0] == second
+
+
+def test_failed_jobs_retry_with_backoff(queue, monkeypatch):
+    def fail(kind, payload):
+        raise RuntimeError("address not found")
+
+    monkeypatch.setattr(write_queue, "run_job", fail)
+    job_id = queue.add(_company())
+    started = time.time()
+    queue._run(*queue._claim())
+
+    _, _, status, attempts, next_attempt = _job(queue, job_id)
+    assert (status, attempts) == (QUEUED, 1)
+    assert next_attempt >= started + BACKOFF
+    # Not due yet
+    assert queue._claim() is None
+    assert queue.jobs([job_id])[job_id]["error"] == "address not found"
+
+
+def test_jobs_fail_after_max_attempts(queue, monkeypatch):
+    def fail(kind, payload):
+        raise RuntimeError("address not found")
+
+    monkeypatch.setattr(write_queue, "run_job", fail)
+    queue.max_attempts = 1
+    job_id = queue.add(_company())
+    queue._run(*queue._claim())
+
+    assert _job(queue, job_id)[2] == FAILED
+
+
+def test_running_jobs_are_requeued_after_a_restart(tmp_path):
+    path = str(tmp_path / "queue.sqlite")
+    queue = WriteQueue(path, workers=0)
+    job_id = queue.add(_company())
+    queue._claim()
+    assert _job(queue, job_id)[2] == RUNNING
+    queue.close()
+
+    restarted = WriteQueue(path, workers=0)
+    assert _job(restarted, job_id)[2] == QUEUED
+    restarted.close()